@@ -3,6 +3,8 @@ Load all cities available in flixbus
 """
 import logging
 import uuid
+from functools import partial
+from typing import Any, Iterable
 
 import nest_asyncio
 
@@ -10,10 +12,12 @@ from pipelines.flixbus.bus_stations_pipeline import (
     FlixbusBusStationsDataLoader,
     FlixbusBusStationsDataProcessor,
 )
+from scrapers import run_blocking
 from scrapers.flixbus.bus_stations_scraper import (
     FlixbusBusStationsParser,
     FlixbusBusStationsScraper,
 )
+from scrapers.settings import SCRAPER_STATIONS_TILE_COLS, SCRAPER_STATIONS_TILE_ROWS
 from settings import APP_NAME
 
 nest_asyncio.apply()
@@ -24,37 +28,112 @@ logger = logging.getLogger(APP_NAME)
 logger.setLevel(logging.DEBUG)
 
 
-async def load_flixbus_cities(region: str = "EU"):
+def process_stations(region: str, hits: Iterable[dict]) -> list[dict]:
+    """
+    Stream the bus stations hits through the parser and the processor one at a time,
+    so the whole parsed catalogue is not kept in memory, just the processed stations.
+
+    :param region: (str) The region of the bus stations.
+    :param hits: (iterable) the bus stations hits
+    :return: (list[dict]) the processed bus stations
+    """
+    flixbus_stations_parser = FlixbusBusStationsParser(region=region, scraped_data=[])
+    flixbus_data_processor = FlixbusBusStationsDataProcessor(parsed_data=[])
+
+    parsed_stations = flixbus_stations_parser.iter_items(hits)
+    return list(flixbus_data_processor.iter_processed_items(parsed_stations))
+
+
+def scrape_and_process_stations(region: str = "EU") -> list[dict]:
+    """
+    Stream the bus stations of a region from the scraper response, so the raw response
+    is not kept in memory. It is blocking, see load_flixbus_cities.
+
+    :param region: (str, optional) The region of the bus stations (default is "EU").
+    :return: (list[dict]) the processed bus stations
+    """
+    flixbus_stations_scraper = FlixbusBusStationsScraper(region=region)
+    return process_stations(region, flixbus_stations_scraper.iter_hits(method="POST"))
+
+
+def process_tile_stations(region: str, hits: Iterable[dict]) -> list[tuple[int, dict]]:
+    """
+    Stream the bus stations hits of a tile through the parser and the processor one at a time.
+    Popular stations are the most searched ones of the whole region, not of the tile,
+    so is_popular is set once every tile is processed, see scrape_and_process_tiled_stations.
+
+    :param region: (str) The region of the bus stations.
+    :param hits: (iterable) the bus stations hits of a tile
+    :return: (list[tuple]) (search volume, processed bus station) pairs
+    """
+    flixbus_stations_parser = FlixbusBusStationsParser(region=region, scraped_data=[])
+    flixbus_data_processor = FlixbusBusStationsDataProcessor(parsed_data=[])
+    trace_uuid = str(uuid.uuid4())
+
+    tile_stations = []
+    for station in flixbus_stations_parser.iter_items(hits):
+        processed_station = flixbus_data_processor.process_item(station, 0, trace_uuid)
+        if processed_station is not None:
+            tile_stations.append((station["search_volume"], processed_station))
+    return tile_stations
+
+
+async def scrape_and_process_tiled_stations(
+    region: str = "EU",
+    rows: int = SCRAPER_STATIONS_TILE_ROWS,
+    cols: int = SCRAPER_STATIONS_TILE_COLS,
+) -> list[dict]:
+    """
+    Scrape the bus stations of a region split into rows x cols tiles fetched in parallel,
+    deduplicated by station id, see FlixbusBusStationsScraper.aiter_tiled_hits.
+    The hits of each tile are streamed through the parser and the processor
+    in its scrapers thread, so no raw hit is kept in memory, just the processed stations.
+
+    :return: (list[dict]) the processed bus stations
+    """
+    flixbus_stations_scraper = FlixbusBusStationsScraper(region=region)
+    stations = []
+    async for tile_stations in flixbus_stations_scraper.aiter_tiled_hits(
+        rows, cols, method="POST", consume=partial(process_tile_stations, region)
+    ):
+        stations.extend(tile_stations)
+
+    top_searched_threshold = FlixbusBusStationsDataProcessor(parsed_data=[]).top_searched_threshold(
+        search_volume for search_volume, _ in stations
+    )
+    for search_volume, station in stations:
+        station["is_popular"] = search_volume >= top_searched_threshold
+    return [station for _, station in stations]
+
+
+async def load_flixbus_cities(region: str = "EU", conn: Any = None):
     """
     Load Flixbus cities data for a given region.
 
     This function orchestrates the process of loading
     Flixbus cities data for the specified region.
     It involves scraping the data from the Flixbus website,
-    parsing the scraped data, processing the parsed data,
+    parsing the scraped data, processing the parsed data
+    (streamed one station at a time, in the scrapers thread pool),
     and finally, loading the processed data into a data loader.
 
     :param region: (str, optional) The region for which cities data should be loaded
     (default is "EU").
+    :param conn: (Neo4JConn, optional) a connection shared with other regions,
+    a new one if not given
     """
     trace_uuid = str(uuid.uuid4())
     logger.info(f"[{trace_uuid}] Trying to update Flixbus bus stations graph.")
 
-    flixbus_stations_scraper = FlixbusBusStationsScraper(region=region)
-    scraped_stations = flixbus_stations_scraper.get_data(method="POST")
+    if SCRAPER_STATIONS_TILE_ROWS * SCRAPER_STATIONS_TILE_COLS > 1:
+        processed_stations = await scrape_and_process_tiled_stations(region)
+    else:
+        processed_stations = await run_blocking(scrape_and_process_stations, region)
 
-    if scraped_stations:
-        logger.info(f"[{trace_uuid}] Successfully scraped {scraped_stations[0]['hits']['total']}.")
-        flixbus_stations_parser = FlixbusBusStationsParser(
-            region=region, scraped_data=scraped_stations
-        )
-        parsed_flixbus_stations = flixbus_stations_parser.parse_data()
-        flixbus_data_processor = FlixbusBusStationsDataProcessor(
-            parsed_data=parsed_flixbus_stations
-        )
-        processed_stations = flixbus_data_processor.process_items()
+    if processed_stations:
+        logger.info(f"[{trace_uuid}] Successfully scraped {len(processed_stations)} bus stations.")
         flixbus_stations_loader = FlixbusBusStationsDataLoader(
-            processed_data=processed_stations, region=region
+            processed_data=processed_stations, conn=conn, region=region
         )
         await flixbus_stations_loader.load_items()
     else:
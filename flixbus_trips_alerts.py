@@ -4,74 +4,230 @@ Scrap, proccess and alert for flixbus cheap trips
 import asyncio
 import concurrent
 import logging
-import random
+from typing import Any
 
 from pipelines.flixbus.bus_trips_pipeline import FlixbusCitiesDataGetter, FlixbusTripsTracker
 from pipelines.trip_alerts import TripsAlertBot
-from scrapers.flixbus.trips_scraper import FlixbusTripsScraper
+from scrapers import get_concurrency_budget, get_single_flight_stats, rate_limiters, url_host
+from scrapers.flixbus.trips_empty_searches import EmptySearchesCache
+from scrapers.flixbus.trips_freshness import TripsFreshnessIndex
+from scrapers.flixbus.trips_jobs import CityUuidTable, TripsJobPlanner
+from scrapers.flixbus.trips_scheduling import TripsPriorityScheduler, route_key
+from scrapers.flixbus.trips_scraper import SEARCH_TRIPS_URI
+from scrapers.flixbus.trips_yield import RouteYieldBandit
+from scrapers.settings import (
+    SCRAPER_TRIPS_EMPTY_SEARCHES_FILE,
+    SCRAPER_TRIPS_FRESHNESS_FILE,
+    SCRAPER_TRIPS_REQUESTS_PER_HOUR,
+    SCRAPER_TRIPS_YIELD_FILE,
+)
 from settings import APP_NAME
 
 logger = logging.getLogger(APP_NAME)
 logger.setLevel(logging.DEBUG)
 
+# shared between cycles of the same process, so route keys are stable
+CITY_UUIDS = CityUuidTable()
+ROUTES_LAST_SCRAPED: dict[int, float] = {}
+ROUTES_YIELD = RouteYieldBandit()
+TRIPS_FRESHNESS = TripsFreshnessIndex(file_path=SCRAPER_TRIPS_FRESHNESS_FILE)
+EMPTY_SEARCHES = EmptySearchesCache(file_path=SCRAPER_TRIPS_EMPTY_SEARCHES_FILE)
 
-async def get_flixbus_routes(region: str = "EU"):
+
+def new_flixbus_trips_scheduler() -> TripsPriorityScheduler:
     """
-    Get Flixbus routes data for a given region.
+    Build a trips scheduler without routes, sharing the routes last scrape, yield,
+    searches freshness and searches without rides between cycles.
+    With SCRAPER_TRIPS_REQUESTS_PER_HOUR, just that many jobs are scheduled,
+    see configure_trips_rate_limit for pacing them.
 
-    This function retrieves popular routes data for the specified region,
-    then creates a list of FlixbusTripsScraper
-    instances for each departure and arrival city pair in the popular routes.
-    The list of scraped routes is then     randomized before returning.
+    :return: A TripsPriorityScheduler for the routes to be added.
+    """
+    if SCRAPER_TRIPS_YIELD_FILE and not ROUTES_YIELD:
+        ROUTES_YIELD.load(SCRAPER_TRIPS_YIELD_FILE, CITY_UUIDS)
+
+    trips_scheduler = TripsPriorityScheduler(
+        TripsJobPlanner(cities=CITY_UUIDS),
+        last_scraped=ROUTES_LAST_SCRAPED,
+        bandit=ROUTES_YIELD,
+        max_jobs=SCRAPER_TRIPS_REQUESTS_PER_HOUR or None,
+        freshness_index=TRIPS_FRESHNESS,
+        empty_searches=EMPTY_SEARCHES,
+    )
+    return trips_scheduler
+
+
+def configure_trips_rate_limit(regions: int = 1) -> None:
+    """
+    With SCRAPER_TRIPS_REQUESTS_PER_HOUR, pace the trips searches along the hour.
+    The budget is by region, and the regions run side by side share the search host
+    rate limiter, so it is configured once, with the combined budget of all of them,
+    before they run (see main.run_regions).
+
+    :param regions: (int) number of regions run at once
+    """
+    if not SCRAPER_TRIPS_REQUESTS_PER_HOUR:
+        return
+    requests_per_second = SCRAPER_TRIPS_REQUESTS_PER_HOUR * regions / 3600
+    rate_limiters.configure(
+        url_host(SEARCH_TRIPS_URI),
+        rate=requests_per_second,
+        min_rate=requests_per_second,
+        max_rate=requests_per_second,
+        burst=1,
+    )
+
+
+async def load_flixbus_routes(
+    trips_scheduler: TripsPriorityScheduler,
+    region: str = "EU",
+    conn: Any = None,
+    routes_added: asyncio.Event | None = None,
+) -> None:
+    """
+    Stream the popular routes of a region into the trips scheduler.
 
+    Each departure and arrival city pair is added to the compact trips jobs planner
+    and its dates are scheduled as soon as its city is read,
+    while the rest of cities are still streaming in.
+
+    :param trips_scheduler: (TripsPriorityScheduler) see new_flixbus_trips_scheduler
     :param region: (str, optional) The region for which routes data should be retrieved
     (default is "EU").
-    :return: A list of FlixbusTripsScraper instances representing the scraped routes.
+    :param conn: (Neo4JConn, optional) a connection shared with other regions,
+    a new one if not given
+    :param routes_added: (asyncio.Event, optional) set each time routes are added
+    """
+    cities_getter = FlixbusCitiesDataGetter(conn=conn, region=region)
+    async for routes in cities_getter.aiter_stored_data():
+        for departure_city_uuid, arrival_city_uuids in routes.items():
+            if departure_city_uuid in cities_getter.popular_city_uuids:
+                trips_scheduler.add_popular_city(departure_city_uuid)
+            for arrival_city_uuid in arrival_city_uuids:
+                trips_scheduler.add_route(departure_city_uuid, arrival_city_uuid)
+        if routes_added is not None:
+            routes_added.set()
+    logger.info(f"Added {len(trips_scheduler.planner)} {region} routes to scrap.")
+
+
+async def get_flixbus_routes(region: str = "EU", conn: Any = None) -> TripsPriorityScheduler:
     """
-    cities_getter = FlixbusCitiesDataGetter(region=region)
-    routes_to_search = await cities_getter.get_stored_data()
+    Get Flixbus routes data for a given region.
 
-    scraped_routes = []
+    This function retrieves popular routes data for the specified region,
+    and adds each departure and arrival city pair in the popular routes
+    to a compact trips jobs planner, then every route date is scheduled
+    by departure soonness, route popularity, time since its last scrape
+    and the route yield of cheap trips,
+    searches still fresh or known to have no rides are skipped.
+    With SCRAPER_TRIPS_REQUESTS_PER_HOUR, just that many jobs are scheduled.
 
-    for route in routes_to_search:
-        for departure_city, arrival_cities in route.items():
-            for arrival_city in arrival_cities:
-                routes = FlixbusTripsScraper(
-                    departure_city_uuid=departure_city,
-                    arrival_city_uuid=arrival_city,
-                )
-                scraped_routes.append(routes)
-    logger.info(f"Added {len(scraped_routes)} routes to scrap.")
-    random.shuffle(scraped_routes)
-    return scraped_routes
+    :param region: (str, optional) The region for which routes data should be retrieved
+    (default is "EU").
+    :param conn: (Neo4JConn, optional) a connection shared with other regions,
+    a new one if not given
+    :return: A TripsPriorityScheduler with the trips jobs to scrap.
+    """
+    trips_scheduler = new_flixbus_trips_scheduler()
+    await load_flixbus_routes(trips_scheduler, region, conn=conn)
+    return trips_scheduler
 
 
-async def scrape_and_send_alerts(scraper):
+async def scrape_and_send_alerts(
+    scraper, routes_yield: RouteYieldBandit | None = None
+) -> tuple[int, int]:
+    """
+    Track cheap trips and send their alerts for each response of the scraper
+    as soon as it arrives, while the rest of dates are still being scraped.
+    If routes_yield is given, the scraper route yield is recorded for each response.
+    :return: (tuple) the number of responses, and of responses with trips
+    """
     trips_tracker = FlixbusTripsTracker()
-    cheap_trips = await trips_tracker.track_data_of_interest(scraper.get_data())
-    if cheap_trips:
+    responses_count, responses_with_trips_count = 0, 0
+    async for response in scraper.aiter_data():
+        responses_count += 1
+        responses_with_trips_count += bool(response.get("trips"))
+        cheap_trips = await trips_tracker.track_data_of_interest([response])
+        if routes_yield is not None:
+            key = route_key(
+                CITY_UUIDS.intern(scraper.departure_city_uuid),
+                CITY_UUIDS.intern(scraper.arrival_city_uuid),
+            )
+            routes_yield.record(key, bool(cheap_trips), trips_tracker.best_price_ratio(response))
         for trip in cheap_trips:
             trips_alert_bot = TripsAlertBot(trip)
             await trips_alert_bot.send_alert_message()
+    return responses_count, responses_with_trips_count
 
 
-async def get_flixbus_trips(region: str = "EU"):
+async def get_flixbus_trips(region: str = "EU", conn: Any = None):
     """
     Scrape Flixbus data, track cheap trips, and send alerts.
 
-    This function takes a FlixbusTripsScraper instance as input,
+    This function streams the routes of the region into a trips scheduler, and meanwhile
+    a set of workers build a FlixbusTripsScraper for each scheduled job in priority order,
     scrapes Flixbus data using the given scraper,
     tracks and identifies cheap trips using FlixbusTripsTracker,
     and sends alerts for the found cheap trips
     using TripsAlertBot.
+    There are as many workers as the concurrency budget of the region, see run_regions.
+    The routes yield, the searches freshness and the searches without rides are kept in
+    SCRAPER_TRIPS_YIELD_FILE, SCRAPER_TRIPS_FRESHNESS_FILE and SCRAPER_TRIPS_EMPTY_SEARCHES_FILE
+    for the next cycles.
+
+    :param region: (str, optional) The region of the trips (default is "EU").
+    :param conn: (Neo4JConn, optional) a connection shared with other regions,
+    a new one if not given
     """
-    scraped_routes = await get_flixbus_routes(region)
-
-    loop = asyncio.get_event_loop()
-    tasks = [scrape_and_send_alerts(route) for route in scraped_routes]
-    loop.run_until_complete(asyncio.gather(*tasks))
+    trips_scheduler = new_flixbus_trips_scheduler()
+    trips_planner = trips_scheduler.planner
+    routes_added = asyncio.Event()
+    routes_loading = asyncio.create_task(
+        load_flixbus_routes(trips_scheduler, region, conn=conn, routes_added=routes_added)
+    )
+    routes_loading.add_done_callback(lambda _: routes_added.set())
+
+    async def next_job():
+        # no pending job yet, wait for more routes while they are streaming in
+        while (job := trips_scheduler.pop()) is None and not routes_loading.done():
+            routes_added.clear()
+            await routes_added.wait()
+        return job
+
+    async def scrape_jobs():
+        while (job := await next_job()) is not None:
+            responses_count, responses_with_trips_count = await scrape_and_send_alerts(
+                trips_planner.job_scraper(job), ROUTES_YIELD
+            )
+            if not responses_count:  # failed request, it is searched again next time
+                continue
+            trips_scheduler.mark_scraped(job)
+            EMPTY_SEARCHES.record(
+                *trips_planner.route_uuids(*job.route),
+                trips_planner.job_departure_date(job).date(),
+                empty=not responses_with_trips_count,
+            )
+
+    try:
+        await asyncio.gather(*[scrape_jobs() for _ in range(get_concurrency_budget())])
+        await routes_loading
+    finally:
+        routes_loading.cancel()
+
+    if SCRAPER_TRIPS_YIELD_FILE:
+        ROUTES_YIELD.save(SCRAPER_TRIPS_YIELD_FILE, CITY_UUIDS)
+    if SCRAPER_TRIPS_FRESHNESS_FILE:
+        TRIPS_FRESHNESS.save()
+    if SCRAPER_TRIPS_EMPTY_SEARCHES_FILE:
+        EMPTY_SEARCHES.save()
+    else:  # kept in memory only, still pruned on each cycle
+        EMPTY_SEARCHES.prune()
+    logger.info(f"Skipped {EMPTY_SEARCHES.skipped_searches} searches known to have no rides.")
+    saved_requests = get_single_flight_stats()["saved_requests"]
+    logger.info(f"Saved {saved_requests} requests by coalescing identical ones.")
 
 
 if __name__ == "__main__":
+    configure_trips_rate_limit()
     with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
         executor.submit(asyncio.run, get_flixbus_trips())
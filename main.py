@@ -1,5 +1,10 @@
 """
 Look for cheap trips process
+
+Every region in REGIONS is run side by side in a single process:
+each region gets its own scrapers concurrency budget (SCRAPER_REGION_MAX_CONCURRENCY),
+all of them share a Neo4j connection pool, and their I/O overlaps,
+so all regions take about the time of the slowest one.
 """
 import asyncio
 import logging
@@ -7,8 +12,12 @@ import logging
 import nest_asyncio
 
 from flixbus_stations_loader import load_flixbus_cities
-from flixbus_trips_alerts import get_flixbus_trips
-from pipelines.settings import REGION
+from flixbus_trips_alerts import configure_trips_rate_limit, get_flixbus_trips
+from neo4j_graph import Neo4JConn, neo4j_drivers
+from pipelines.settings import NEO4J_PASSWORD, NEO4J_URI, NEO4J_USERNAME, REGIONS
+from scrapers import concurrency_budget, get_max_concurrency
+from scrapers.settings import SCRAPER_REGION_MAX_CONCURRENCY
+from settings import APP_NAME
 
 nest_asyncio.apply()
 # patches asyncio to allow nested use of asyncio.run
@@ -20,6 +29,51 @@ logging.basicConfig(
     level=logging.DEBUG,
 )
 
+logger = logging.getLogger(APP_NAME)
+
+
+async def run_region(region: str, conn: Neo4JConn, max_concurrency: int):
+    """
+    Load the bus stations of a region, and then scrape its trips and send their alerts,
+    with at most max_concurrency scrapers requests in flight.
+    """
+    with concurrency_budget(max_concurrency):
+        await load_flixbus_cities(region=region, conn=conn)
+        await get_flixbus_trips(region=region, conn=conn)
+
+
+async def run_regions(regions: list[str]):
+    """
+    Run the given regions concurrently, a failing region does not stop the rest of them.
+
+    :param regions: (list[str]) e.g. ["EU", "US", "BRA"]
+    """
+    max_concurrency = SCRAPER_REGION_MAX_CONCURRENCY or max(
+        get_max_concurrency() // len(regions), 1
+    )
+    conn = Neo4JConn(
+        uri=NEO4J_URI, user_name=NEO4J_USERNAME, password=NEO4J_PASSWORD, shared_driver=True
+    )
+    if not await conn.startup():
+        logger.error("Neo4j is not reachable, exiting.")
+        await neo4j_drivers.close_all()
+        return
+
+    logger.info(f"Running {', '.join(regions)} regions, {max_concurrency} requests each.")
+    configure_trips_rate_limit(len(regions))
+    try:
+        results = await asyncio.gather(
+            *[run_region(region, conn, max_concurrency) for region in regions],
+            return_exceptions=True,
+        )
+    finally:
+        logger.info(f"Neo4j queries concurrency stats: {conn.concurrency_stats}")
+        await neo4j_drivers.close_all()
+
+    for region, result in zip(regions, results):
+        if isinstance(result, Exception):
+            logger.error(f"{region} region failed: {result}")
+
+
 if __name__ == "__main__":
-    asyncio.run(load_flixbus_cities(region=REGION))
-    asyncio.run(get_flixbus_trips())
+    asyncio.run(run_regions(REGIONS))
@@ -5,5 +5,7 @@ Neo4J Graph provides models, utils and settings for Neo4j Data Warehouse Connect
 - settings and misc utils for neo4j flow with scrapers and piplines
 """
 
+from .drivers import *
 from .models import *
+from .reachability import *
 from .utils import *
@@ -0,0 +1,116 @@
+"""
+Shared Neo4j drivers.
+
+A Neo4j driver keeps a pool of connections, so instead of a driver by Neo4JConn,
+drivers are created by a factory with the configured pool size, connection lifetime
+and acquisition timeout, and shared by every connection to the same database,
+see Neo4JConn.shared_driver.
+The factory also warms up and checks the liveness of a driver at startup,
+and exposes its pool statistics for sizing it.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Any
+
+from neo4j import AsyncGraphDatabase
+from neo4j.exceptions import DriverError, Neo4jError
+
+from neo4j_graph.settings import (
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+    NEO4J_MAX_CONNECTION_LIFETIME,
+    NEO4J_MAX_CONNECTION_POOL_SIZE,
+)
+from settings import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.DEBUG)
+
+
+class Neo4jDriverFactory:
+    """
+    :param max_connection_pool_size: (int) max connections of each driver pool
+    :param max_connection_lifetime: (float) seconds a pooled connection is kept open
+    :param connection_acquisition_timeout: (float) max seconds waiting for a pool connection
+    """
+
+    def __init__(
+        self,
+        max_connection_pool_size: int = NEO4J_MAX_CONNECTION_POOL_SIZE,
+        max_connection_lifetime: float = NEO4J_MAX_CONNECTION_LIFETIME,
+        connection_acquisition_timeout: float = NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+    ):
+        self.max_connection_pool_size = max_connection_pool_size
+        self.max_connection_lifetime = max_connection_lifetime
+        self.connection_acquisition_timeout = connection_acquisition_timeout
+        self._lock = threading.Lock()
+        self._drivers: dict[tuple[str, str, str], Any] = {}
+
+    def create_driver(self, uri: str, auth: tuple[str, str], db_name: str) -> Any:
+        """
+        :return: (neo4j.AsyncDriver) a new driver with the factory pool configuration
+        """
+        return AsyncGraphDatabase.driver(
+            uri,
+            auth=auth,
+            database=db_name,
+            max_connection_pool_size=self.max_connection_pool_size,
+            max_connection_lifetime=self.max_connection_lifetime,
+            connection_acquisition_timeout=self.connection_acquisition_timeout,
+            # transient errors are retried by Neo4JConn, releasing its concurrency slot
+            # between retries, so managed transactions are not retried by the driver too
+            max_transaction_retry_time=0,
+        )
+
+    def get_driver(self, uri: str, auth: tuple[str, str], db_name: str) -> Any:
+        """
+        :return: (neo4j.AsyncDriver) the driver shared by the connections
+                 to the same uri, user and database, created on the first call
+        """
+        key = (uri, auth[0], db_name)
+        with self._lock:
+            driver = self._drivers.get(key)
+            if driver is None:
+                driver = self._drivers[key] = self.create_driver(uri, auth, db_name)
+            return driver
+
+    @staticmethod
+    async def check_liveness(driver: Any) -> bool:
+        """
+        :return: (bool) True if the database is reachable with the driver
+        """
+        try:
+            await driver.verify_connectivity()
+        except (DriverError, Neo4jError) as ex:
+            logger.error(f"Neo4j liveness check failed: {ex}")
+            return False
+        return True
+
+    @staticmethod
+    async def warm_up(driver: Any, connections: int, db_name: str | None = None) -> None:
+        """
+        Open up to connections pool connections at once, so the first queries
+        do not pay for the connection handshakes.
+        """
+
+        async def ping():
+            async with driver.session(database=db_name) as session:
+                result = await session.run("RETURN 1")
+                await result.consume()
+
+        await asyncio.gather(*[ping() for _ in range(connections)])
+        logger.info(f"Warmed up {connections} Neo4j connections.")
+
+    async def close_all(self) -> None:
+        """
+        Close every shared driver, e.g. at the end of the process.
+        """
+        with self._lock:
+            drivers, self._drivers = list(self._drivers.values()), {}
+        for driver in drivers:
+            await driver.close()
+
+
+neo4j_drivers = Neo4jDriverFactory()
@@ -24,15 +24,32 @@ import asyncio
 import datetime
 import itertools
 import logging
+import time
 import uuid
-from dataclasses import is_dataclass
-from typing import Any, List, TypeVar
-
-from neo4j import AsyncGraphDatabase
-from neo4j.exceptions import AuthError, DatabaseError, DriverError, Forbidden, TransientError
+from contextlib import asynccontextmanager
+from dataclasses import asdict, is_dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, TypeVar
+
+from neo4j import READ_ACCESS
+from neo4j.exceptions import (
+    DriverError,
+    Neo4jError,
+    ServiceUnavailable,
+    SessionExpired,
+    TransientError,
+)
+from neo4j.spatial import WGS84Point
 from pydantic import StrictStr, validator
 from pydantic.dataclasses import dataclass
 
+from neo4j_graph.drivers import neo4j_drivers
+from neo4j_graph.settings import (
+    NEO4J_FETCH_SIZE,
+    NEO4J_MAX_CONCURRENCY,
+    NEO4J_MAX_RETRIES,
+    NEO4J_RETRY_DELAY,
+    NEO4J_WARM_UP_CONNECTIONS,
+)
 from neo4j_graph.utils import get_cypher_core_data_type, snake_to_upper_camel
 from settings import APP_NAME
 
@@ -76,6 +93,13 @@ class Price:
         # TODO [research] how to manage amounts and currencies in neo4j (cypher)
         return f'"{round(self.amount, 2)} {self.currency.name}"'
 
+    @property
+    def cypher_parameter(self) -> str:
+        """
+        :return: (str) the price as a query parameter value, e.g. '12.5 EUR'
+        """
+        return f"{round(self.amount, 2)} {self.currency.name}"
+
 
 @dataclass
 class Location:
@@ -107,6 +131,13 @@ class Location:
         """
         return f"point({{ longitude: {self.longitude}, latitude: {self.latitude} }})"
 
+    @property
+    def cypher_parameter(self) -> WGS84Point:
+        """
+        :return: (WGS84Point) the location as a query parameter value, a cypher point
+        """
+        return WGS84Point((self.longitude, self.latitude))
+
 
 @dataclass
 class Neo4jBase:
@@ -134,7 +165,7 @@ class Neo4jBase:
         """
         items_as_str = []
         for field_name, field_def in self.__dataclass_fields__.items():
-            if field_name in ["relation_type", "src_node_ids", "dst_node_ids"]:
+            if field_name in ["relation_type", "src_node_ids", "dst_node_ids", "node_type_label"]:
                 # Avoid NodeRelationShip attribute TODO [improvement]
                 continue
             field_value = getattr(self, field_name)
@@ -145,6 +176,27 @@ class Neo4jBase:
                 items_as_str.append(f"{property_name}: {get_cypher_core_data_type(field_value)}")
         return f'{", ".join(items_as_str)}'
 
+    @property
+    def cypher_parameters(self) -> dict[str, Any]:
+        """
+        Like __str__, but as a dict of query parameters, so values are sent apart
+        from the query text and they are never parsed as cypher.
+
+        Example node: {'name': 'Micky Vainilla',
+                       'location': {'longitude': -58.6199, 'latitude': -34.6545}}
+
+        :return: (dict) e.g. {'Name': 'Micky Vainilla', 'Location': WGS84Point((-58.6199, -34.6545))}
+        """
+        parameters = {}
+        for field_name in self.__dataclass_fields__:
+            if field_name in ["relation_type", "src_node_ids", "dst_node_ids", "node_type_label"]:
+                continue
+            field_value = getattr(self, field_name)
+            if is_dataclass(field_value):
+                field_value = field_value.cypher_parameter
+            parameters[snake_to_upper_camel(field_name)] = field_value
+        return parameters
+
 
 @dataclass
 class Node(Neo4jBase):
@@ -158,6 +210,9 @@ class Node(Neo4jBase):
     node_type: StrictStr = "node"
     reachable_ids: list[int] | None = None
 
+    # properties identifying a node of its type, nodes are upserted by them
+    key_properties = ("id",)
+
     @property
     def node_properties(self) -> set:
         """
@@ -238,6 +293,9 @@ class BusStationNode(Node):
     station_uuid: StrictStr | None = None
     is_popular: bool = False
 
+    # a station may be in the bounding box of more than a region (e.g. EU and US)
+    key_properties = ("id", "region")
+
     def __post_init__(self):
         self.node_type = snake_to_upper_camel(self.node_type)
 
@@ -258,9 +316,11 @@ class NodeRelationShip(Neo4jBase):
     schedules: List[datetime.datetime] = None
     average_duration: datetime.timedelta = None
     average_price: Price = None
+    node_type_label: StrictStr = "BusStation"  # label of the related nodes, for using indexes
 
     def __post_init__(self):
         self.relation_type = self.relation_type.upper().replace("-", "_")
+        self.node_type_label = snake_to_upper_camel(self.node_type_label)
 
     @property
     def cypher_str(self) -> str:
@@ -290,7 +350,7 @@ class NodeRelationShip(Neo4jBase):
                 v
                (3) -CAN_TRANSFER_TO-> (4)
 
-            'MATCH (a { Id: 1 }), (new_connections)
+            'MATCH (a:BusStation { Id: 1 }), (new_connections:BusStation)
             WHERE a <> new_connections
             AND new_connections.Id IN [2, 3, 4]
             WITH a, COLLECT(new_connections) as conn
@@ -302,8 +362,9 @@ class NodeRelationShip(Neo4jBase):
         reachable_ids = str(dst_node_ids) if dst_node_ids else "a.ReachableIds"
 
         [src_node_id] = self.src_node_ids
+        label = self.node_type_label
         return f"""
-        MATCH (a {{ Id: {src_node_id} }}), (new_connections)
+        MATCH (a:{label} {{ Id: {src_node_id} }}), (new_connections:{label})
         WHERE a <> new_connections
         AND new_connections.Id IN {reachable_ids} WITH a,
         COLLECT(new_connections) as conn FOREACH (b IN conn
@@ -330,7 +391,7 @@ class NodeRelationShip(Neo4jBase):
 
             'WITH [1, 5, 9] AS node_ids
             UNWIND node_ids AS node_id
-            MATCH (a {Id: node_id}), (new_connections)
+            MATCH (a:BusStation {Id: node_id}), (new_connections:BusStation)
             WHERE a <> new_connections
             AND new_connections.Id IN a.ReachableIds
             WITH a, COLLECT(new_connections) as conn
@@ -338,16 +399,110 @@ class NodeRelationShip(Neo4jBase):
         """
 
         src_node_ids = self.src_node_ids
+        label = self.node_type_label
 
         return f"""
         WITH {str(src_node_ids)} AS node_ids
-        UNWIND node_ids AS node_id MATCH (a {{Id: node_id}}),
-        (new_connections) WHERE a <> new_connections
+        UNWIND node_ids AS node_id MATCH (a:{label} {{Id: node_id}}),
+        (new_connections:{label}) WHERE a <> new_connections
         AND new_connections.Id IN a.ReachableIds WITH a,
         COLLECT(new_connections) as conn
         FOREACH (b IN conn | MERGE (a)-{self.cypher_str}->(b))
         """.strip()
 
+    @property
+    def create_relationship_parameterized_query(self) -> tuple[str, dict[str, Any]]:
+        """
+        Parameterized version of create_relationship_query:
+        the query text is the same one for every relationship of a type, so its plan
+        is cached by the server, and ids and properties are sent as parameters.
+        Each source node is related to dst_node_ids, or to its ReachableIds if not given.
+
+        :return: (tuple) the Cypher query and its parameters, e.g.
+            ('UNWIND $src_node_ids AS src_node_id
+             MATCH (a:BusStation { Id: src_node_id }) MATCH (b:BusStation)
+             WHERE b.Id IN coalesce($dst_node_ids, a.ReachableIds) AND a <> b
+             MERGE (a)-[r:CAN_TRANSFER_TO]->(b) SET r += $properties',
+             {'src_node_ids': [1], 'dst_node_ids': [2, 3], 'properties': {'TravelMode': 'bus'}})
+        :raises: ValueError: If no source node IDs are provided.
+        """
+        if not self.src_node_ids:
+            raise ValueError("At least a src_node_id is needed.")
+
+        label = self.node_type_label
+        query = f"""
+        UNWIND $src_node_ids AS src_node_id
+        MATCH (a:{label} {{ Id: src_node_id }}) MATCH (b:{label})
+        WHERE b.Id IN coalesce($dst_node_ids, a.ReachableIds) AND a <> b
+        MERGE (a)-[r:{self.relation_type}]->(b) SET r += $properties
+        """.strip()
+        properties = {
+            name: value for name, value in self.cypher_parameters.items() if value is not None
+        }
+        return query, {
+            "src_node_ids": self.src_node_ids,
+            "dst_node_ids": self.dst_node_ids or None,
+            "properties": properties,
+        }
+
+    def sync_relationships_parameterized_query(
+        self,
+        adjacency: Iterable[tuple[int, list[int] | None]],
+        region: str,
+        remove_missing: bool = True,
+    ) -> tuple[str, dict[str, Any]]:
+        """
+        Build a single parameterized query syncing the relationships of a batch of source nodes
+        with their destination nodes: missing relationships are merged and,
+        if remove_missing, relationships to nodes no longer in the destinations are deleted.
+        Source and destination nodes are matched by their key (Id and Region)
+        through the label index, so a whole region is synced in a query per batch
+        instead of a query per node, without touching the nodes of other regions
+        sharing the same Id.
+
+        :param adjacency: (iterable) (src_node_id, [dst_node_id, ...]) pairs
+        :param region: (str) the region of the source and destination nodes, e.g. 'EU'
+        :param remove_missing: (bool) delete the relationships that disappeared upstream
+        :return: (tuple) the Cypher query and its parameters, e.g.
+            ('UNWIND $rows AS row
+             MATCH (a:BusStation { Id: row.src_id, Region: $region })
+             CALL { WITH a, row
+                    MATCH (b:BusStation { Region: $region })
+                    WHERE b.Id IN row.dst_ids AND a <> b
+                    MERGE (a)-[r:CAN_TRANSFER_TO]->(b) SET r += $properties }
+             CALL { WITH a, row
+                    MATCH (a)-[r:CAN_TRANSFER_TO]->(b:BusStation { Region: $region })
+                    WHERE NOT b.Id IN row.dst_ids
+                    DELETE r }',
+             {'rows': [{'src_id': 1, 'dst_ids': [2, 3]}], 'region': 'EU',
+              'properties': {'TravelMode': 'bus'}})
+        """
+        label, relation_type = self.node_type_label, self.relation_type
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (a:{label} {{ Id: row.src_id, Region: $region }})
+        CALL {{
+            WITH a, row
+            MATCH (b:{label} {{ Region: $region }}) WHERE b.Id IN row.dst_ids AND a <> b
+            MERGE (a)-[r:{relation_type}]->(b) SET r += $properties
+        }}
+        """.strip()
+        if remove_missing:
+            query += f"""
+        CALL {{
+            WITH a, row
+            MATCH (a)-[r:{relation_type}]->(b:{label} {{ Region: $region }})
+            WHERE NOT b.Id IN row.dst_ids
+            DELETE r
+        }}
+        """.rstrip()
+
+        rows = [{"src_id": src_id, "dst_ids": dst_ids or []} for src_id, dst_ids in adjacency]
+        properties = {
+            name: value for name, value in self.cypher_parameters.items() if value is not None
+        }
+        return query, {"rows": rows, "region": region, "properties": properties}
+
     @property
     def create_relationship_query(self) -> str:
         """
@@ -432,9 +587,64 @@ class UnstructuredGraph:
             f"| MERGE (n: {snake_to_upper_camel(node_type)} {{ {properties_set} }}))".strip()
         )
 
+    @property
+    def create_nodes_parameterized_query(self) -> tuple[str, dict[str, Any]]:
+        """
+        Parameterized upsert of the nodes, keyed on their key_properties:
+        a node is matched by its key (an index lookup) and the rest of its properties
+        are set on create or on match, so a node whose properties changed
+        (e.g. its reachable ids) is updated instead of duplicated.
+        The query text only depends on the node type and properties, so its plan
+        is cached by the server, and nodes are sent as a list of rows parameter,
+        so there is no client-side cypher serialisation and values are never parsed as cypher
+        (e.g. city names with quotes).
+
+        :return: (tuple) the Cypher query and its parameters, e.g.
+            ('UNWIND $rows AS row MERGE (n:Character { Id: row.Id })
+             ON CREATE SET n.Name = row.Name, n.Age = row.Age
+             ON MATCH SET n.Name = row.Name, n.Age = row.Age',
+             {'rows': [{'Id': 1, 'Name': 'Micky Vainilla', 'Age': 45},
+                       {'Id': 2, 'Name': 'Violencia Rivas', 'Age': 35}]})
+        """
+        node_ref = self.nodes[0]
+        node_type, cypher_node_properties = node_ref.node_type, node_ref.cypher_node_properties
+        key_properties = [snake_to_upper_camel(prop) for prop in node_ref.key_properties]
+        key_set = ", ".join(f"{prop}: row.{prop}" for prop in key_properties)
+        properties_set = ", ".join(
+            f"n.{prop} = row.{prop}"
+            for prop in cypher_node_properties
+            if prop not in key_properties
+        )
+        rows = [node.cypher_parameters for node in self.nodes]
+        query = (
+            f"UNWIND $rows AS row "
+            f"MERGE (n:{snake_to_upper_camel(node_type)} {{ {key_set} }}) "
+            f"ON CREATE SET {properties_set} "
+            f"ON MATCH SET {properties_set}"
+        )
+        return query, {"rows": rows}
+
 
 AsyncDriverType = TypeVar("neo4j.AsyncDriver")
 
+# errors worth retrying: deadlocks, leader switches, lost connections...
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+
+@dataclass
+class QueryConcurrencyStats:
+    """
+    Queries run by a Neo4JConn, each one in flight holds a connection of the driver pool,
+    and their waits in seconds for a free slot of the max_concurrency semaphore,
+    not including the wait for a connection of the driver pool.
+    """
+
+    queries: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    semaphore_wait_time: float = 0.0
+    max_semaphore_wait_time: float = 0.0
+
 
 @dataclass
 class Neo4JConn:
@@ -444,7 +654,11 @@ class Neo4JConn:
     It includes methods to execute queries
     and handle exceptions related to the database connection.
         - using a driver
-        - running cypher queries
+        - running cypher queries, at most max_concurrency at once
+        - in managed read/write transactions, retried for transient errors
+        - or streaming the records of read queries, see iter_query
+    With shared_driver, the driver (and its connections pool) is shared by every
+    connection to the same database, see neo4j_graph.drivers.
     """
 
     uri: StrictStr
@@ -453,22 +667,28 @@ class Neo4JConn:
     db_name: StrictStr = "neo4j"
     auth: tuple[str, str] = None
     async_driver: AsyncDriverType = None
+    max_concurrency: int = NEO4J_MAX_CONCURRENCY  # queries in flight
+    max_retries: int = NEO4J_MAX_RETRIES  # retries of transient errors
+    retry_delay: float = NEO4J_RETRY_DELAY  # seconds before the first retry, doubled each one
+    shared_driver: bool = False
 
     def init_driver(self) -> None:
         """
         Initialize the Neo4j driver for connecting to the database.
 
-        This method creates an AsyncGraphDatabase driver
-        using the provided URI, authentication details, and database name.
-        The 'max_connection_lifetime' parameter is set to 200 milliseconds.
+        This method gets an AsyncGraphDatabase driver from the drivers factory
+        using the provided URI, authentication details, and database name,
+        with the configured pool size, connection lifetime and acquisition timeout:
+        the shared one if shared_driver, a new one otherwise.
 
         :raises: DriverError if there is an issue with the Neo4j driver.
         """
         try:
             logger.info(f"trying to connect to {self.uri}:{self.db_name} db")
-            self.async_driver = AsyncGraphDatabase.driver(
-                self.uri, auth=self.auth, database=self.db_name, max_connection_lifetime=200
-            )
+            if self.shared_driver:
+                self.async_driver = neo4j_drivers.get_driver(self.uri, self.auth, self.db_name)
+            else:
+                self.async_driver = neo4j_drivers.create_driver(self.uri, self.auth, self.db_name)
         except DriverError as ex:
             logger.error(f"A node4j driver exception appeared: {ex}")
 
@@ -481,6 +701,9 @@ class Neo4JConn:
 
     def __post_init__(self):
         self.auth = self.user_name, self.password
+        self._schema_queries = set()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._stats = QueryConcurrencyStats()
 
         if not self.async_driver:
             self.init_driver()
@@ -488,33 +711,239 @@ class Neo4JConn:
     async def _close_driver(self):
         await self.async_driver.close()
 
-    async def execute_query(self, query: str, sleep_time: int = 60):
+    async def startup(self, warm_up_connections: int = NEO4J_WARM_UP_CONNECTIONS) -> bool:
+        """
+        Check the database is reachable, and warm up warm_up_connections pool connections.
+
+        :param warm_up_connections: (int) connections to open at once, none if 0
+        :return: (bool) True if the database is reachable
+        """
+        if not await neo4j_drivers.check_liveness(self.async_driver):
+            return False
+        if warm_up_connections:
+            await neo4j_drivers.warm_up(self.async_driver, warm_up_connections, self.db_name)
+        return True
+
+    @property
+    def concurrency_stats(self) -> dict[str, float]:
+        """
+        :return: (dict) the QueryConcurrencyStats fields, e.g. a max_in_flight under
+                 max_concurrency means a lower max_concurrency is enough,
+                 and a high max_semaphore_wait_time that it may be raised,
+                 up to the driver max_connection_pool_size
+        """
+        return asdict(self._stats)
+
+    async def bootstrap_schema(self, queries: list[str]) -> None:
+        """
+        Create the constraints and indexes of the given (idempotent) schema queries,
+        e.g. get_bus_stations_schema_cypher_queries(), just once for this connection.
+        Schema queries can not be mixed with data writes in a transaction,
+        so each one is run on its own, and a failing one (e.g. a constraint
+        violated by stored duplicates) is logged without stopping the rest of them.
+
+        :param queries: (list[str]) 'CREATE ... IF NOT EXISTS' queries
+        """
+        trace_uuid = str(uuid.uuid4())
+        pending_queries = [query for query in queries if query not in self._schema_queries]
+        if not pending_queries:
+            return
+
+        async with self.async_driver.session(database=self.db_name) as session:
+            for query in pending_queries:
+                try:
+                    result = await session.run(query)
+                    await result.consume()
+                except Neo4jError as ex:
+                    logger.error(f"[{trace_uuid}] Schema query {query} failed: {ex}")
+                    continue
+                self._schema_queries.add(query)
+        logger.debug(f"[{trace_uuid}] Schema ready, {len(self._schema_queries)} queries run.")
+
+    @asynccontextmanager
+    async def _concurrency_slot(self):
+        """
+        Wait for a free slot of the max_concurrency limit, and keep it while in the context,
+        the semaphore waiting time and the queries in flight are added to the concurrency stats.
+        """
+        stats = self._stats
+        waiting_since = time.monotonic()
+        async with self._semaphore:
+            semaphore_wait_time = time.monotonic() - waiting_since
+            stats.queries += 1
+            stats.semaphore_wait_time += semaphore_wait_time
+            stats.max_semaphore_wait_time = max(stats.max_semaphore_wait_time, semaphore_wait_time)
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+            try:
+                yield
+            finally:
+                stats.in_flight -= 1
+
+    async def _run_with_retries(self, work: Callable[[], Awaitable[Any]], trace_uuid: str) -> Any:
+        """
+        Run work, waiting for a free slot of the max_concurrency limit first,
+        and retry it up to max_retries times with an exponential backoff
+        for transient errors (e.g. deadlocks or a lost connection),
+        without holding the slot while waiting to retry.
+        Managed transactions are not retried by the driver (see Neo4jDriverFactory),
+        so a slot is held for a single attempt at most.
+
+        :param work: (callable) returns the coroutine to run, e.g. a session transaction
+        :return: (any) the work result
+        :raises: the last error, once retries are over, or any non transient one at once
         """
-        Execute an async given neo4j_graph query
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._concurrency_slot():
+                    return await work()
+            except RETRYABLE_ERRORS as ex:
+                if attempt == self.max_retries:
+                    logger.error(f"[{trace_uuid}] A node4j exception appeared, giving up: {ex}")
+                    raise
+                retry_delay = self.retry_delay * 2**attempt
+                logger.warning(
+                    f"[{trace_uuid}] A node4j transient exception appeared: {ex}, "
+                    f"retrying in {retry_delay}s ({attempt + 1}/{self.max_retries})."
+                )
+                await asyncio.sleep(retry_delay)
+            except (Neo4jError, DriverError) as ex:
+                logger.error(f"[{trace_uuid}] A node4j exception appeared: {ex}")
+                raise
+
+    async def execute_query(self, query: str, parameters: dict[str, Any] | None = None):
+        """
+        Execute an async given neo4j_graph query, in an auto-commit transaction
+        (e.g. for schema queries), see execute_read and execute_write for the rest of them.
         :param query: (str) a valid neo4j_graph query to be executed
-        :param sleep_time: (int) time to sleep in case of reconnecting driver, if not given SLEEP_TIME
+        :param parameters: (dict) the query parameters, e.g. {"rows": [...]} for $rows
         :return: (any) the data in the result of the query.
+        :raises: Neo4jError if the query failed, after max_retries for transient errors
         """
         trace_uuid = str(uuid.uuid4())
-        try:
-            async with self.async_driver.session() as session:
+
+        async def run_query():
+            async with self.async_driver.session(database=self.db_name) as session:
                 logger.debug(f"[{trace_uuid}] Trying to run a query: {query}")
-                result = await session.run(query)
-                data = await result.data()
-                if data:
-                    logger.debug(
-                        f"[{trace_uuid}] Successfully executed DB query and retrieved {len(data)} result(s)"
-                    )
-                else:
-                    logger.debug(f"[{trace_uuid}] Successfully executed DB query with no result(s)")
-                return data
-        except (AuthError, Forbidden, DatabaseError, DriverError, TransientError) as ex:
-            logger.error(f"[{trace_uuid}] A node4j exception appeared: {ex}")
-            await self._close_driver()
-            await asyncio.sleep(sleep_time)
-            self.init_driver()
-            await self.execute_query(query)
-        except Exception as ex:
-            logger.error(f"[{trace_uuid}] A node4j exception appeared: {ex}")
-            await asyncio.sleep(sleep_time)
-            await self.execute_query(query)
+                result = await session.run(query, parameters)
+                return await result.data()
+
+        data = await self._run_with_retries(run_query, trace_uuid)
+        if data:
+            logger.debug(
+                f"[{trace_uuid}] Successfully executed DB query and retrieved {len(data)} result(s)"
+            )
+        else:
+            logger.debug(f"[{trace_uuid}] Successfully executed DB query with no result(s)")
+        return data
+
+    async def iter_query(
+        self,
+        query: str,
+        parameters: dict[str, Any] | None = None,
+        fetch_size: int = NEO4J_FETCH_SIZE,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Execute a read query, yielding the data of each record while the result streams,
+        instead of returning all of them at once as execute_read does,
+        so the caller can start working on the first records, and client memory
+        is bounded by fetch_size records whatever the size of the result.
+        A slot of max_concurrency is kept until the result is consumed or the iterator closed.
+        Transient errors are retried as in execute_query, unless some record was already
+        yielded, then the error is raised since the records would be yielded twice.
+
+        e.g. async for city in conn.iter_query(get_cities_cypher_query()): ...
+
+        :param query: (str) a valid neo4j_graph read query to be executed
+        :param parameters: (dict) the query parameters, e.g. {"rows": [...]} for $rows
+        :param fetch_size: (int) records pulled from the server at once
+        :return: an async iterator of the data of each record, as dicts
+        :raises: Neo4jError if the query failed, after max_retries for transient errors
+        """
+        trace_uuid = str(uuid.uuid4())
+        records_count = 0
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._concurrency_slot():
+                    async with self.async_driver.session(
+                        database=self.db_name,
+                        default_access_mode=READ_ACCESS,
+                        fetch_size=fetch_size,
+                    ) as session:
+                        logger.debug(f"[{trace_uuid}] Trying to stream a query: {query}")
+                        result = await session.run(query, parameters)
+                        async for record in result:
+                            records_count += 1
+                            yield record.data()
+                logger.debug(
+                    f"[{trace_uuid}] Successfully streamed {records_count} result(s) of a DB query"
+                )
+                return
+            except RETRYABLE_ERRORS as ex:
+                if records_count or attempt == self.max_retries:
+                    logger.error(f"[{trace_uuid}] A node4j exception appeared, giving up: {ex}")
+                    raise
+                retry_delay = self.retry_delay * 2**attempt
+                logger.warning(
+                    f"[{trace_uuid}] A node4j transient exception appeared: {ex}, "
+                    f"retrying in {retry_delay}s ({attempt + 1}/{self.max_retries})."
+                )
+                await asyncio.sleep(retry_delay)
+            except (Neo4jError, DriverError) as ex:
+                logger.error(f"[{trace_uuid}] A node4j exception appeared: {ex}")
+                raise
+
+    @staticmethod
+    async def _run_statements(tx, statements: list[tuple[str, dict[str, Any] | None]]):
+        results = []
+        for query, parameters in statements:
+            result = await tx.run(query, parameters)
+            results.append(await result.data())
+        return results
+
+    async def execute_many(
+        self, statements: list[tuple[str, dict[str, Any] | None]], write: bool = True
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Execute many statements in a single managed transaction,
+        so either all of them are committed or none of them is,
+        and the transaction is retried as a whole for transient errors.
+        :param statements: (list) (query, parameters) pairs, parameters may be None
+        :param write: (bool) run a write transaction, a read one if False
+        :return: (list) the data in the result of each statement
+        :raises: Neo4jError if the transaction failed, after max_retries for transient errors
+        """
+        trace_uuid = str(uuid.uuid4())
+        logger.debug(
+            f"[{trace_uuid}] Trying to run {len(statements)} statement(s) in a "
+            f"{'write' if write else 'read'} transaction."
+        )
+
+        async def run_transaction():
+            async with self.async_driver.session(database=self.db_name) as session:
+                execute = session.execute_write if write else session.execute_read
+                return await execute(self._run_statements, statements)
+
+        results = await self._run_with_retries(run_transaction, trace_uuid)
+        logger.debug(f"[{trace_uuid}] Successfully executed {len(statements)} statement(s).")
+        return results
+
+    async def execute_read(
+        self, query: str, parameters: dict[str, Any] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Execute a query in a managed read transaction, it may be routed to a read replica.
+        :return: (list) the data in the result of the query
+        """
+        [data] = await self.execute_many([(query, parameters)], write=False)
+        return data
+
+    async def execute_write(
+        self, query: str, parameters: dict[str, Any] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Execute a query in a managed write transaction.
+        :return: (list) the data in the result of the query
+        """
+        [data] = await self.execute_many([(query, parameters)], write=True)
+        return data
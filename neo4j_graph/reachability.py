@@ -0,0 +1,71 @@
+"""
+Reachability diff of bus stations.
+
+The stored and the current reachable stations of each scraped station are compared as sets,
+so the added and removed edges of a whole region are found in a single pass,
+in time proportional to the number of edges.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Mapping
+
+
+class ReachabilityChanges:
+    """
+    The edges added and removed for each station, e.g. {station_id: [reachable_id, ...]}.
+    """
+
+    __slots__ = ("added", "removed")
+
+    def __init__(self, added: dict[int, list[int]], removed: dict[int, list[int]]):
+        self.added = added
+        self.removed = removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+    @property
+    def changed_station_ids(self) -> set[int]:
+        """
+        :return: (set) the stations with any added or removed edge
+        """
+        return set(self.added) | set(self.removed)
+
+    @property
+    def added_count(self) -> int:
+        return sum(len(station_ids) for station_ids in self.added.values())
+
+    @property
+    def removed_count(self) -> int:
+        return sum(len(station_ids) for station_ids in self.removed.values())
+
+
+def diff_reachability(
+    stored: Mapping[int, Iterable[int] | None],
+    current: Mapping[int, Iterable[int] | None],
+) -> ReachabilityChanges:
+    """
+    Diff the stored reachable stations of each current station with the current ones,
+    in one pass. Stations missing from stored get all of their edges,
+    and stations missing from current are left as they are, as a missing station
+    may just be a failed scrape (e.g. a failed tile or page).
+
+    e.g. diff_reachability({1: [2, 3], 3: [1]}, {1: [3, 4], 2: [1]})
+         added {1: [4], 2: [1]}, removed {1: [2]}
+
+    :param stored: (mapping) {station_id: [reachable_id, ...]} as stored in the graph,
+                   i.e. their relationships, not the ReachableIds property
+    :param current: (mapping) {station_id: [reachable_id, ...]} as scraped
+    :return: (ReachabilityChanges) the added and removed edges of each station, sorted by id
+    """
+    added, removed = {}, {}
+    for station_id in current.keys():
+        stored_ids = frozenset(stored.get(station_id) or ())
+        current_ids = frozenset(current.get(station_id) or ())
+        if stored_ids == current_ids:
+            continue
+        if added_ids := current_ids - stored_ids:
+            added[station_id] = sorted(added_ids)
+        if removed_ids := stored_ids - current_ids:
+            removed[station_id] = sorted(removed_ids)
+    return ReachabilityChanges(added, removed)
@@ -7,3 +7,14 @@ load_dotenv()
 
 POPULAR_SRC = os.getenv("POPULAR_SRC")
 POPULAR_DST = os.getenv("POPULAR_DST")
+
+NEO4J_MAX_CONCURRENCY = int(os.getenv("NEO4J_MAX_CONCURRENCY", "8"))  # queries in flight by conn
+NEO4J_MAX_RETRIES = int(os.getenv("NEO4J_MAX_RETRIES", "3"))  # retries of transient errors
+NEO4J_RETRY_DELAY = float(os.getenv("NEO4J_RETRY_DELAY", "1"))  # doubled on each retry
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "100"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))  # seconds
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(
+    os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "60")
+)
+NEO4J_WARM_UP_CONNECTIONS = int(os.getenv("NEO4J_WARM_UP_CONNECTIONS", "0"))  # no warm-up if 0
+NEO4J_FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))  # records pulled at once by streams
@@ -107,14 +107,17 @@ def get_cities_cypher_query(region: str = "EU") -> str:
     return f"""
     MATCH (n:BusStation)
     WHERE n.Region='{region}' {popular_src_substring}
-    WITH n.CityUuid AS from_city_uuid, n.ReachableIds AS reachableIds
+    WITH n.CityUuid AS from_city_uuid, n.IsPopular AS from_is_popular,
+    n.ReachableIds AS reachableIds
     MATCH (m:BusStation)
     WHERE m.CityUuid <> from_city_uuid {popular_dst_substring} AND m.Id IN reachableIds
-    RETURN from_city_uuid, COLLECT(DISTINCT m.CityUuid) AS to_city_uuids
+    RETURN from_city_uuid, from_is_popular, COLLECT(DISTINCT m.CityUuid) AS to_city_uuids
     """.strip()
 
 
-def get_nodes_cypher_query(region: str = "EU", properties: list[str] = None) -> str:
+def get_nodes_cypher_query(
+    region: str = "EU", properties: list[str] = None, node_type: str = "BusStation"
+) -> str:
     """
     Generate a Cypher query to retrieve nodes based on specified properties and region.
 
@@ -126,12 +129,14 @@ def get_nodes_cypher_query(region: str = "EU", properties: list[str] = None) ->
     :param properties: (list[str]) A list of property names to be returned for each matched node.
                        If None, all properties of the matched nodes will be returned.
                        Default is None.
+    :param node_type: (str) The label of the nodes, so the Region index is used.
+                      Default is 'BusStation'.
     :return: (str) A Cypher query to fetch nodes based on the given region and properties.
     :raises: ValueError: If 'properties' is not a list of strings or contains non-string elements.
 
     Example:
         get_nodes_cypher_query(region='South America', properties=['name', 'age'])
-        Output: "MATCH(n) WHERE n.Region='South America' RETURN n.Name, n.Age"
+        Output: "MATCH(n:BusStation) WHERE n.Region='South America' RETURN n.Name, n.Age"
     """
     # TODO [missing tests]
     if not isinstance(properties, list):
@@ -142,4 +147,55 @@ def get_nodes_cypher_query(region: str = "EU", properties: list[str] = None) ->
     upper_properties = [f"n.{snake_to_upper_camel(prop)}" for prop in properties]
 
     return_prop = ", ".join(upper_properties)
-    return f"MATCH(n) WHERE n.Region='{region}' RETURN {return_prop}".strip()
+    label = snake_to_upper_camel(node_type)
+    return f"MATCH(n:{label}) WHERE n.Region='{region}' RETURN {return_prop}".strip()
+
+
+def get_relationships_cypher_query(
+    region: str = "EU", relation_type: str = "CAN_TRANSFER_TO", node_type: str = "BusStation"
+) -> str:
+    """
+    Generate a Cypher query to retrieve every node of a region with the ids of the nodes
+    of the same region it is related to, so the relationships stored in the graph
+    can be diffed with the scraped ones (see diff_reachability).
+
+    :param region: (str) The region to filter nodes by. Default is 'EU' (Europe).
+    :param relation_type: (str) The type of the relationships. Default is 'CAN_TRANSFER_TO'.
+    :param node_type: (str) The label of the nodes, so the Region index is used.
+                      Default is 'BusStation'.
+    :return: (str) A Cypher query returning the Id and the DstIds of each node.
+
+    Example:
+        get_relationships_cypher_query(region='US')
+        Output: "MATCH(n:BusStation) WHERE n.Region='US'
+                 OPTIONAL MATCH (n)-[:CAN_TRANSFER_TO]->(m:BusStation) WHERE m.Region='US'
+                 RETURN n.Id AS Id, collect(m.Id) AS DstIds"
+    """
+    label = snake_to_upper_camel(node_type)
+    return (
+        f"MATCH(n:{label}) WHERE n.Region='{region}' "
+        f"OPTIONAL MATCH (n)-[:{relation_type}]->(m:{label}) WHERE m.Region='{region}' "
+        "RETURN n.Id AS Id, collect(m.Id) AS DstIds"
+    )
+
+
+def get_bus_stations_schema_cypher_queries() -> list[str]:
+    """
+    Idempotent queries creating the constraints and indexes of bus stations,
+    so their lookups by key, Id, CityUuid, Region or IsPopular are index seeks
+    instead of scans of every node, see Neo4JConn.bootstrap_schema.
+
+    - (Id, Region) uniqueness constraint: the key stations are upserted by
+      (see BusStationNode.key_properties), it is backed by an index
+    - Id, CityUuid, Region and IsPopular range indexes
+
+    :return: (list[str]) the schema Cypher queries, to be run one by one
+    """
+    return [
+        "CREATE CONSTRAINT bus_station_key IF NOT EXISTS "
+        "FOR (n:BusStation) REQUIRE (n.Id, n.Region) IS UNIQUE",
+        "CREATE INDEX bus_station_id IF NOT EXISTS FOR (n:BusStation) ON (n.Id)",
+        "CREATE INDEX bus_station_city_uuid IF NOT EXISTS FOR (n:BusStation) ON (n.CityUuid)",
+        "CREATE INDEX bus_station_region IF NOT EXISTS FOR (n:BusStation) ON (n.Region)",
+        "CREATE INDEX bus_station_is_popular IF NOT EXISTS FOR (n:BusStation) ON (n.IsPopular)",
+    ]
@@ -2,9 +2,11 @@
 Implements pipeline classes for flixbus bus stations.
 """
 import asyncio
+import heapq
+import itertools
 import logging
 import uuid
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 from pydantic.dataclasses import dataclass
 
@@ -14,7 +16,9 @@ from neo4j_graph import (
     Neo4JConn,
     NodeRelationShip,
     UnstructuredGraph,
-    get_nodes_cypher_query,
+    diff_reachability,
+    get_bus_stations_schema_cypher_queries,
+    get_relationships_cypher_query,
 )
 from pipelines import BaseDataLoader, BaseDataProcessor
 from pipelines.settings import NEO4J_PASSWORD, NEO4J_URI, NEO4J_USERNAME
@@ -40,48 +44,81 @@ class FlixbusBusStationsDataProcessor(BaseDataProcessor):
         """
         Performs data processing tasks such as cleaning, validation for each item
         """
-        ranking_size = self.ranking_size
-        data = self.parsed_data
-        top_searched_threshold = data[min(ranking_size, len(data) - 1)]["search_volume"]
+        return list(self.iter_processed_items(self.parsed_data))
 
-        processed_items = []
+    def iter_processed_items(self, items: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """
+        Process items one at a time, e.g. as they are streamed from the scraper.
+        Items come sorted by search volume, so just the first ranking_size ones are buffered
+        to get the popularity threshold.
+        :param items: (iterable) parsed items
+        :return: an iterator of processed items
+        """
+        ranking_size = self.ranking_size
+        items = iter(items)
+        ranking_items = list(itertools.islice(items, ranking_size + 1))
+        if not ranking_items:
+            return
+        top_searched_threshold = ranking_items[-1]["search_volume"]
 
         trace_uuid = str(uuid.uuid4())
-        logger.info(f"[{trace_uuid}] Trying to process {len(data)} items.")
-
-        for item in data:
-            if self.mandatory_fields:
-                if not all(item[field] for field in self.mandatory_fields):
-                    logger.error(f"[{trace_uuid}] Missing data in {item}")
-                    continue
-
-            reachable = item["reachable"]
-            reachable_ids = [
-                reach["id"] for reach in reachable if reach["id"] and isinstance(reach["id"], int)
-            ]
-            if not all(item["reachable"]):
-                logger.error(f"[{trace_uuid}] No city reachable in {item}")
-                continue
-
-            lat, lon = item["location"]["lat"], item["location"]["lon"]
-            location = Location(latitude=lat, longitude=lon)
-
-            processed_item = {
-                "id": item["id"],
-                "city_name": item["name"],
-                "city_uuid": item["uuid"],
-                "region": item["region"],
-                "location": location,
-                "is_popular": item["search_volume"] >= top_searched_threshold
-                if item["search_volume"]
-                else False,
-                "reachable_ids": reachable_ids,
-            }
+        logger.info(f"[{trace_uuid}] Trying to process items.")
+
+        items_count, processed_items_count = 0, 0
+        for item in itertools.chain(ranking_items, items):
+            items_count += 1
+            processed_item = self.process_item(item, top_searched_threshold, trace_uuid)
+            if processed_item is not None:
+                processed_items_count += 1
+                yield processed_item
+
+        logger.info(
+            f"[{trace_uuid}] {processed_items_count} of {items_count} items processed successfully."
+        )
 
-            processed_items.append(processed_item)
+    def top_searched_threshold(self, search_volumes: Iterable[int]) -> int:
+        """
+        For items not sorted by search volume, e.g. merged from several searches.
+        :return: (int) the search volume of the ranking_size + 1 most searched item,
+                 items with at least that volume are popular, as in iter_processed_items
+        """
+        ranking_volumes = heapq.nlargest(self.ranking_size + 1, search_volumes)
+        return ranking_volumes[-1] if ranking_volumes else 0
 
-        logger.info(f"[{trace_uuid}] {len(processed_items)} items processed successfully.")
-        return processed_items
+    def process_item(
+        self, item: dict[str, Any], top_searched_threshold: int, trace_uuid: str
+    ) -> dict[str, Any] | None:
+        """
+        Clean and validate a single item
+        :return: (dict) the processed item, None if it is not valid
+        """
+        if self.mandatory_fields:
+            if not all(item[field] for field in self.mandatory_fields):
+                logger.error(f"[{trace_uuid}] Missing data in {item}")
+                return None
+
+        reachable = item["reachable"]
+        reachable_ids = [
+            reach["id"] for reach in reachable if reach["id"] and isinstance(reach["id"], int)
+        ]
+        if not all(item["reachable"]):
+            logger.error(f"[{trace_uuid}] No city reachable in {item}")
+            return None
+
+        lat, lon = item["location"]["lat"], item["location"]["lon"]
+        location = Location(latitude=lat, longitude=lon)
+
+        return {
+            "id": item["id"],
+            "city_name": item["name"],
+            "city_uuid": item["uuid"],
+            "region": item["region"],
+            "location": location,
+            "is_popular": item["search_volume"] >= top_searched_threshold
+            if item["search_volume"]
+            else False,
+            "reachable_ids": reachable_ids,
+        }
 
 
 @dataclass
@@ -94,6 +131,7 @@ class FlixbusBusStationsDataLoader(BaseDataLoader):
     conn: Any = None
     chunk_size: int = 100  # TODO [research] what is the best value
     region: str = "EU"
+    relationships_chunk_size: int = 1000  # stations synced by relationships query
 
     def __post_init__(self):
         if not self.conn:
@@ -101,86 +139,94 @@ class FlixbusBusStationsDataLoader(BaseDataLoader):
                 uri=NEO4J_URI,
                 user_name=NEO4J_USERNAME,
                 password=NEO4J_PASSWORD,
+                shared_driver=True,
             )
 
     async def load_items(self):
         """
-        Stores items into a neo4j graph instance by chunks
+        Stores items into a neo4j graph instance by chunks,
+        every station is upserted by its key (see BusStationNode.key_properties),
+        so stored ones are updated instead of duplicated,
+        then the relationships of the stations whose reachable ids differ from
+        their stored relationships (see diff_reachability) are synced,
+        in batches of relationships_chunk_size stations.
+        The diff is done with the relationships in the graph, not the ReachableIds property,
+        so relationships lost in a failed sync are created again by the next load,
+        and stations missing from processed_data (e.g. a failed tile) keep their relationships.
         """
-        region = self.region
         data = self.processed_data
         chunk_size = self.chunk_size
         conn = self.conn
 
-        # TODO [refactor] split next block
-
-        create_node_queries, multi_node_relationship_queries, single_node_relationship_queries = (
-            [],
-            [],
-            [],
-        )
+        await conn.bootstrap_schema(get_bus_stations_schema_cypher_queries())
 
-        db_existing_nodes_result = await conn.execute_query(
-            get_nodes_cypher_query(region=region, properties=["id", "reachable_ids"])
+        db_existing_relationships_result = await conn.execute_read(
+            get_relationships_cypher_query(region=self.region)
         )
+        db_existing_relationships = {
+            node["Id"]: node["DstIds"] for node in db_existing_relationships_result or []
+        }
+
+        create_node_queries = []
+        for i in range(0, len(data), chunk_size):
+            # TODO [improvement] add resilient block here in case something wrong with an item
+            nodes = [BusStationNode(**item) for item in data[i : i + chunk_size]]
+            graph = UnstructuredGraph(nodes)
+            create_node_queries.append(graph.create_nodes_parameterized_query)
+
+        if create_node_queries:
+            trace_uuid = str(uuid.uuid4())
+            logger.info(f"[{trace_uuid}] Trying to upsert {len(data)} nodes.")
+            # bounded by the conn max_concurrency
+            await asyncio.gather(
+                *[
+                    conn.execute_write(query, parameters)
+                    for query, parameters in create_node_queries
+                ]
+            )
 
-        if db_existing_nodes_result:
-            db_existing_nodes = {
-                node["n.Id"]: node["n.ReachableIds"] for node in db_existing_nodes_result
-            }
-
-            def stored(node):
-                return node["id"] in db_existing_nodes
-
-            existing_nodes, new_nodes = [node for node in data if stored(node)], [
-                node for node in data if not stored(node)
-            ]
-
-            existing_nodes_dict = {node["id"]: node["reachable_ids"] for node in existing_nodes}
-
-            # TODO [improvement] refactor this code in order to make it more clear
-
-            single_node_new_relationships = [
-                [node_id, list(set(reachable_ids).difference(set(db_existing_nodes[node_id])))]
-                for node_id, reachable_ids in existing_nodes_dict.items()
-                if set(reachable_ids).difference(set(db_existing_nodes[node_id]))
-            ]
-
-            single_node_relationship_queries = [
-                NodeRelationShip(
-                    src_node_ids=[item[0]], dst_node_ids=item[1]
-                ).create_single_node_relationships()
-                for item in single_node_new_relationships
+        # relationships are just created between stored or upserted stations,
+        # so reachable stations without a node would be diffed as added on every load
+        station_ids = db_existing_relationships.keys() | {item["id"] for item in data}
+        reachable_ids = {
+            item["id"]: [
+                reachable_id
+                for reachable_id in item["reachable_ids"] or ()
+                if reachable_id in station_ids and reachable_id != item["id"]
             ]
-        else:
-            new_nodes = data
-
-        if new_nodes:
-            new_nodes_chunks = [
-                new_nodes[i : i + chunk_size] for i in range(0, len(new_nodes), chunk_size)
+            for item in data
+        }
+        changes = diff_reachability(db_existing_relationships, reachable_ids)
+        logger.info(
+            f"Found {changes.added_count} new and {changes.removed_count} removed "
+            f"relationships of {len(changes.changed_station_ids)} nodes."
+        )
+        await self.sync_relationships(
+            [
+                (station_id, reachable_ids.get(station_id, []))
+                for station_id in sorted(changes.changed_station_ids)
             ]
+        )
 
-            for chunk in new_nodes_chunks:
-                # TODO [improvement] add resilient block here in case something wrong with an item
-                nodes = [BusStationNode(**item) for item in chunk]
-                graph = UnstructuredGraph(nodes)
-                create_node_queries.append(graph.create_nodes_query)
-
-                relationship = NodeRelationShip(src_node_ids=[item["id"] for item in chunk])
-                multi_node_relationship_queries.append(
-                    relationship.create_multiple_node_relationships()
-                )
-
-            trace_uuid = str(uuid.uuid4())
-            logger.info(f"[{trace_uuid}] Trying to load {len(new_nodes)} new nodes.")
-            # TODO [improvement] propagate log trace uuid
+    async def sync_relationships(self, adjacency: list[tuple[int, list[int]]]):
+        """
+        Sync the relationships of the given stations in a query per batch
+        of relationships_chunk_size stations: missing ones are created,
+        and the ones to stations no longer reachable are removed.
+        Batches are run one after the other, as concurrent relationship writes
+        on the same nodes would deadlock.
 
-            await asyncio.gather(*[conn.execute_query(query) for query in create_node_queries])
-            await asyncio.gather(
-                *[conn.execute_query(query) for query in multi_node_relationship_queries]
-            )
+        :param adjacency: (list) (station id, [reachable station id, ...]) pairs
+        """
+        if not adjacency:
+            return
+        relationships_chunk_size = self.relationships_chunk_size
+        relationship = NodeRelationShip()
 
-        if single_node_relationship_queries:
-            await asyncio.gather(
-                *[conn.execute_query(query) for query in single_node_relationship_queries]
+        trace_uuid = str(uuid.uuid4())
+        logger.info(f"[{trace_uuid}] Trying to sync relationships of {len(adjacency)} nodes.")
+        for i in range(0, len(adjacency), relationships_chunk_size):
+            query, parameters = relationship.sync_relationships_parameterized_query(
+                adjacency[i : i + relationships_chunk_size], self.region
             )
+            await self.conn.execute_write(query, parameters)
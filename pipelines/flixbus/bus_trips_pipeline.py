@@ -2,15 +2,14 @@
 Implements pipeline classes for flixbus.
 """
 import logging
-import sys
 import uuid
 from itertools import groupby
-from typing import Any
+from typing import Any, AsyncIterator
 
 from pydantic.dataclasses import dataclass
 
 from neo4j_graph import Neo4JConn, get_cities_cypher_query
-from pipelines import BaseDataGetter, BaseDataTracker
+from pipelines import BaseDataGetter, BaseDataTracker, NoStoredDataError
 from pipelines.settings import NEO4J_PASSWORD, NEO4J_URI, NEO4J_USERNAME, TRIP_MIN_DISCOUNT
 from settings import APP_NAME
 
@@ -33,12 +32,16 @@ class FlixbusCitiesDataGetter(BaseDataGetter):
                 uri=NEO4J_URI,
                 user_name=NEO4J_USERNAME,
                 password=NEO4J_PASSWORD,
+                shared_driver=True,
             )
+        self.popular_city_uuids = set()
 
     async def get_stored_data(self) -> list[dict[str, Any]]:
         """
-        Get the set of popular cities
+        Get the set of popular cities, popular_city_uuids is updated with
+        the uuids of departure cities flagged as popular (IsPopular)
         :return: (list[dict])
+        :raises: NoStoredDataError if there is no city stored for the region
         """
         conn = self.conn
         region = self.region
@@ -46,15 +49,45 @@ class FlixbusCitiesDataGetter(BaseDataGetter):
         trace_uuid = str(uuid.uuid4())
         logger.info(f"[{trace_uuid}] Trying to get popular cities.")
 
-        db_cities_result = await conn.execute_query(get_cities_cypher_query(region=region))
+        db_cities_result = await conn.execute_read(get_cities_cypher_query(region=region))
 
         if not db_cities_result:
-            logger.error(f"[{trace_uuid}] No cities result, existing.")
-            sys.exit(1)
+            logger.error(f"[{trace_uuid}] No cities result.")
+            raise NoStoredDataError(f"no {region} cities stored")
 
         logger.info(f"[{trace_uuid}] Successfully got {len(db_cities_result)} popular cities.")
+        self.popular_city_uuids = {
+            city["from_city_uuid"] for city in db_cities_result if city.get("from_is_popular")
+        }
         return [{city["from_city_uuid"]: city["to_city_uuids"]} for city in db_cities_result]
 
+    async def aiter_stored_data(self) -> AsyncIterator[dict[str, list[str]]]:
+        """
+        Streaming version of get_stored_data, the cities are yielded while the query
+        result streams in, and popular_city_uuids is updated as they arrive,
+        so the routes of the first cities can be scraped before the last ones are read.
+        :return: an async iterator of {departure_city_uuid: [arrival_city_uuid, ...]}
+        :raises: NoStoredDataError if there is no city stored for the region
+        """
+        conn = self.conn
+        region = self.region
+
+        trace_uuid = str(uuid.uuid4())
+        logger.info(f"[{trace_uuid}] Trying to stream popular cities.")
+
+        cities_count = 0
+        async for city in conn.iter_query(get_cities_cypher_query(region=region)):
+            cities_count += 1
+            if city.get("from_is_popular"):
+                self.popular_city_uuids.add(city["from_city_uuid"])
+            yield {city["from_city_uuid"]: city["to_city_uuids"]}
+
+        if not cities_count:
+            logger.error(f"[{trace_uuid}] No cities result.")
+            raise NoStoredDataError(f"no {region} cities stored")
+
+        logger.info(f"[{trace_uuid}] Successfully streamed {cities_count} popular cities.")
+
 
 @dataclass
 class FlixbusTripsTracker(BaseDataTracker):
@@ -91,6 +124,19 @@ class FlixbusTripsTracker(BaseDataTracker):
             and result_value["available"]["seats"]
         ]
 
+    def best_price_ratio(self, response) -> float | None:
+        """
+        :return: (float) the lowest total / original price ratio of the response trips,
+                 None if there is no priced trip
+        """
+        price_ratios = [
+            result_value["price"]["total"] / result_value["price"]["original"]
+            for trip in response["trips"]
+            for result_value in trip["results"].values()
+            if result_value["price"]["original"]
+        ]
+        return min(price_ratios, default=None)
+
     def grouped_trips(self, cheap_trips):
         def composite_key(item):
             return item["from_city_name"], item["to_city_name"], item["departure_just_date"]
@@ -39,6 +39,12 @@ class BaseDataLoader(ABC):
         """
 
 
+class NoStoredDataError(Exception):
+    """
+    Raised when a data getter finds no stored items
+    """
+
+
 @dataclass
 class BaseDataGetter(ABC):
     """
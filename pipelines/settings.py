@@ -12,6 +12,12 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 AURA_INSTANCENAME = os.getenv("AURA_INSTANCENAME")
 
 REGION = os.getenv("REGION")
+# regions run side by side in a single process, e.g. "EU,US,BRA", just REGION if not set
+REGIONS = [
+    region.strip().upper()
+    for region in os.getenv("REGIONS", REGION or "EU").split(",")
+    if region.strip()
+]
 
 TRIP_MIN_DISCOUNT = os.getenv("TRIP_MIN_DISCOUNT")
 SENT_TRIPS_FILE = os.getenv("SENT_TRIPS_FILE")
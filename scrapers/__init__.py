@@ -4,5 +4,12 @@ Models, utils and settings for scrapers:
 - get and parse data via http requests
 """
 
+from .cache import *
+from .decoding import *
+from .engine import *
 from .flixbus import *
 from .models import *
+from .resilience import *
+from .sessions import *
+from .singleflight import *
+from .throttling import *
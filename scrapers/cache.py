@@ -0,0 +1,152 @@
+"""
+On-disk cache for scrapers http responses.
+
+Entries are keyed by method, url and query body, each one stored as a json file
+with its creation time, so every scraper can apply its own TTL when reading.
+The cache size is bounded, the least recently used entries are evicted first.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from pydantic.dataclasses import dataclass
+
+from scrapers.settings import SCRAPER_CACHE_DIR, SCRAPER_CACHE_MAX_SIZE
+from settings import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.DEBUG)
+
+
+def cache_key(method: str, url: str, query: dict | None = None) -> str:
+    """
+    :return: (str) a hash of the method, url and query body (keys sorted)
+    """
+    query_str = json.dumps(query, sort_keys=True) if query else ""
+    return hashlib.sha256(f"{method}|{url}|{query_str}".encode()).hexdigest()
+
+
+@dataclass
+class ResponseCache:
+    """
+    A size-bounded, thread-safe LRU cache of decoded responses stored in cache_dir.
+
+    :param cache_dir: (str) the directory for cache files, created if it does not exist
+    :param max_size: (int) max total size in bytes of the cache files
+    """
+
+    cache_dir: str
+    max_size: int = SCRAPER_CACHE_MAX_SIZE
+
+    def __post_init__(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()  # key: file size, LRU order
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+        files = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".json"):
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+                files.append((stat.st_mtime, file_name[: -len(".json")], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remove(self, key: str) -> None:
+        self._size -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str, ttl: float) -> Any:
+        """
+        :param key: (str) the entry key, see cache_key
+        :param ttl: (float) max age in seconds of the entry
+        :return: the cached data, or None if missing or expired
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as file:
+                    entry = json.load(file)
+            except (FileNotFoundError, json.decoder.JSONDecodeError):
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            if time.time() - entry["created_at"] > ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            os.utime(self._path(key))
+            self.hits += 1
+            return entry["data"]
+
+    def set(self, key: str, data: Any) -> None:
+        """
+        Store data, evicting the least recently used entries if max_size is exceeded.
+        """
+        content = json.dumps({"created_at": time.time(), "data": data})
+        size = len(content.encode())
+        if size > self.max_size:
+            logger.debug(f"response of {size} bytes is too large to be cached")
+            return
+
+        with self._lock:
+            self._remove(key)
+            tmp_path = f"{self._path(key)}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(tmp_path, self._path(key))
+            self._entries[key] = size
+            self._size += size
+
+            while self._size > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """
+    :return: the shared response cache, None if SCRAPER_CACHE_DIR is not set
+    """
+    global _response_cache  # pylint: disable=global-statement
+
+    if _response_cache is None and SCRAPER_CACHE_DIR:
+        _response_cache = ResponseCache(cache_dir=SCRAPER_CACHE_DIR)
+    return _response_cache
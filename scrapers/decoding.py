@@ -0,0 +1,139 @@
+"""
+JSON decoding for scrapers responses.
+
+- json_loads: fast decoding of whole documents, orjson is used if it is installed
+  (it is an optional dependency), it falls back to the standard json module otherwise.
+- iter_json_array: incremental decoding of a (nested) json array from a byte stream.
+"""
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Sequence
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def json_loads(content: bytes | str) -> Any:
+    """
+    :param content: (bytes) a json document, e.g. a response body
+    :return: the decoded json document
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class _JsonStreamReader:
+    """
+    Reads json values from a stream of byte chunks, keeping in memory
+    just the data from the current position to the end of the last chunk read.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        Read the next chunk, dropping the data already consumed.
+        :return: (bool) False if there are no more chunks
+        """
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.buffer = self.buffer[self.pos :] + self._utf8_decoder.decode(b"", final=True)
+            self.pos = 0
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + self._utf8_decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        :return: (str) the next non whitespace char, without consuming it ("" at the end)
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof or not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """
+        Consume the next non whitespace char.
+        :raises: ValueError if it is not one of chars
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected one of {chars!r} at {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def read_value(self) -> Any:
+        """
+        Decode the next json value, reading more chunks while it is incomplete.
+        """
+        while True:
+            self.peek()
+            try:
+                value, end = self._json_decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            if end == len(self.buffer) and not self.eof:
+                self.fill()  # a number could go on in the next chunk
+                continue
+            self.pos = end
+            return value
+
+    def enter_key(self, key: str) -> bool:
+        """
+        Move into the value of the key of the next object, skipping the previous keys values.
+        :return: (bool) False if the object has no such key
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            return False
+        while True:
+            current_key = self.read_value()
+            self.expect(":")
+            if current_key == key:
+                return True
+            self.read_value()
+            if self.expect(",}") == "}":
+                return False
+
+
+def iter_json_array(chunks: Iterable[bytes], path: Sequence[str] = ()) -> Iterator[Any]:
+    """
+    Incrementally decode the items of a json array from a stream of byte chunks,
+    yielding them one at a time, so the whole document is never kept in memory.
+    e.g. iter_json_array(response.iter_content(65536), ("hits", "hits"))
+    :param chunks: (iterable) the json document bytes, split in any way
+    :param path: (sequence) the keys of the nested objects the array is in,
+                 the root value is the array if not given
+    :return: an iterator of the decoded array items, empty if the path does not exist
+    :raises: ValueError if the document is malformed
+    """
+    reader = _JsonStreamReader(chunks)
+    for key in path:
+        if not reader.enter_key(key):
+            return
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.read_value()
+        if reader.expect(",]") == "]":
+            return
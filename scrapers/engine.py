@@ -0,0 +1,136 @@
+"""
+Async HTTP engine for scrapers.
+
+Blocking HTTP calls are offloaded to a thread pool shared by all scrapers,
+and the number of requests in flight is bounded by a process-wide limit,
+so thousands of scraping coroutines can run without stalling the event loop
+or flooding the upstream.
+Within that limit, a group of coroutines (e.g. the scraping of a region) can get
+its own smaller concurrency budget, see concurrency_budget.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+from scrapers.settings import SCRAPER_MAX_CONCURRENCY
+
+_max_concurrency = SCRAPER_MAX_CONCURRENCY
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# (max concurrency, semaphore) of the budget of the running coroutine, if any
+_budget: contextvars.ContextVar = contextvars.ContextVar("scrapers_budget", default=None)
+
+
+def get_max_concurrency() -> int:
+    """
+    :return: (int) the max number of HTTP requests in flight for the whole process
+    """
+    return _max_concurrency
+
+
+def set_max_concurrency(max_concurrency: int) -> None:
+    """
+    Set the max number of HTTP requests in flight for the whole process.
+    Requests already in flight are not affected.
+
+    :param max_concurrency: (int) a positive number of concurrent requests
+    :raises: ValueError if max_concurrency is not a positive int
+    """
+    global _max_concurrency, _executor  # pylint: disable=global-statement
+
+    if not isinstance(max_concurrency, int) or max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be a positive int, not {max_concurrency}")
+
+    with _executor_lock:
+        _max_concurrency = max_concurrency
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    _semaphores.clear()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor  # pylint: disable=global-statement
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_max_concurrency, thread_name_prefix="scraper"
+            )
+        return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """
+    asyncio primitives are bound to the loop they are used in,
+    so a semaphore is kept for each running loop.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_concurrency)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+@contextlib.contextmanager
+def concurrency_budget(max_concurrency: int) -> Iterator[None]:
+    """
+    Bound the requests in flight of the running coroutine, and of the tasks
+    it creates meanwhile, to max_concurrency (on top of the process-wide limit),
+    so concurrent groups of requests (e.g. regions) do not starve each other.
+
+    e.g.
+        with concurrency_budget(16):
+            await get_flixbus_trips(region)
+
+    :param max_concurrency: (int) a positive number of concurrent requests
+    :raises: ValueError if max_concurrency is not a positive int
+    """
+    if not isinstance(max_concurrency, int) or max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be a positive int, not {max_concurrency}")
+
+    token = _budget.set((max_concurrency, asyncio.Semaphore(max_concurrency)))
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+
+def get_concurrency_budget() -> int:
+    """
+    :return: (int) the max number of HTTP requests in flight for the running coroutine,
+             its concurrency budget if it has one, the process-wide limit otherwise
+    """
+    budget = _budget.get()
+    if budget is None:
+        return _max_concurrency
+    return min(budget[0], _max_concurrency)
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking callable (e.g. an HTTP request) in the scrapers thread pool,
+    waiting for a free slot of its concurrency budget, if any,
+    and of the global concurrency limit first.
+
+    :param func: (callable) the blocking function to be run
+    :return: (any) the func result
+    """
+    budget = _budget.get()
+    if budget is None:
+        return await _run_in_executor(func, *args, **kwargs)
+    async with budget[1]:
+        return await _run_in_executor(func, *args, **kwargs)
+
+
+async def _run_in_executor(func: Callable, *args, **kwargs) -> Any:
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
@@ -4,13 +4,15 @@ Implements flixbus bus trips web scraping.
 This module contains classes for scraping bus station data from the Flixbus website.
 It includes scraping and parsing classes
 """
+import asyncio
 import logging
-from typing import Any
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
 
 from pydantic import validator
 from pydantic.dataclasses import dataclass
 
-from scrapers import BaseParser, BaseScraper
+from scrapers import BaseParser, BaseScraper, iter_json_array, run_blocking
 from settings import APP_NAME
 
 logger = logging.getLogger(APP_NAME)
@@ -23,10 +25,18 @@ class FlixbusBusStationsScraper(BaseScraper):
     A class for scraping bus station data from the Flixbus
     website. It extends the `BaseScraper` class and provides a custom query for fetching
     cities that can be reached by bus from a given region.
+
+    The region can be split into a grid of tiles (bounding boxes), fetched in parallel
+    and paginated by query_size hits, see aiter_tiled_hits.
+
+    Responses are streamed (see iter_hits), and streamed responses are not cached,
+    as caching them would keep the whole decoded response in memory, so there is no cache_ttl.
     """
 
     region: str = "EU"
     query_size: int = 3000  # cities to get (all EU cities count around 2800)
+    bounding_box: Any = None  # a tile of the region, as region_coordinates, the region if None
+    offset: int = 0  # the first hit to get, for paginating the results
 
     def __post_init__(self):
         self.endpoint_uris = ["https://d1ioiftasz4l3w.cloudfront.net/cities_v2/_search"]
@@ -67,6 +77,124 @@ class FlixbusBusStationsScraper(BaseScraper):
                     "top_left": {"lat": -11.60919340793894, "lon": -86.83593750000001},
                 }
 
+    @property
+    def search_bounding_box(self) -> dict[str, dict[str, float]]:
+        return self.bounding_box or self.region_coordinates
+
+    def tiles(self, rows: int, cols: int) -> list["FlixbusBusStationsScraper"]:
+        """
+        Split the search bounding box into a grid of rows x cols tiles.
+        Stations on the edges of two tiles are found in both of them.
+        :return: (list) a scraper for each tile
+        """
+        if rows < 1 or cols < 1:
+            raise ValueError("rows and cols must be positive ints")
+
+        top_left, bottom_right = (
+            self.search_bounding_box["top_left"],
+            self.search_bounding_box["bottom_right"],
+        )
+        lat_step = (top_left["lat"] - bottom_right["lat"]) / rows
+        lon_step = (bottom_right["lon"] - top_left["lon"]) / cols
+        return [
+            FlixbusBusStationsScraper(
+                region=self.region,
+                query_size=self.query_size,
+                bounding_box={
+                    "top_left": {
+                        "lat": top_left["lat"] - row * lat_step,
+                        "lon": top_left["lon"] + col * lon_step,
+                    },
+                    "bottom_right": {
+                        "lat": top_left["lat"] - (row + 1) * lat_step,
+                        "lon": top_left["lon"] + (col + 1) * lon_step,
+                    },
+                },
+            )
+            for row in range(rows)
+            for col in range(cols)
+        ]
+
+    def iter_all_hits(self, method: str = "POST") -> Iterator[dict]:
+        """
+        Like iter_hits, requesting the next pages of query_size hits
+        while the current page is full.
+        """
+        offset = self.offset
+        while True:
+            page_scraper = FlixbusBusStationsScraper(
+                region=self.region,
+                query_size=self.query_size,
+                bounding_box=self.bounding_box,
+                offset=offset,
+            )
+            page_hits_count = 0
+            for hit in page_scraper.iter_hits(method=method):
+                page_hits_count += 1
+                yield hit
+            if page_hits_count < self.query_size:
+                return
+            offset += self.query_size
+
+    async def aiter_tiled_hits(
+        self,
+        rows: int,
+        cols: int,
+        method: str = "POST",
+        consume: Callable[[Iterator[dict]], Any] = list,
+    ) -> AsyncIterator[Any]:
+        """
+        Get the hits of every tile of the search bounding box in parallel,
+        deduplicated by station id while they are streamed: the hits of each tile
+        are passed to consume in its scrapers thread, skipping the stations already
+        found in other tiles, so no tile response is kept in memory as a whole.
+        :param rows: (int) rows of the tiles grid
+        :param cols: (int) cols of the tiles grid
+        :param consume: (callable) gets the iterator of new hits of a tile,
+                        e.g. a parser, list by default
+        :return: an async iterator of the consume result of each tile, as they are done
+        """
+        seen_ids, duplicated_count = set(), 0
+        lock = threading.Lock()
+
+        def iter_new_hits(tile: FlixbusBusStationsScraper) -> Iterator[dict]:
+            nonlocal duplicated_count
+            for hit in tile.iter_all_hits(method=method):
+                station_id = hit.get("_source", {}).get("id")
+                if station_id is None:
+                    logger.error(f"Malformed hit {hit}")
+                    continue
+                with lock:
+                    if station_id in seen_ids:
+                        duplicated_count += 1
+                        continue
+                    seen_ids.add(station_id)
+                yield hit
+
+        tiles_results = [
+            run_blocking(lambda tile=tile: consume(iter_new_hits(tile)))
+            for tile in self.tiles(rows, cols)
+        ]
+        for tile_result in asyncio.as_completed(tiles_results):
+            yield await tile_result
+
+        logger.info(
+            f"Got {len(seen_ids)} bus stations from {rows}x{cols} tiles "
+            f"({duplicated_count} duplicated)."
+        )
+
+    def iter_hits(self, method: str = "POST", chunk_size: int = 64 * 1024) -> Iterator[dict]:
+        """
+        Yield the hits (bus stations) of the search response one at a time,
+        decoded incrementally from the response byte stream,
+        so the whole response is never kept in memory, whatever the query_size.
+        :param method: 'GET' or 'POST', POST by default as the query is sent as its body
+        :param chunk_size: (int) max size in bytes of the response chunks read at once
+        :return: an iterator of hits, e.g. {"_source": {"id": 88, "name": "Berlin", ...}}
+        """
+        for chunks in self.iter_stream(method=method, chunk_size=chunk_size):
+            yield from iter_json_array(chunks, ("hits", "hits"))
+
     @property
     def query(self):
         """
@@ -80,11 +208,11 @@ class FlixbusBusStationsScraper(BaseScraper):
             "_source": ["name", "location", "id", "search_volume", "uuid", "reachable"],
             # _source keys available: ['_language', 'name', 'location', 'id',
             # 'search_volume', 'field_site', 'uuid', 'reachable', 'slug', 'transportation_category']
-            "from": 0,
+            "from": self.offset,
             "query": {
                 "bool": {
                     "filter": [
-                        {"geo_bounding_box": {"location": self.region_coordinates}},
+                        {"geo_bounding_box": {"location": self.search_bounding_box}},
                         {"terms": {"transportation_category": ["bus"]}},
                     ],  # 'flixtrain', 'train'
                     "must": [
@@ -94,7 +222,8 @@ class FlixbusBusStationsScraper(BaseScraper):
                 }
             },
             "size": self.query_size,
-            "sort": [{"search_volume": {"order": "desc"}}],
+            # the id breaks search volume ties, so pages do not skip or repeat hits
+            "sort": [{"search_volume": {"order": "desc"}}, {"id": {"order": "asc"}}],
         }
 
 
@@ -113,11 +242,19 @@ class FlixbusBusStationsParser(BaseParser):
         """
         Gets the result of get_data() method, parses it to be proceeded and stored
         """
-        [scraped_data] = self.scraped_data
+        return list(self.iter_items())
 
-        city_items = []
+    def iter_items(self, hits: Iterable[dict] | None = None) -> Iterator[dict[str, Any]]:
+        """
+        Parse hits one at a time, e.g. as they are streamed by FlixbusBusStationsScraper.iter_hits
+        :param hits: (iterable) the hits to parse, the scraped_data hits if not given
+        :return: an iterator of city items
+        """
+        if hits is None:
+            [scraped_data] = self.scraped_data
+            hits = scraped_data["hits"]["hits"]
 
-        for hit in scraped_data["hits"]["hits"]:
+        for hit in hits:
             try:
                 source = hit["_source"]
             except KeyError:
@@ -129,8 +266,4 @@ class FlixbusBusStationsParser(BaseParser):
                 for k in ["id", "name", "uuid", "location", "search_volume", "reachable"]
             ]
             item_data.append(("region", self.region))
-            item = dict(item_data)
-
-            city_items.append(item)
-
-        return city_items
+            yield dict(item_data)
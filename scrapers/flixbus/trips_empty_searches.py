@@ -0,0 +1,334 @@
+"""
+Negative cache of flixbus trips searches without rides.
+
+Many routes have no rides on some weekdays or dates, and no route has rides
+beyond the last date on sale (its service horizon), so those searches are learned
+and skipped:
+- by date: a search found empty is skipped while its confidence is high enough,
+  the confidence halves each half_life seconds, so it is searched again eventually,
+- by weekday: discounted counts of empty and total searches of each weekday
+  up to the route last date with rides,
+  once a weekday is (almost) always empty it is skipped, with the same decaying confidence,
+- service horizon: the last date with rides of the route, once at least min_empty_beyond
+  later dates were found empty in the last horizon_ttl seconds, further dates are not searched,
+  older empty searches expire, so the horizon is checked again once they are over.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any
+
+from pydantic.dataclasses import dataclass
+
+from scrapers.flixbus.trips_freshness import today
+from settings import APP_NAME
+
+if TYPE_CHECKING:
+    from scrapers.flixbus.trips_freshness import TripsFreshnessIndex
+
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.DEBUG)
+
+
+@dataclass
+class EmptySearchesPolicy:
+    """
+    The confidence and service horizon parameters of an EmptySearchesCache.
+
+    :param min_confidence: (float) min confidence of a search being empty for skipping it
+    :param half_life: (float) seconds for the confidence of an observation to halve
+    :param min_weekday_searches: (float) min (discounted) searches of a weekday to trust it
+    :param decay: (float) discount of the weekday counters on each observation
+    :param min_empty_beyond: (int) empty dates after the last date with rides
+                             for taking it as the route service horizon
+    :param horizon_ttl: (float) seconds an empty search beyond the last date with rides
+                        counts for the service horizon
+    """
+
+    min_confidence: float = 0.8
+    half_life: float = 7 * 24 * 60 * 60
+    min_weekday_searches: float = 4
+    decay: float = 0.9
+    min_empty_beyond: int = 3
+    horizon_ttl: float = 24 * 60 * 60
+
+    def __post_init__(self):
+        if not 0 < self.min_confidence <= 1:
+            raise ValueError("min_confidence must be in (0, 1]")
+
+    def confidence(self, observed_at: float, now: float) -> float:
+        """
+        :return: (float) 1 for an observation just made, halving each half_life seconds
+        """
+        return 0.5 ** (max(now - observed_at, 0) / self.half_life)
+
+
+class EmptySearchesCache:
+    """
+    A thread-safe negative cache of trips searches, by route and date or weekday.
+
+    :param policy: (EmptySearchesPolicy) the confidence and horizon parameters,
+                   the default ones if not given
+    :param file_path: (str) the json file the cache is loaded from and saved to,
+                      the cache is kept in memory only if not given
+    """
+
+    def __init__(self, policy: EmptySearchesPolicy | None = None, file_path: str | None = None):
+        self.policy = EmptySearchesPolicy() if policy is None else policy
+        self.file_path = file_path
+
+        self._lock = threading.Lock()
+        # "departure_uuid:arrival_uuid": {
+        #     "dates": {"YYYY-MM-DD": empty search timestamp},
+        #     "weekdays": [[empty searches, searches, last search timestamp], ...x7],
+        #     "last_ride_date": "YYYY-MM-DD",
+        #     "empty_beyond": {"YYYY-MM-DD": empty search timestamp},
+        # }
+        self._routes: dict[str, dict[str, Any]] = {}
+        self.skipped_searches = 0
+        if file_path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    @staticmethod
+    def _route(departure_city_uuid: str, arrival_city_uuid: str) -> str:
+        return f"{departure_city_uuid}:{arrival_city_uuid}"
+
+    def _new_route(self) -> dict[str, Any]:
+        return {
+            "dates": {},
+            "weekdays": [[0.0, 0.0, 0.0] for _ in range(7)],
+            "last_ride_date": None,
+            "empty_beyond": {},
+        }
+
+    def record(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        empty: bool,
+        now: float | None = None,
+    ) -> None:
+        """
+        Record the result of a search.
+
+        :param empty: (bool) True if the search had no rides
+        """
+        now = time.time() if now is None else now
+        departure_date_str = departure_date.isoformat()
+        with self._lock:
+            route = self._routes.setdefault(
+                self._route(departure_city_uuid, arrival_city_uuid), self._new_route()
+            )
+
+            last_ride_date = route["last_ride_date"]
+            beyond_last_ride = last_ride_date is not None and departure_date_str > last_ride_date
+            # empty dates beyond the last ride may be beyond the service horizon,
+            # empty whatever their weekday, so they are counted once a later ride is found
+            if not (empty and beyond_last_ride):
+                self._count_weekday(route, departure_date, empty, now)
+
+            if empty:
+                route["dates"][departure_date_str] = now
+                if beyond_last_ride:
+                    route["empty_beyond"][departure_date_str] = now
+                return
+
+            route["dates"].pop(departure_date_str, None)
+            if route["last_ride_date"] is None or departure_date_str > route["last_ride_date"]:
+                route["last_ride_date"] = departure_date_str
+                empty_beyond = {}
+                for empty_date, empty_at in route["empty_beyond"].items():
+                    if empty_date > departure_date_str:
+                        empty_beyond[empty_date] = empty_at
+                    else:
+                        self._count_weekday(route, date.fromisoformat(empty_date), True, now)
+                route["empty_beyond"] = empty_beyond
+
+    def _count_weekday(
+        self, route: dict[str, Any], departure_date: date, empty: bool, now: float
+    ) -> None:
+        weekday = route["weekdays"][departure_date.weekday()]
+        weekday[0] = weekday[0] * self.policy.decay + empty
+        weekday[1] = weekday[1] * self.policy.decay + 1
+        weekday[2] = now
+
+    def service_horizon(
+        self, departure_city_uuid: str, arrival_city_uuid: str, now: float | None = None
+    ) -> date | None:
+        """
+        :return: (date) the last date with rides of the route, None if it is unknown
+                 or less than min_empty_beyond later dates were found empty
+                 in the last horizon_ttl seconds
+        """
+        now = time.time() if now is None else now
+        route = self._routes.get(self._route(departure_city_uuid, arrival_city_uuid))
+        if route is None or route["last_ride_date"] is None:
+            return None
+        fresh_empty_beyond = sum(
+            now - empty_at <= self.policy.horizon_ttl for empty_at in route["empty_beyond"].values()
+        )
+        if fresh_empty_beyond < self.policy.min_empty_beyond:
+            return None
+        return date.fromisoformat(route["last_ride_date"])
+
+    def empty_confidence(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        now: float | None = None,
+    ) -> float:
+        """
+        :return: (float) the confidence, between 0 and 1, of a search having no rides
+        """
+        now = time.time() if now is None else now
+        route = self._routes.get(self._route(departure_city_uuid, arrival_city_uuid))
+        if route is None:
+            return 0.0
+
+        confidence = 0.0
+        empty_at = route["dates"].get(departure_date.isoformat())
+        if empty_at is not None:
+            confidence = self.policy.confidence(empty_at, now)
+
+        empty_searches, searches, searched_at = route["weekdays"][departure_date.weekday()]
+        if searches >= self.policy.min_weekday_searches:
+            confidence = max(
+                confidence, empty_searches / searches * self.policy.confidence(searched_at, now)
+            )
+        return confidence
+
+    def should_skip(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        now: float | None = None,
+    ) -> bool:
+        """
+        :return: (bool) True if the search is beyond the route service horizon,
+                 or it is confidently known to have no rides
+        """
+        service_horizon = self.service_horizon(departure_city_uuid, arrival_city_uuid, now)
+        skip = (service_horizon is not None and departure_date > service_horizon) or (
+            self.empty_confidence(departure_city_uuid, arrival_city_uuid, departure_date, now)
+            >= self.policy.min_confidence
+        )
+        if skip:
+            self.skipped_searches += 1
+        return skip
+
+    def prune(self, from_date: date | None = None, now: float | None = None) -> None:
+        """
+        Remove the empty searches of past departure dates,
+        and the empty searches beyond the service horizon older than horizon_ttl.
+        """
+        from_date_str = (from_date or today()).isoformat()
+        now = time.time() if now is None else now
+        with self._lock:
+            for route in self._routes.values():
+                route["dates"] = {
+                    departure_date: empty_at
+                    for departure_date, empty_at in route["dates"].items()
+                    if departure_date >= from_date_str
+                }
+                route["empty_beyond"] = {
+                    departure_date: empty_at
+                    for departure_date, empty_at in route["empty_beyond"].items()
+                    if departure_date >= from_date_str and now - empty_at <= self.policy.horizon_ttl
+                }
+
+    def load(self) -> None:
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            logger.info(f"No empty trips searches in {self.file_path}, starting from scratch.")
+            return
+        with self._lock:
+            self._routes = data
+
+    def save(self) -> None:
+        """
+        Save the cache to file_path, without past departure dates nor expired horizons.
+        """
+        self.prune()
+        with self._lock:
+            content = json.dumps(self._routes)
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, self.file_path)
+
+
+class SearchFilters:
+    """
+    The trips searches to be skipped, none if neither filter is given.
+
+    :param freshness_index: (TripsFreshnessIndex) fresh searches are skipped if given
+    :param empty_searches: (EmptySearchesCache) searches without rides are skipped if given
+    """
+
+    __slots__ = ("freshness_index", "empty_searches")
+
+    def __init__(
+        self,
+        freshness_index: TripsFreshnessIndex | None = None,
+        empty_searches: EmptySearchesCache | None = None,
+    ):
+        self.freshness_index = freshness_index
+        self.empty_searches = empty_searches
+
+    def __bool__(self) -> bool:
+        return self.freshness_index is not None or self.empty_searches is not None
+
+    def should_skip(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        now: float | None = None,
+    ) -> bool:
+        """
+        :return: (bool) True if the search is still fresh in the freshness index,
+                 or it is known to have no rides in the empty searches cache
+        """
+        return (
+            self.freshness_index is not None
+            and not self.freshness_index.is_stale(
+                departure_city_uuid, arrival_city_uuid, departure_date, now
+            )
+        ) or (
+            self.empty_searches is not None
+            and self.empty_searches.should_skip(
+                departure_city_uuid, arrival_city_uuid, departure_date, now
+            )
+        )
+
+
+def service_horizon_days(
+    empty_searches: EmptySearchesCache | None,
+    departure_city_uuid: str,
+    arrival_city_uuid: str,
+    start_date: date,
+    days: int,
+) -> int:
+    """
+    :return: (int) the number of days from start_date to be searched,
+             up to the route service horizon if it is known
+    """
+    if empty_searches is None:
+        return days
+    service_horizon = empty_searches.service_horizon(departure_city_uuid, arrival_city_uuid)
+    if service_horizon is None:
+        return days
+    return max(min(days, (service_horizon - start_date + timedelta(days=1)).days), 0)
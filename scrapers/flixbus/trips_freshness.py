@@ -0,0 +1,186 @@
+"""
+Freshness of scraped flixbus trips searches.
+
+Prices of near departures change much more often than the ones months ahead,
+so each (route, departure date) search is kept fresh for a TTL that grows
+with the departure horizon (days from today), and it is just scraped again once stale.
+The TTL tiers can be overridden for single routes.
+
+The last scrape time of each search is kept in a TripsFreshnessIndex,
+persisted as a json file between cycles.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Iterable
+
+import pytz
+
+from settings import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.DEBUG)
+
+# (max days ahead, ttl in seconds), the last tier applies to every further date
+DEFAULT_FRESHNESS_TTLS = (
+    (1, 15 * 60),
+    (7, 60 * 60),
+    (30, 6 * 60 * 60),
+    (365, 24 * 60 * 60),
+)
+
+
+def today() -> date:
+    return datetime.now(pytz.timezone("Europe/Madrid")).date()
+
+
+class FreshnessPolicy:
+    """
+    :param ttls: (iterable) (max days ahead, ttl in seconds) tiers, e.g. ((1, 900), (7, 3600))
+    :param route_ttls: (dict) tiers by (departure city uuid, arrival city uuid),
+                       overriding the default ones for those routes
+    """
+
+    def __init__(
+        self,
+        ttls: Iterable[tuple[int, float]] = DEFAULT_FRESHNESS_TTLS,
+        route_ttls: dict[tuple[str, str], Iterable[tuple[int, float]]] | None = None,
+    ):
+        self.ttls = self._sorted_tiers(ttls)
+        self.route_ttls = {
+            route: self._sorted_tiers(route_tiers)
+            for route, route_tiers in (route_ttls or {}).items()
+        }
+
+    @staticmethod
+    def _sorted_tiers(ttls: Iterable[tuple[int, float]]) -> tuple[tuple[int, float], ...]:
+        tiers = tuple(sorted(ttls))
+        if not tiers:
+            raise ValueError("at least a ttl tier is required")
+        if any(ttl < 0 for _, ttl in tiers):
+            raise ValueError("ttls must be positive numbers")
+        return tiers
+
+    def ttl(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        from_date: date | None = None,
+    ) -> float:
+        """
+        :param from_date: (date) the date the horizon is computed from, today if not given
+        :return: (float) seconds a search of the route and date is fresh
+        """
+        days_ahead = (departure_date - (from_date or today())).days
+        tiers = self.route_ttls.get((departure_city_uuid, arrival_city_uuid), self.ttls)
+        for max_days_ahead, ttl in tiers:
+            if days_ahead <= max_days_ahead:
+                return ttl
+        return tiers[-1][1]
+
+
+class TripsFreshnessIndex:
+    """
+    A thread-safe index of the last scrape time of each (route, departure date) search.
+
+    :param policy: (FreshnessPolicy) the TTLs of the searches
+    :param file_path: (str) the json file the index is loaded from and saved to,
+                      the index is kept in memory only if not given
+    """
+
+    def __init__(self, policy: FreshnessPolicy | None = None, file_path: str | None = None):
+        self.policy = policy or FreshnessPolicy()
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        # "departure_uuid:arrival_uuid": {"YYYY-MM-DD": timestamp}
+        self._last_scraped: dict[str, dict[str, float]] = {}
+        if file_path:
+            self.load()
+
+    def __len__(self) -> int:
+        return sum(len(dates) for dates in self._last_scraped.values())
+
+    def last_scraped(
+        self, departure_city_uuid: str, arrival_city_uuid: str, departure_date: date
+    ) -> float | None:
+        """
+        :return: (float) the timestamp of the last scrape, None if it was never scraped
+        """
+        route_dates = self._last_scraped.get(f"{departure_city_uuid}:{arrival_city_uuid}", {})
+        return route_dates.get(departure_date.isoformat())
+
+    def is_stale(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        now: float | None = None,
+    ) -> bool:
+        """
+        :return: (bool) True if the search was never scraped or its TTL is over
+        """
+        last_scraped = self.last_scraped(departure_city_uuid, arrival_city_uuid, departure_date)
+        if last_scraped is None:
+            return True
+        now = time.time() if now is None else now
+        ttl = self.policy.ttl(departure_city_uuid, arrival_city_uuid, departure_date)
+        return now - last_scraped >= ttl
+
+    def mark_scraped(
+        self,
+        departure_city_uuid: str,
+        arrival_city_uuid: str,
+        departure_date: date,
+        scraped_at: float | None = None,
+    ) -> None:
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        with self._lock:
+            route_dates = self._last_scraped.setdefault(
+                f"{departure_city_uuid}:{arrival_city_uuid}", {}
+            )
+            route_dates[departure_date.isoformat()] = scraped_at
+
+    def prune(self, from_date: date | None = None) -> None:
+        """
+        Remove the searches of past departure dates.
+        """
+        from_date_str = (from_date or today()).isoformat()
+        with self._lock:
+            for route in list(self._last_scraped):
+                route_dates = {
+                    departure_date: scraped_at
+                    for departure_date, scraped_at in self._last_scraped[route].items()
+                    if departure_date >= from_date_str
+                }
+                if route_dates:
+                    self._last_scraped[route] = route_dates
+                else:
+                    del self._last_scraped[route]
+
+    def load(self) -> None:
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            logger.info(f"No trips freshness index in {self.file_path}, starting from scratch.")
+            return
+        with self._lock:
+            self._last_scraped = data
+
+    def save(self) -> None:
+        """
+        Save the index to file_path, without past departure dates.
+        """
+        self.prune()
+        with self._lock:
+            content = json.dumps(self._last_scraped)
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, self.file_path)
@@ -0,0 +1,193 @@
+"""
+Compact work units for flixbus trips scraping.
+
+A scrape job is a (departure city, arrival city, departure date) search.
+Instead of a validated FlixbusTripsScraper (and its urls) for each route,
+city uuids are interned into a packed table, routes are kept as pairs of city indexes
+in an array, and jobs are generated on demand by a planner.
+"""
+from __future__ import annotations
+
+import random
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Iterator
+
+import pytz
+
+from pipelines.settings import SCRAP_DAYS
+from scrapers.flixbus.trips_scraper import FlixbusTripsScraper, search_trips_uri
+
+
+class CityUuidTable:
+    """
+    Interns city uuids into dense int indexes,
+    indexes are resolved back to uuids from a packed bytearray (16 bytes each).
+    """
+
+    __slots__ = ("_packed", "_indexes")
+
+    def __init__(self):
+        self._packed = bytearray()
+        self._indexes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def intern(self, city_uuid: str) -> int:
+        """
+        :param city_uuid: (str) a city uuid, e.g. '40de8964-8646-11e6-9066-549f350fcb0c'
+        :return: (int) the city index, the same one for the same uuid
+        :raises: ValueError if city_uuid is not a valid uuid
+        """
+        index = self._indexes.get(city_uuid)
+        if index is None:
+            self._packed += uuid.UUID(city_uuid).bytes
+            index = len(self._indexes)
+            self._indexes[city_uuid] = index
+        return index
+
+    def get(self, city_uuid: str) -> int | None:
+        """
+        :return: (int) the city index, None if the uuid was not interned
+        """
+        return self._indexes.get(city_uuid)
+
+    def uuid(self, index: int) -> str:
+        """
+        :param index: (int) a city index
+        :return: (str) the city uuid
+        """
+        if not 0 <= index < len(self._indexes):
+            raise IndexError(f"city index {index} out of range")
+        return str(uuid.UUID(bytes=bytes(self._packed[index * 16 : (index + 1) * 16])))
+
+
+class TripJob:
+    """
+    A single trips search: route (by city indexes) and departure date (as a day offset).
+    """
+
+    __slots__ = ("departure_idx", "arrival_idx", "day_offset")
+
+    def __init__(self, departure_idx: int, arrival_idx: int, day_offset: int):
+        self.departure_idx = departure_idx
+        self.arrival_idx = arrival_idx
+        self.day_offset = day_offset
+
+    @property
+    def route(self) -> tuple[int, int]:
+        return self.departure_idx, self.arrival_idx
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, TripJob) and (
+            self.departure_idx,
+            self.arrival_idx,
+            self.day_offset,
+        ) == (other.departure_idx, other.arrival_idx, other.day_offset)
+
+    def __hash__(self) -> int:
+        return hash((self.departure_idx, self.arrival_idx, self.day_offset))
+
+    def __repr__(self) -> str:
+        return f"TripJob({self.departure_idx}, {self.arrival_idx}, {self.day_offset})"
+
+
+class TripsJobPlanner:
+    """
+    Keeps the routes to be scraped in an array of city indexes pairs
+    and yields trip jobs or scrapers for them on demand.
+
+    :param start_date: (datetime) the first departure date, now if not given
+    :param days: (int) days to scrape after start_date, SCRAP_DAYS if not given
+    :param cities: (CityUuidTable) a table shared between planners keeps city indexes stable
+    """
+
+    def __init__(
+        self,
+        start_date: datetime | None = None,
+        days: int | None = None,
+        cities: CityUuidTable | None = None,
+    ):
+        self.start_date = start_date or datetime.now(pytz.timezone("Europe/Madrid"))
+        self.days = int(SCRAP_DAYS) if days is None else days
+        self.cities = CityUuidTable() if cities is None else cities
+        self._routes = array("I")  # flat departure/arrival city indexes pairs
+
+    def __len__(self) -> int:
+        return len(self._routes) // 2
+
+    def add_route(self, departure_city_uuid: str, arrival_city_uuid: str) -> None:
+        self._routes.append(self.cities.intern(departure_city_uuid))
+        self._routes.append(self.cities.intern(arrival_city_uuid))
+
+    def add_routes(self, routes_to_search: list[dict[str, list[str]]]) -> None:
+        """
+        :param routes_to_search: (list[dict]) as FlixbusCitiesDataGetter returns them,
+                                 e.g. [{departure_city_uuid: [arrival_city_uuid, ...]}, ...]
+        """
+        for route in routes_to_search:
+            for departure_city, arrival_cities in route.items():
+                for arrival_city in arrival_cities:
+                    self.add_route(departure_city, arrival_city)
+
+    def iter_routes(self, shuffle: bool = False) -> Iterator[tuple[int, int]]:
+        """
+        :param shuffle: (bool) yield the routes in a random order
+        :return: an iterator of (departure city index, arrival city index)
+        """
+        routes = self._routes
+        route_numbers = range(len(self))
+        if shuffle:
+            route_numbers = random.sample(route_numbers, len(self))
+        for route_number in route_numbers:
+            yield routes[2 * route_number], routes[2 * route_number + 1]
+
+    def iter_jobs(self, shuffle: bool = False) -> Iterator[TripJob]:
+        """
+        :param shuffle: (bool) yield the routes in a random order
+        :return: an iterator of trip jobs, every date of a route one after the other
+        """
+        for departure_idx, arrival_idx in self.iter_routes(shuffle=shuffle):
+            for day_offset in range(self.days + 1):
+                yield TripJob(departure_idx, arrival_idx, day_offset)
+
+    def route_uuids(self, departure_idx: int, arrival_idx: int) -> tuple[str, str]:
+        return self.cities.uuid(departure_idx), self.cities.uuid(arrival_idx)
+
+    def job_departure_date(self, job: TripJob) -> datetime:
+        return self.start_date + timedelta(days=job.day_offset)
+
+    def job_uri(self, job: TripJob) -> str:
+        """
+        :return: (str) the search trips url of the job
+        """
+        departure_city_uuid, arrival_city_uuid = self.route_uuids(*job.route)
+        departure_date = self.job_departure_date(job).strftime("%d.%m.%Y")
+        return search_trips_uri(departure_city_uuid, arrival_city_uuid, departure_date)
+
+    def route_scraper(self, departure_idx: int, arrival_idx: int) -> FlixbusTripsScraper:
+        """
+        :return: a scraper for every date of the route
+        """
+        departure_city_uuid, arrival_city_uuid = self.route_uuids(departure_idx, arrival_idx)
+        return FlixbusTripsScraper(
+            departure_city_uuid=departure_city_uuid,
+            arrival_city_uuid=arrival_city_uuid,
+            start_date=self.start_date,
+            end_date=self.start_date + timedelta(days=self.days),
+        )
+
+    def job_scraper(self, job: TripJob) -> FlixbusTripsScraper:
+        """
+        :return: a scraper for the single search of the job
+        """
+        departure_city_uuid, arrival_city_uuid = self.route_uuids(*job.route)
+        departure_date = self.job_departure_date(job)
+        return FlixbusTripsScraper(
+            departure_city_uuid=departure_city_uuid,
+            arrival_city_uuid=arrival_city_uuid,
+            start_date=departure_date,
+            end_date=departure_date,
+        )
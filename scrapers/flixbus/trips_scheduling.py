@@ -0,0 +1,285 @@
+"""
+Priority scheduling of flixbus trips scrape jobs.
+
+Jobs are ordered by a weighted priority of:
+- departure soonness: the closer the departure date, the higher the priority,
+- route popularity: routes between popular cities (IsPopular) first,
+- staleness: routes not scraped for longer first,
+- yield: routes that produce cheap trips first, scored by a RouteYieldBandit (optional).
+
+Fairness is kept with virtual deadlines: a job is due at
+'scheduled time + fairness_horizon * (1 - priority)',
+so a low priority job waits at most fairness_horizon seconds after being scheduled
+before it goes ahead of any job scheduled later, whatever its priority.
+
+Routes can be scheduled all at once (schedule_routes) or one by one while they are read
+(add_route), e.g. from a streamed query result.
+
+The heap holds a single entry (cursor) for each route, pointing at its next departure date,
+so memory scales with the number of routes and not with routes x dates.
+
+With a freshness_index, jobs whose last search is still fresh are skipped,
+with an empty_searches cache, jobs known to have no rides are skipped too.
+With a max_jobs budget, just the highest priority jobs are popped,
+so the yield score decides which routes get the requests budget.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from typing import TYPE_CHECKING, Iterable
+
+from scrapers.flixbus.trips_empty_searches import SearchFilters
+from scrapers.flixbus.trips_jobs import TripJob, TripsJobPlanner
+
+if TYPE_CHECKING:
+    from scrapers.flixbus.trips_empty_searches import EmptySearchesCache
+    from scrapers.flixbus.trips_freshness import TripsFreshnessIndex
+    from scrapers.flixbus.trips_yield import RouteYieldBandit
+
+
+def route_key(departure_idx: int, arrival_idx: int) -> int:
+    """
+    :return: (int) a single int key for a route, cheaper than a tuple as a dict key
+    """
+    return departure_idx << 32 | arrival_idx
+
+
+class JobPriority:
+    """
+    The weighted priority of a job, between 0 (lowest) and 1 (highest).
+
+    :param weights: (tuple) soonness, popularity, staleness and yield weights, normalized to sum 1
+    :param popular_cities: (set) indexes of the popular cities
+    :param bandit: (RouteYieldBandit) routes yield scores, no yield priority if not given
+    :param staleness_horizon: (float) seconds since the last scrape for the max staleness
+    """
+
+    __slots__ = ("weights", "popular_cities", "bandit", "staleness_horizon")
+
+    def __init__(
+        self,
+        weights: tuple[float, float, float, float],
+        popular_cities: set[int],
+        bandit: RouteYieldBandit | None,
+        staleness_horizon: float,
+    ):
+        self.weights = weights
+        self.popular_cities = popular_cities
+        self.bandit = bandit
+        self.staleness_horizon = staleness_horizon
+
+    def score(self, job: TripJob, days: int, last_scraped: float | None, now: float) -> float:
+        """
+        :param days: (int) the planner days, for the departure soonness
+        :param last_scraped: (float) timestamp of the route last scrape, None if never scraped
+        :return: (float) the job priority
+        """
+        soonness = 1 - job.day_offset / (days + 1)
+        popularity = (
+            (job.departure_idx in self.popular_cities) + (job.arrival_idx in self.popular_cities)
+        ) / 2
+        staleness = (
+            1.0
+            if last_scraped is None
+            else min(max(now - last_scraped, 0) / self.staleness_horizon, 1.0)
+        )
+        soonness_weight, popularity_weight, staleness_weight, yield_weight = self.weights
+        priority = (
+            soonness_weight * soonness
+            + popularity_weight * popularity
+            + staleness_weight * staleness
+        )
+        if self.bandit is not None:
+            priority += yield_weight * self.bandit.score(route_key(*job.route))
+        return priority
+
+
+class DeadlineQueue:
+    """
+    Jobs by virtual deadline, 'scheduled time + fairness_horizon * (1 - priority)',
+    jobs with the same deadline are popped in the order they were pushed.
+
+    :param fairness_horizon: (float) max seconds a job can be overtaken by later jobs
+    """
+
+    __slots__ = ("fairness_horizon", "_heap", "_counter")
+
+    def __init__(self, fairness_horizon: float):
+        self.fairness_horizon = fairness_horizon
+        self._heap: list[tuple[float, int, int, int, int]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, job: TripJob, priority: float, now: float) -> None:
+        deadline = now + self.fairness_horizon * (1 - priority)
+        heapq.heappush(
+            self._heap,
+            (deadline, next(self._counter), job.departure_idx, job.arrival_idx, job.day_offset),
+        )
+
+    def pop(self) -> TripJob | None:
+        """
+        :return: (TripJob) the job with the earliest deadline, None if there is no job
+        """
+        if not self._heap:
+            return None
+        _, _, departure_idx, arrival_idx, day_offset = heapq.heappop(self._heap)
+        return TripJob(departure_idx, arrival_idx, day_offset)
+
+
+class TripsPriorityScheduler:
+    """
+    :param planner: (TripsJobPlanner) the routes and dates to be scheduled
+    :param popular_city_uuids: (iterable) uuids of popular cities
+    :param last_scraped: (dict) route_key: timestamp of the last scrape,
+                         updated by mark_scraped, it can be shared between cycles
+    :param soonness_weight: (float) weight of departure soonness
+    :param popularity_weight: (float) weight of route popularity
+    :param staleness_weight: (float) weight of the time since the route last scrape
+    :param bandit: (RouteYieldBandit) routes yield scores, no yield priority if not given
+    :param yield_weight: (float) weight of the route yield score
+    :param max_jobs: (int) max number of jobs to be popped, no limit if not given
+    :param freshness_index: (TripsFreshnessIndex) fresh jobs are skipped if given
+    :param empty_searches: (EmptySearchesCache) jobs without rides are skipped if given
+    :param staleness_horizon: (float) seconds since the last scrape for the max staleness
+    :param fairness_horizon: (float) max seconds a job can be overtaken by later jobs
+    """
+
+    def __init__(
+        self,
+        planner: TripsJobPlanner,
+        popular_city_uuids: Iterable[str] = (),
+        last_scraped: dict[int, float] | None = None,
+        soonness_weight: float = 0.5,
+        popularity_weight: float = 0.3,
+        staleness_weight: float = 0.2,
+        bandit: RouteYieldBandit | None = None,
+        yield_weight: float = 0.5,
+        max_jobs: int | None = None,
+        freshness_index: TripsFreshnessIndex | None = None,
+        empty_searches: EmptySearchesCache | None = None,
+        staleness_horizon: float = 6 * 60 * 60,
+        fairness_horizon: float = 10 * 60,
+    ):
+        if bandit is None:
+            yield_weight = 0.0
+        weights = (soonness_weight, popularity_weight, staleness_weight, yield_weight)
+        weights_sum = sum(weights)
+        if weights_sum <= 0 or min(weights) < 0:
+            raise ValueError("weights must be positive numbers")
+
+        city_indexes = (planner.cities.get(city_uuid) for city_uuid in popular_city_uuids)
+        self.planner = planner
+        self.last_scraped = {} if last_scraped is None else last_scraped
+        self.job_priority = JobPriority(
+            tuple(weight / weights_sum for weight in weights),
+            {index for index in city_indexes if index is not None},
+            bandit,
+            staleness_horizon,
+        )
+        self.filters = SearchFilters(freshness_index, empty_searches)
+        self.max_jobs = max_jobs
+        self.popped_jobs = 0
+        self._queue = DeadlineQueue(fairness_horizon)
+
+    def __len__(self) -> int:
+        """
+        :return: (int) number of routes with pending jobs
+        """
+        return len(self._queue)
+
+    @property
+    def popular_cities(self) -> set[int]:
+        return self.job_priority.popular_cities
+
+    def priority(self, job: TripJob, now: float | None = None) -> float:
+        """
+        :return: (float) the job priority, between 0 (lowest) and 1 (highest)
+        """
+        now = time.time() if now is None else now
+        return self.job_priority.score(
+            job, self.planner.days, self.last_scraped.get(route_key(*job.route)), now
+        )
+
+    def push(self, job: TripJob, now: float | None = None) -> None:
+        """
+        Schedule a job, the rest of dates of its route are scheduled after it is popped.
+        """
+        now = time.time() if now is None else now
+        self._queue.push(job, self.priority(job, now), now)
+
+    def schedule_routes(self, now: float | None = None) -> None:
+        """
+        Schedule every date of every planner route.
+        """
+        for departure_idx, arrival_idx in self.planner.iter_routes():
+            self.push(TripJob(departure_idx, arrival_idx, 0), now)
+
+    def add_popular_city(self, city_uuid: str) -> None:
+        """
+        Flag a city as popular, for the jobs pushed from now on.
+        """
+        self.popular_cities.add(self.planner.cities.intern(city_uuid))
+
+    def add_route(
+        self, departure_city_uuid: str, arrival_city_uuid: str, now: float | None = None
+    ) -> None:
+        """
+        Add a route to the planner and schedule every date of it,
+        so routes can be scheduled (and popped) while the rest of them are still being read.
+        """
+        self.planner.add_route(departure_city_uuid, arrival_city_uuid)
+        self.push(
+            TripJob(
+                self.planner.cities.intern(departure_city_uuid),
+                self.planner.cities.intern(arrival_city_uuid),
+                0,
+            ),
+            now,
+        )
+
+    def should_skip(self, job: TripJob, now: float | None = None) -> bool:
+        """
+        :return: (bool) True if the job search is still fresh in the freshness index,
+                 or it is known to have no rides in the empty searches cache
+        """
+        if not self.filters:
+            return False
+        departure_city_uuid, arrival_city_uuid = self.planner.route_uuids(*job.route)
+        departure_date = self.planner.job_departure_date(job).date()
+        return self.filters.should_skip(departure_city_uuid, arrival_city_uuid, departure_date, now)
+
+    def pop(self, now: float | None = None) -> TripJob | None:
+        """
+        :return: (TripJob) the next stale job to be scraped,
+                 None if there is no pending job or max_jobs were already popped
+        """
+        while self._queue and (self.max_jobs is None or self.popped_jobs < self.max_jobs):
+            job = self._queue.pop()
+            if job.day_offset < self.planner.days:
+                self.push(TripJob(job.departure_idx, job.arrival_idx, job.day_offset + 1), now)
+            if self.should_skip(job, now):
+                continue
+            self.popped_jobs += 1
+            return job
+        return None
+
+    def mark_scraped(self, job: TripJob, scraped_at: float | None = None) -> None:
+        """
+        Record the job scrape time, for the route staleness and the job search freshness.
+        """
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        self.last_scraped[route_key(*job.route)] = scraped_at
+        freshness_index = self.filters.freshness_index
+        if freshness_index is not None:
+            departure_city_uuid, arrival_city_uuid = self.planner.route_uuids(*job.route)
+            freshness_index.mark_scraped(
+                departure_city_uuid,
+                arrival_city_uuid,
+                self.planner.job_departure_date(job).date(),
+                scraped_at,
+            )
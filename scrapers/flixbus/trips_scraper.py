@@ -3,16 +3,113 @@ Implements flixbus bus trips web scraping.
 
 This module contains a class for scraping and parsing Flixbus trips.
 """
+import logging
 import random
+from dataclasses import field
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Iterator
 
 import pytz
 from pydantic.dataclasses import dataclass
 from pydantic.functional_validators import field_validator
 
 from pipelines.settings import SCRAP_DAYS
-from scrapers import BaseScraper
+from scrapers import BaseScraper, ResponseSharing, json_loads, validated_endpoint_uris
+from scrapers.flixbus.trips_empty_searches import SearchFilters, service_horizon_days
+from scrapers.settings import SCRAPER_TRIPS_CACHE_TTL
+from settings import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.DEBUG)
+
+SEARCH_TRIPS_URI = "https://global.api.flixbus.com/search/service/v4"
+SEARCH_TRIPS_DEFAULT_PARAMS = (
+    "&products=%7B%22adult%22%3A1%7D&currency=EUR&search_by=cities&include_after_midnight_rides=1"
+)
+
+
+def search_trips_uri(departure_city_uuid: str, arrival_city_uuid: str, departure_date: str) -> str:
+    """
+    Build the url for searching trips between two cities in a date.
+    :param departure_city_uuid: (str) departure city uuid
+    :param arrival_city_uuid: (str) arrival city uuid
+    :param departure_date: (str) date with "%d.%m.%Y" format (e.g. "01.08.2023")
+    :return: (str) the search trips url
+    """
+    query_str = (
+        f"search?from_city_id={departure_city_uuid}&to_city_id={arrival_city_uuid}"
+        f"&departure_date={departure_date}"
+    )
+    return f"{SEARCH_TRIPS_URI}/{query_str}&{SEARCH_TRIPS_DEFAULT_PARAMS}"
+
+
+def project_trip_result(result: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    :return: (dict) the fields of a trip result used for tracking cheap trips,
+             None if any of them is missing
+    """
+    price = result.get("price") or {}
+    projected_result = {
+        "departure": {"date": (result.get("departure") or {}).get("date")},
+        "price": {"total": price.get("total"), "original": price.get("original")},
+        "available": {"seats": (result.get("available") or {}).get("seats")},
+    }
+    if None in (
+        projected_result["departure"]["date"],
+        projected_result["price"]["total"],
+        projected_result["price"]["original"],
+        projected_result["available"]["seats"],
+    ):
+        return None
+    return projected_result
+
+
+def project_trips_response(data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Keep just the fields of a search trips response used for tracking cheap trips
+    (see FlixbusTripsTracker), so the rest of the json tree can be freed right away.
+    Malformed trips (e.g. without cities) and results (e.g. without price) are skipped,
+    instead of failing the whole response.
+    e.g.
+    {
+        "cities": {city_id: {"name": "Berlin"}, ...},
+        "trips": [{
+            "departure_city_id": ..., "arrival_city_id": ...,
+            "results": {result_id: {
+                "departure": {"date": ...},
+                "price": {"total": ..., "original": ...},
+                "available": {"seats": ...},
+            }, ...},
+        }, ...],
+    }
+    """
+    cities = {
+        city_id: {"name": city["name"]}
+        for city_id, city in (data.get("cities") or {}).items()
+        if city.get("name")
+    }
+    trips = []
+    for trip in data.get("trips") or []:
+        departure_city_id = trip.get("departure_city_id")
+        arrival_city_id = trip.get("arrival_city_id")
+        if departure_city_id not in cities or arrival_city_id not in cities:
+            logger.debug(f"Skipped trip from {departure_city_id} to {arrival_city_id}, no cities")
+            continue
+        results = {}
+        for result_id, result in (trip.get("results") or {}).items():
+            projected_result = project_trip_result(result)
+            if projected_result is None:
+                logger.debug(f"Skipped malformed trip result {result_id}")
+                continue
+            results[result_id] = projected_result
+        trips.append(
+            {
+                "departure_city_id": departure_city_id,
+                "arrival_city_id": arrival_city_id,
+                "results": results,
+            }
+        )
+    return {"cities": cities, "trips": trips}
 
 
 @dataclass
@@ -23,6 +120,12 @@ class FlixbusTripsScraper(BaseScraper):
 
     It extends the `BaseScraper` class and provides methods
     for generating the URLs for searching trips in a set of dates.
+    With search_filters (SearchFilters), if a freshness_index is given,
+    just the URLs of the dates whose last search is stale are generated,
+    and if an empty_searches cache is given, dates known to have no rides
+    are skipped, and dates are not generated beyond the route service horizon.
+    Responses are decoded into a projection of the fields used for tracking cheap trips,
+    unless project_responses is False.
     """
 
     # TODO [bug] fix this: dataclass not fully defined
@@ -30,6 +133,11 @@ class FlixbusTripsScraper(BaseScraper):
     arrival_city_uuid: Any
     start_date: Any = None
     end_date: Any = None
+    sharing: Any = field(
+        default_factory=lambda: ResponseSharing(cache_ttl=SCRAPER_TRIPS_CACHE_TTL), kw_only=True
+    )
+    search_filters: Any = field(default_factory=SearchFilters, kw_only=True)  # SearchFilters
+    project_responses: bool = field(default=True, kw_only=True)
 
     @field_validator("departure_city_uuid")
     def validate_departure_city_uuid(cls, departure_city_uuid):
@@ -43,40 +151,78 @@ class FlixbusTripsScraper(BaseScraper):
             raise ValueError(f"arrival_city_uuid must be a str, not {type(arrival_city_uuid)}")
         return arrival_city_uuid
 
-    def dates_range_generator(self) -> list[str]:
+    def departure_dates_generator(self, shuffle: bool = False) -> Iterator[datetime]:
         """
-        Returns a list of str for dates with "%d.%m.%Y" format (e.g. "01.08.2023"),
-        between start and end dates
+        Yields the dates between start and end dates, generated on demand,
+        up to the route service horizon if it is known.
+        :param shuffle: (bool) yield the dates in a random order,
+                        just the day offsets are shuffled, not the dates
         """
         start_date = self.start_date
-        delta = self.end_date - self.start_date
-        dates_range = [start_date + timedelta(days=i) for i in range(delta.days + 1)]
-        return [date.strftime("%d.%m.%Y") for date in dates_range]
+        days = service_horizon_days(
+            self.search_filters.empty_searches,
+            self.departure_city_uuid,
+            self.arrival_city_uuid,
+            start_date.date(),
+            (self.end_date - self.start_date).days + 1,
+        )
+        day_offsets = random.sample(range(days), days) if shuffle else range(days)
+        for day_offset in day_offsets:
+            yield start_date + timedelta(days=day_offset)
 
-    def endpoint_uris_generator(self):
+    def dates_range_generator(self, shuffle: bool = False) -> Iterator[str]:
         """
-        Gen a set of urls for searching trips between the given cities,
-        in a range of dates.
+        Yields str dates with "%d.%m.%Y" format (e.g. "01.08.2023"),
+        between start and end dates, generated on demand.
+        :param shuffle: (bool) yield the dates in a random order
         """
+        for departure_date in self.departure_dates_generator(shuffle=shuffle):
+            yield departure_date.strftime("%d.%m.%Y")
 
-        search_trip_uri = "https://global.api.flixbus.com/search/service/v4"
-        default_params = (
-            "&products=%7B%22adult%22%3A1%7D&currency=EUR"
-            "&search_by=cities&include_after_midnight_rides=1"
-        )
+    def endpoint_uris_generator(self) -> Iterator[str]:
+        """
+        Gen a set of urls for searching trips between the given cities,
+        in a range of dates (in a random order), skipping fresh and empty searches.
+        """
 
-        departure_dates = self.dates_range_generator()
-        random.shuffle(departure_dates)
         departure_city = self.departure_city_uuid
         arrival_city = self.arrival_city_uuid
-
-        for departure_date in departure_dates:
-            query_str = (
-                f"search?from_city_id={departure_city}&to_city_id={arrival_city}"
-                f"&departure_date={departure_date}"
+        search_filters = self.search_filters
+
+        for departure_date in self.departure_dates_generator(shuffle=True):
+            if search_filters and search_filters.should_skip(
+                departure_city, arrival_city, departure_date.date()
+            ):
+                continue
+            yield search_trips_uri(
+                departure_city, arrival_city, departure_date.strftime("%d.%m.%Y")
             )
-            url = f"{search_trip_uri}/{query_str}&{default_params}"
-            yield url
+
+    def decode_response(self, response) -> Any:
+        """
+        Decode the response body with the fastest decoder available,
+        keeping just the fields of project_trips_response.
+        """
+        data = json_loads(response.content)
+        return project_trips_response(data) if self.project_responses else data
+
+    def iter_endpoint_uris(self) -> Iterator[str]:
+        """
+        Unless endpoint_uris are given, urls are generated lazily on each call,
+        so no url is kept in memory before it is requested.
+        """
+        if self.endpoint_uris is not None:
+            return super().iter_endpoint_uris()
+        return validated_endpoint_uris(self.endpoint_uris_generator())
+
+    def _endpoint_uris(self) -> Iterator[str]:
+        """
+        Generated urls may be none at all, e.g. once every date of the route is still fresh
+        or known to have no rides, then nothing is requested instead of raising ValueError.
+        """
+        if self.endpoint_uris is not None:
+            return super()._endpoint_uris()
+        return self.iter_endpoint_uris()
 
     def __post_init__(self):
         if not self.start_date:
@@ -84,5 +230,4 @@ class FlixbusTripsScraper(BaseScraper):
         if not self.end_date:
             days = int(SCRAP_DAYS)
             self.end_date = self.start_date + timedelta(days)
-
-        self.endpoint_uris = list(uri for uri in self.endpoint_uris_generator())
+        super().__post_init__()
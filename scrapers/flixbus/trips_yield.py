@@ -0,0 +1,165 @@
+"""
+Yield statistics of flixbus routes, for spending a limited requests budget
+on the routes that actually produce cheap trips.
+
+Each route keeps discounted counts of scraped responses and "hits"
+(responses with at least one cheap trip), and an exponentially weighted
+mean and variance of its best price ratio (total / original price).
+Routes are scored as a UCB1 bandit: the hit rate plus a price volatility bonus
+(volatile prices are more likely to drop), plus an exploration bonus that grows
+for routes that were rarely scraped, so they are tried again from time to time.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+from typing import Any
+
+from scrapers.flixbus.trips_jobs import CityUuidTable
+from scrapers.flixbus.trips_scheduling import route_key
+from settings import APP_NAME
+
+logger = logging.getLogger(APP_NAME)
+logger.setLevel(logging.DEBUG)
+
+
+class RouteYieldStats:
+    """
+    Discounted yield counters of a single route.
+    """
+
+    __slots__ = ("pulls", "hits", "price_ratio_mean", "price_ratio_var")
+
+    def __init__(
+        self,
+        pulls: float = 0.0,
+        hits: float = 0.0,
+        price_ratio_mean: float | None = None,
+        price_ratio_var: float = 0.0,
+    ):
+        self.pulls = pulls
+        self.hits = hits
+        self.price_ratio_mean = price_ratio_mean
+        self.price_ratio_var = price_ratio_var
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.pulls if self.pulls else 0.0
+
+    @property
+    def volatility(self) -> float:
+        return math.sqrt(self.price_ratio_var)
+
+    def as_list(self) -> list[float | None]:
+        return [self.pulls, self.hits, self.price_ratio_mean, self.price_ratio_var]
+
+
+class RouteYieldBandit:
+    """
+    :param exploration: (float) weight of the UCB1 exploration bonus
+    :param volatility_weight: (float) weight of the price volatility bonus
+    :param decay: (float) discount applied to the route counters on each observation,
+                  so old observations fade out as prices change
+    :param price_smoothing: (float) weight of a new price ratio in its moving mean and variance
+    """
+
+    def __init__(
+        self,
+        exploration: float = 0.5,
+        volatility_weight: float = 1.0,
+        decay: float = 0.98,
+        price_smoothing: float = 0.2,
+    ):
+        if not 0 < decay <= 1:
+            raise ValueError("decay must be in (0, 1]")
+        if not 0 < price_smoothing <= 1:
+            raise ValueError("price_smoothing must be in (0, 1]")
+
+        self.exploration = exploration
+        self.volatility_weight = volatility_weight
+        self.decay = decay
+        self.price_smoothing = price_smoothing
+        self.routes: dict[int, RouteYieldStats] = {}
+        self.total_pulls = 0.0
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def record(self, key: int, hit: bool, price_ratio: float | None = None) -> None:
+        """
+        Record a scraped response of a route.
+
+        :param key: (int) the route key, see route_key
+        :param hit: (bool) True if the response had at least one cheap trip
+        :param price_ratio: (float) the best total / original price ratio of the response,
+                            None if it had no trips
+        """
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteYieldStats()
+
+        stats.pulls = stats.pulls * self.decay + 1
+        stats.hits = stats.hits * self.decay + hit
+        self.total_pulls += 1
+
+        if price_ratio is not None:
+            if stats.price_ratio_mean is None:
+                stats.price_ratio_mean = price_ratio
+            else:
+                # exponentially weighted mean and variance
+                delta = price_ratio - stats.price_ratio_mean
+                stats.price_ratio_mean += self.price_smoothing * delta
+                stats.price_ratio_var = (1 - self.price_smoothing) * (
+                    stats.price_ratio_var + self.price_smoothing * delta**2
+                )
+
+    def score(self, key: int) -> float:
+        """
+        :return: (float) the route upper confidence bound of its yield, between 0 and 1,
+                 routes never scraped get the highest score
+        """
+        stats = self.routes.get(key)
+        if stats is None or not stats.pulls:
+            return 1.0
+        exploration_bonus = self.exploration * math.sqrt(
+            math.log(self.total_pulls + 1) / stats.pulls
+        )
+        return min(
+            stats.hit_rate + self.volatility_weight * stats.volatility + exploration_bonus,
+            1.0,
+        )
+
+    def to_dict(self, cities: CityUuidTable) -> dict[str, Any]:
+        """
+        :return: (dict) the stats keyed by "departure_uuid:arrival_uuid", as city indexes
+                 are not stable between processes
+        """
+        routes = {}
+        for key, stats in self.routes.items():
+            departure_uuid, arrival_uuid = cities.uuid(key >> 32), cities.uuid(key & 0xFFFFFFFF)
+            routes[f"{departure_uuid}:{arrival_uuid}"] = stats.as_list()
+        return {"total_pulls": self.total_pulls, "routes": routes}
+
+    def update_from_dict(self, data: dict[str, Any], cities: CityUuidTable) -> None:
+        """
+        Load the stats of to_dict, interning their city uuids in cities.
+        """
+        self.total_pulls = data.get("total_pulls", 0.0)
+        for route, stats in data.get("routes", {}).items():
+            departure_uuid, arrival_uuid = route.split(":")
+            key = route_key(cities.intern(departure_uuid), cities.intern(arrival_uuid))
+            self.routes[key] = RouteYieldStats(*stats)
+
+    def load(self, file_path: str, cities: CityUuidTable) -> None:
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            logger.info(f"No routes yield stats in {file_path}, starting from scratch.")
+            return
+        self.update_from_dict(data, cities)
+
+    def save(self, file_path: str, cities: CityUuidTable) -> None:
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(cities), file)
@@ -6,25 +6,71 @@ parse the scraped data and a special model for bus stations.
 
 from __future__ import annotations
 
+import asyncio
+import itertools
 import logging
 import time
 import uuid
 from abc import ABC, abstractmethod
-from typing import Any
+from dataclasses import field
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
 
 import requests
 from fake_useragent import UserAgent
 from pydantic.dataclasses import dataclass
 from requests import Session
-from requests.adapters import HTTPAdapter, SSLError
+from requests.adapters import SSLError
 from urllib3.util import Retry
 
+from scrapers.cache import ResponseCache, cache_key, get_response_cache
+from scrapers.engine import run_blocking
+from scrapers.resilience import CircuitOpenError, backoff_delay, circuit_breakers
+from scrapers.sessions import session_registry
+from scrapers.singleflight import single_flight
+from scrapers.throttling import rate_limiters
 from settings import APP_NAME
 
 logger = logging.getLogger(APP_NAME)
 logger.setLevel(logging.DEBUG)
 
 
+def validate_endpoint_uri(uri: Any) -> str:
+    """
+    :param uri: an endpoint URI
+    :return: (str) the same URI if it is valid
+    :raises: TypeError if uri is not a str starting with a valid schema
+    """
+    if not isinstance(uri, str):
+        raise TypeError("endpoint_uris must be str")
+    if not (uri.startswith("https://") or uri.startswith("http://")):
+        raise TypeError("endpoint_uris must start with a valid schema: https:// or http://")
+    return uri
+
+
+def validated_endpoint_uris(uris: Iterable[Any]) -> Iterator[str]:
+    """
+    Lazily validate a collection or generator of endpoint URIs.
+    :raises: TypeError (while iterating) for the first invalid URI
+    """
+    for uri in uris:
+        yield validate_endpoint_uri(uri)
+
+
+@dataclass
+class ResponseSharing:
+    """
+    How the responses of a scraper are shared with other requests.
+
+    :param cache_ttl: (float) seconds a response can be served from the cache, 0 disables it
+    :param response_cache: (ResponseCache) if not given the shared one (SCRAPER_CACHE_DIR)
+    :param coalesce: (bool) concurrent identical requests share a single upstream request
+    """
+
+    cache_ttl: float = 0
+    response_cache: Any = None
+    coalesce: bool = True
+
+
 @dataclass(kw_only=True)
 class BaseScraper:
     """
@@ -36,43 +82,59 @@ class BaseScraper:
     custom headers, and user-agent rotation.
     """
 
-    endpoint_uris: Any = None  # TODO fix this, list[str] | Generator = None
+    endpoint_uris: Any = None  # list[str] | Iterator[str], see iter_endpoint_uris
     retries: int = 3
     backoff: float = 0.3
+    max_backoff: float = 30.0
     status_forcelist: tuple = (500, 502, 503, 504)
     timeout: int = 120
+    sharing: Any = field(default_factory=ResponseSharing)  # ResponseSharing
 
     def __post_init__(self):
-        if self.endpoint_uris is not None:
-            if not all(((isinstance(uri, str)) for uri in self.endpoint_uris)):
-                raise TypeError("endpoint_uris must be str")
-            if not all(
-                (
-                    uri.startswith("https://") or uri.startswith("http://")
-                    for uri in self.endpoint_uris
-                )
-            ):
-                raise TypeError("endpoint_uris must start with a valid schema: https:// or http://")
+        if self.endpoint_uris is not None and not isinstance(self.endpoint_uris, Iterator):
+            # generators are validated lazily, while they are consumed
+            for uri in self.endpoint_uris:
+                validate_endpoint_uri(uri)
+
+    def iter_endpoint_uris(self) -> Iterator[str]:
+        """
+        Iterate over the endpoint URIs, validating them on demand.
+        :return: an iterator of valid endpoint URIs
+        """
+        return validated_endpoint_uris(self.endpoint_uris or ())
+
+    def _endpoint_uris(self) -> Iterator[str]:
+        """
+        :return: an iterator of valid endpoint URIs
+        :raises: ValueError if there is no endpoint URI
+        """
+        uris = self.iter_endpoint_uris()
+        first_uri = next(uris, None)
+        if not first_uri:
+            raise ValueError("at least a valid endpoint URI is mandatory")
+        return itertools.chain((first_uri,), uris)
 
     @property
     def requests_retry_session(self) -> Session:
         """
-        This property creates and configures a new requests Session with a retry mechanism
-        for handling HTTP requests.
-        According to 'retries', 'backoff', and 'status_forcelist' values.
+        This property gets the shared requests Session with a retry mechanism
+        for handling HTTP requests, from the process-wide session registry,
+        so keep-alive connections are reused by all scrapers with the same policy.
+        The session just retries failed connections, up to 'retries' times,
+        responses with a status in 'status_forcelist' and read errors are retried
+        by the scraper with backoff and jitter (see _fetch and _fetch_async).
         It allows 'GET' and 'POST' methods for retries.
 
         :return: requests.Session object with retry functionality.
         """
-        session = Session()
         retries = Retry(
             total=self.retries,
-            backoff_factor=self.backoff,
-            status_forcelist=self.status_forcelist,
+            read=False,
+            status_forcelist=(),
+            raise_on_status=False,
             allowed_methods={"GET", "POST"},
         )
-        session.mount("https://", HTTPAdapter(max_retries=retries))
-        return session
+        return session_registry.get_session(retries)
 
     def build_headers(self) -> dict:
         """
@@ -97,6 +159,236 @@ class BaseScraper:
         :return: (dict) with a custom query
         """
 
+    def decode_response(self, response: requests.Response) -> Any:
+        """
+        Decode a successful response, scrapers can override it
+        to keep just the data they need (e.g. a projection of the json document)
+        :return: the json representation of the data
+        """
+        return response.json()
+
+    def _get_response_cache(self) -> ResponseCache | None:
+        if not self.sharing.cache_ttl:
+            return None
+        return self.sharing.response_cache or get_response_cache()
+
+    def _read_cache(self, url: str, method: str) -> Any:
+        """
+        :return: the cached json data of the request if it is fresh enough, otherwise None
+        """
+        response_cache = self._get_response_cache()
+        if response_cache is None:
+            return None
+        return response_cache.get(cache_key(method, url, self.query), self.sharing.cache_ttl)
+
+    def _write_cache(self, url: str, method: str, data: Any) -> None:
+        response_cache = self._get_response_cache()
+        if response_cache is not None:
+            response_cache.set(cache_key(method, url, self.query), data)
+
+    @staticmethod
+    def _request(session: Session, method: str, request_args: dict) -> requests.Response:
+        match method:
+            case "GET":
+                return session.get(**request_args)
+            case "POST":
+                return session.post(**request_args)
+        raise ValueError(f"unsupported http method {method}")
+
+    def _send(
+        self,
+        session: Session,
+        url: str,
+        method: str,
+        headers: dict,
+        trace_uuid: str,
+        stream: bool = False,
+        decode: Callable[[requests.Response], Any] | None = None,
+    ) -> tuple[Any, bool, float | None]:
+        """
+        Make a single (blocking) http request to an url,
+        feeding the host rate limiter and the endpoint circuit breaker with the outcome
+        of every request, even a failed one, so a half open circuit gets its probe result.
+        :param session: the requests Session to be used
+        :param url: (str) the endpoint URI
+        :param method: 'GET' or 'POST'
+        :param headers: (dict) the http request headers
+        :param trace_uuid: (str) for log tracing
+        :param stream: (bool) do not download the response content until it is read
+        :param decode: (callable) decode a successful response, a response that can not be
+                       decoded (e.g. an html captcha page) is a failed request
+        :return: (tuple) the successful response, or its decoded data if decode is given
+                 (None if the request failed), whether the request should be retried
+                 and the Retry-After delay if given
+        :raises: CircuitOpenError if the endpoint circuit is open
+        """
+        breaker = circuit_breakers.get_circuit_breaker(url)
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"circuit open for {url}")
+
+        request_args = {
+            "url": url,
+            "headers": headers,
+            "timeout": self.timeout,
+            "allow_redirects": True,
+            "stream": stream,
+        }
+
+        query = self.query
+        if query:
+            request_args["json"] = query
+
+        session_registry.mark_used(url)
+        rate_limiter = rate_limiters.get_rate_limiter(url)
+
+        status_code, failed = None, True
+        started_at = time.monotonic()
+        try:
+            logger.debug(f"[{trace_uuid}] HTTP request to {url} - Method: {method}")
+            try:
+                response = self._request(session, method, request_args)
+            except SSLError:
+                logger.warning(f"[{trace_uuid}] SSL error for {url}, retrying without verifying")
+                response = self._request(session, method, {**request_args, "verify": False})
+            status_code = response.status_code
+
+            if status_code in self.status_forcelist or status_code == 429:
+                logger.error(f"[{trace_uuid}] Response status code {status_code} for {url}")
+                response.close()
+                retry_after = response.headers.get("Retry-After", "")
+                return None, True, float(retry_after) if retry_after.isdigit() else None
+
+            if status_code != 200:
+                failed = False  # the endpoint is healthy, the request is not
+                logger.error(f"[{trace_uuid}] Response status code {status_code} for {url}")
+                response.close()
+                return None, False, None
+
+            logger.debug(f"[{trace_uuid}] Response status code {status_code}")
+            data = response if decode is None else decode(response)
+            failed = False
+            return data, False, None
+        except requests.exceptions.RequestException as ex:
+            logger.error(f"[{trace_uuid}] an exception appeared for {url}: {ex}")
+            status_code = None
+            return None, True, None
+        except (ValueError, KeyError, TypeError) as ex:
+            # e.g. a json decoding error of a captcha page served with a 200 status code
+            logger.error(f"[{trace_uuid}] Response of {url} could not be decoded: {ex!r}")
+            status_code = None
+            return None, True, None
+        finally:
+            latency = None if status_code is None else time.monotonic() - started_at
+            rate_limiter.record(status_code, latency)
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+    def _attempt(
+        self, session: Session, url: str, method: str, headers: dict, trace_uuid: str
+    ) -> tuple[Any, bool, float | None]:
+        """
+        Make a single (blocking) http request to an url and decode its json content.
+        :return: (tuple) the json representation of the data (None if the request failed
+                 or its content could not be decoded), whether the request should be retried
+                 and the Retry-After delay if given
+        :raises: CircuitOpenError if the endpoint circuit is open
+        """
+        data, retry, retry_after = self._send(
+            session, url, method, headers, trace_uuid, decode=self.decode_response
+        )
+        if data is not None:
+            self._write_cache(url, method, data)
+        return data, retry, retry_after
+
+    def _retry_delay(self, attempt: int, retry_after: float | None) -> float:
+        delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+        return max(delay, min(retry_after, self.max_backoff)) if retry_after else delay
+
+    def _fetch(
+        self, session: Session, url: str, method: str, headers: dict, trace_uuid: str
+    ) -> Any:
+        """
+        Get the json content of an url, concurrent identical requests (same method,
+        url and query) in other threads share a single one, see scrapers.singleflight.
+        :return: the json representation of the data or None if the request failed
+        """
+        if not self.sharing.coalesce:
+            return self._fetch_with_retries(session, url, method, headers, trace_uuid)
+        return single_flight.run(
+            cache_key(method, url, self.query),
+            lambda: self._fetch_with_retries(session, url, method, headers, trace_uuid),
+        )
+
+    def _fetch_with_retries(
+        self, session: Session, url: str, method: str, headers: dict, trace_uuid: str
+    ) -> Any:
+        """
+        Get the json content of an url, retrying failed requests
+        with exponential backoff and jitter, up to 'retries' times.
+        :return: the json representation of the data or None if the request failed
+        """
+        cached_data = self._read_cache(url, method)
+        if cached_data is not None:
+            logger.debug(f"[{trace_uuid}] {url} served from cache")
+            return cached_data
+
+        for attempt in range(self.retries + 1):
+            rate_limiters.get_rate_limiter(url).acquire()
+            try:
+                data, retry, retry_after = self._attempt(session, url, method, headers, trace_uuid)
+            except CircuitOpenError as ex:
+                logger.warning(f"[{trace_uuid}] {ex}, skipping request")
+                return None
+            if not retry or attempt == self.retries:
+                return data
+            time.sleep(self._retry_delay(attempt, retry_after))
+        return None
+
+    async def _fetch_async(
+        self, session: Session, url: str, method: str, headers: dict, trace_uuid: str
+    ) -> Any:
+        """
+        Async version of _fetch, concurrent identical requests in the running loop
+        share a single one.
+        :return: the json representation of the data or None if the request failed
+        """
+        if not self.sharing.coalesce:
+            return await self._fetch_with_retries_async(session, url, method, headers, trace_uuid)
+        return await single_flight.run_async(
+            cache_key(method, url, self.query),
+            lambda: self._fetch_with_retries_async(session, url, method, headers, trace_uuid),
+        )
+
+    async def _fetch_with_retries_async(
+        self, session: Session, url: str, method: str, headers: dict, trace_uuid: str
+    ) -> Any:
+        """
+        Async version of _fetch_with_retries, waiting between retries does not block the event loop
+        nor holds a slot of the global concurrency limit.
+        :return: the json representation of the data or None if the request failed
+        """
+        if self._get_response_cache() is not None:
+            cached_data = await run_blocking(self._read_cache, url, method)
+            if cached_data is not None:
+                logger.debug(f"[{trace_uuid}] {url} served from cache")
+                return cached_data
+
+        for attempt in range(self.retries + 1):
+            await rate_limiters.get_rate_limiter(url).acquire_async()
+            try:
+                data, retry, retry_after = await run_blocking(
+                    self._attempt, session, url, method, headers, trace_uuid
+                )
+            except CircuitOpenError as ex:
+                logger.warning(f"[{trace_uuid}] {ex}, skipping request")
+                return None
+            if not retry or attempt == self.retries:
+                return data
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        return None
+
     def get_data(self, method: str = "GET") -> list[dict]:
         """
         Get data via http requests from an endpoint_url to be parsed, proceeded and stored
@@ -104,56 +396,127 @@ class BaseScraper:
         :param method: 'GET' or 'POST', if not given GET will be implemented
         :return: a list of json representation of the data
         """
-        trace_uuid = str(uuid.uuid4())
+        return list(self.iter_data(method))
 
-        if not any(self.endpoint_uris):
-            raise ValueError("at least a valid endpoint URI is mandatory")
+    def iter_data(self, method: str = "GET") -> Iterator[Any]:
+        """
+        Streaming version of get_data, each response is yielded as soon as it is got,
+        so it can be proceeded before next ones are requested.
+        :param method: 'GET' or 'POST', if not given GET will be implemented
+        :return: an iterator of json representation of the data
+        """
+        trace_uuid = str(uuid.uuid4())
+        endpoint_uris = self._endpoint_uris()
 
         session = self.requests_retry_session
-        timeout = self.timeout
         headers = self.build_headers()
-        query = self.query
 
-        scraped_data = []
+        for url in endpoint_uris:
+            data = self._fetch(session, url, method, headers, trace_uuid)
+            if data is not None:
+                yield data
 
-        for url in self.endpoint_uris:
-            request_args = {
-                "url": url,
-                "headers": headers,
-                "timeout": timeout,
-                "allow_redirects": True,
-            }
+    def _open_stream(
+        self, session: Session, url: str, method: str, headers: dict, trace_uuid: str
+    ) -> requests.Response | None:
+        """
+        Send a streamed request, retrying it like _fetch_with_retries
+        until its headers are received, the content is read by the caller.
+        :return: the response, to be closed by the caller, or None if the request failed
+        """
+        for attempt in range(self.retries + 1):
+            rate_limiters.get_rate_limiter(url).acquire()
+            try:
+                response, retry, retry_after = self._send(
+                    session, url, method, headers, trace_uuid, stream=True
+                )
+            except CircuitOpenError as ex:
+                logger.warning(f"[{trace_uuid}] {ex}, skipping request")
+                return None
+            if not retry or attempt == self.retries:
+                return response
+            time.sleep(self._retry_delay(attempt, retry_after))
+        return None
 
-            if query:
-                request_args["json"] = query
+    def iter_stream(
+        self, method: str = "GET", chunk_size: int = 64 * 1024
+    ) -> Iterator[Iterator[bytes]]:
+        """
+        Streaming version of iter_data for large responses, for each endpoint URI
+        an iterator of the raw content chunks is yielded as they are downloaded,
+        so the content can be decoded incrementally (see scrapers.decoding.iter_json_array).
+        Streamed responses are neither cached nor coalesced.
+        :param method: 'GET' or 'POST', if not given GET will be implemented
+        :param chunk_size: (int) max size in bytes of the content chunks
+        :return: an iterator of content chunks iterators, one for each successful response
+        """
+        trace_uuid = str(uuid.uuid4())
+        endpoint_uris = self._endpoint_uris()
 
-            response = None
-            try:
-                logger.debug(f"[{trace_uuid}] HTTP request to {url} - Method: {method}")
-                match method:
-                    case "GET":
-                        response = session.get(**request_args)
-                    case "POST":
-                        response = session.post(**request_args)
-            except requests.exceptions.RetryError as ex:
-                logger.error(f"[{trace_uuid}] an exception appeared: {ex}")
-                time.sleep(60)
-                continue
-            except SSLError:
-                response = session.get(url, verify=False)
-            except requests.exceptions.HTTPError:
-                logger.error(f"[{trace_uuid}] an exception appeared: {ex}")
-                time.sleep(60)
-                continue
+        session = self.requests_retry_session
+        headers = self.build_headers()
 
-            if response.status_code != 200:
-                logger.error(
-                    response.raise_for_status()
-                )  # TODO [improvement] make this loop resilient
+        for url in endpoint_uris:
+            response = self._open_stream(session, url, method, headers, trace_uuid)
+            if response is None:
                 continue
-            logger.debug(f"[{trace_uuid}] Response status code {response.status_code}")
-            scraped_data.append(response.json())
-        return scraped_data
+            with response:
+                yield response.iter_content(chunk_size=chunk_size)
+
+    async def get_data_async(self, method: str = "GET") -> list[dict]:
+        """
+        Async version of get_data, all endpoint URIs are requested concurrently
+        without blocking the event loop, bounded by the scrapers global concurrency limit
+        (see scrapers.engine.set_max_concurrency) and the rate limit of each host.
+        :param method: 'GET' or 'POST', if not given GET will be implemented
+        :return: a list of json representation of the data, in endpoint URIs order
+        """
+        trace_uuid = str(uuid.uuid4())
+        endpoint_uris = self._endpoint_uris()
+
+        session = self.requests_retry_session
+        headers = self.build_headers()
+
+        responses = await asyncio.gather(
+            *[self._fetch_async(session, url, method, headers, trace_uuid) for url in endpoint_uris]
+        )
+        return [data for data in responses if data is not None]
+
+    async def aiter_data(self, method: str = "GET", prefetch: int = 4) -> AsyncIterator[Any]:
+        """
+        Async streaming version of get_data, endpoint URIs are requested concurrently
+        and each response is yielded as soon as it arrives (completion order).
+        At most 'prefetch' requests of this scraper are in flight or waiting to be consumed,
+        so memory is bounded no matter how many endpoint URIs there are.
+        :param method: 'GET' or 'POST', if not given GET will be implemented
+        :param prefetch: (int) max number of pending requests
+        :return: an async iterator of json representation of the data
+        """
+        trace_uuid = str(uuid.uuid4())
+        endpoint_uris = self._endpoint_uris()
+
+        session = self.requests_retry_session
+        headers = self.build_headers()
+
+        pending = set()
+        try:
+            while True:
+                for url in itertools.islice(endpoint_uris, max(prefetch - len(pending), 0)):
+                    pending.add(
+                        asyncio.ensure_future(
+                            self._fetch_async(session, url, method, headers, trace_uuid)
+                        )
+                    )
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    data = task.result()
+                    if data is not None:
+                        yield data
+        finally:
+            for task in pending:
+                task.cancel()
 
 
 @dataclass
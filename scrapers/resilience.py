@@ -0,0 +1,177 @@
+"""
+Retries and circuit breaking for scrapers requests.
+
+- backoff_delay: exponential backoff with full jitter between retries.
+- CircuitBreaker: fails fast while an endpoint is degraded,
+  it opens after consecutive failures and lets a probe request through
+  once the recovery timeout is over.
+- CircuitBreakerRegistry: keeps a breaker for each endpoint (host and path).
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from enum import Enum
+from typing import Any
+from urllib.parse import urlsplit
+
+from pydantic.dataclasses import dataclass
+
+from scrapers.settings import SCRAPER_BREAKER_FAILURE_THRESHOLD, SCRAPER_BREAKER_RECOVERY_TIMEOUT
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a request is not sent because the endpoint circuit is open
+    """
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int, backoff: float, max_backoff: float) -> float:
+    """
+    Exponential backoff with full jitter,
+    according to https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    e.g. for backoff=0.3 the delay is random between 0 and 0.3, 0.6, 1.2, ... seconds
+    :param attempt: (int) the number of the failed attempt, starting at 0
+    :param backoff: (float) the base delay in seconds
+    :param max_backoff: (float) the max delay in seconds
+    :return: (float) seconds to wait before the next attempt
+    """
+    return random.uniform(0, min(max_backoff, backoff * 2**attempt))
+
+
+@dataclass
+class CircuitCounters:
+    """
+    :param failures: (int) consecutive failures, reset by a success
+    :param trips: (int) times the circuit was opened
+    """
+
+    failures: int = 0
+    trips: int = 0
+
+
+@dataclass
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker.
+
+    :param failure_threshold: (int) consecutive failures that open the circuit
+    :param recovery_timeout: (float) seconds the circuit keeps open before a probe request
+    """
+
+    failure_threshold: int = SCRAPER_BREAKER_FAILURE_THRESHOLD
+    recovery_timeout: float = SCRAPER_BREAKER_RECOVERY_TIMEOUT
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.counters = CircuitCounters()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            if (
+                self._state is CircuitState.OPEN
+                and time.monotonic() - self._opened_at >= self.recovery_timeout
+            ):
+                self._state = CircuitState.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        :return: (bool) True if a request can be sent,
+                 in half open state just a single probe request is allowed at once
+        """
+        state = self.state
+        with self._lock:
+            if state is CircuitState.CLOSED:
+                return True
+            if state is CircuitState.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._probing = False
+            self.counters.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            counters = self.counters
+            counters.failures += 1
+            if self._state is CircuitState.HALF_OPEN or (
+                self._state is CircuitState.CLOSED and counters.failures >= self.failure_threshold
+            ):
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+                counters.trips += 1
+            self._probing = False
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failure_count": self.counters.failures,
+            "trip_count": self.counters.trips,
+        }
+
+
+def url_endpoint(url: str) -> str:
+    """
+    e.g. 'https://global.api.flixbus.com/search/service/v4/search?from_city_id=...'
+    -> 'global.api.flixbus.com/search/service/v4/search'
+    """
+    split_url = urlsplit(url)
+    return f"{split_url.hostname}{split_url.path}"
+
+
+@dataclass
+class CircuitBreakerRegistry:
+    """
+    Keeps a CircuitBreaker for each endpoint (url host and path, without query params)
+    """
+
+    failure_threshold: int = SCRAPER_BREAKER_FAILURE_THRESHOLD
+    recovery_timeout: float = SCRAPER_BREAKER_RECOVERY_TIMEOUT
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get_circuit_breaker(self, url: str) -> CircuitBreaker:
+        """
+        :param url: (str) any url of the endpoint
+        :return: the circuit breaker of the url endpoint
+        """
+        endpoint = url_endpoint(url)
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    failure_threshold=self.failure_threshold,
+                    recovery_timeout=self.recovery_timeout,
+                )
+                self._breakers[endpoint] = breaker
+            return breaker
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        :return: (dict) state, consecutive failures and trip counts by endpoint
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {endpoint: breaker.stats for endpoint, breaker in breakers.items()}
+
+
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,201 @@
+"""
+Process-wide registry of pooled HTTP sessions shared by all scrapers.
+
+Scrapers with the same retry policy share one requests Session,
+whose adapter keeps a keep-alive connection pool for each host,
+so TCP and TLS handshakes are paid once per connection instead of once per scraper.
+Pools idle for longer than a given timeout are evicted,
+and connection reuse is reported per host.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import field
+from typing import Any
+from urllib.parse import urlsplit
+
+from pydantic.dataclasses import dataclass
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from scrapers.settings import (
+    SCRAPER_POOL_CONNECTIONS,
+    SCRAPER_POOL_IDLE_TIMEOUT,
+    SCRAPER_POOL_MAXSIZE,
+)
+
+
+def url_host(url: str) -> str:
+    """
+    e.g. 'https://global.api.flixbus.com/search/service/v4/search?...' -> 'global.api.flixbus.com'
+    :param url: (str) a valid url
+    :return: (str) the url host name
+    """
+    return urlsplit(url).hostname or ""
+
+
+@dataclass
+class PoolsEviction:
+    """
+    Bookkeeping of the idle connection pools eviction.
+
+    :param last_run: (float) monotonic time of the last eviction
+    :param last_used: (dict) monotonic time of the last request by host
+    :param evicted_stats: (dict) requests and new connections of the evicted pools by host
+    """
+
+    last_run: float
+    last_used: dict[str, float] = field(default_factory=dict)
+    evicted_stats: dict[str, dict[str, int]] = field(default_factory=dict)
+
+
+@dataclass
+class SessionRegistry:
+    """
+    Keeps one pooled requests Session for each retry policy.
+
+    :param pool_maxsize: (int) max number of keep-alive connections kept for each host
+    :param pool_connections: (int) max number of hosts with a connection pool
+    :param idle_timeout: (float) seconds after which the pool of an unused host is closed
+    """
+
+    pool_maxsize: int = SCRAPER_POOL_MAXSIZE
+    pool_connections: int = SCRAPER_POOL_CONNECTIONS
+    idle_timeout: float = SCRAPER_POOL_IDLE_TIMEOUT
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._sessions: dict[tuple, Session] = {}
+        self._eviction = PoolsEviction(last_run=time.monotonic())
+
+    def __contains__(self, session: Session) -> bool:
+        """
+        :param session: (Session) a requests session
+        :return: (bool) True if session is one of the shared sessions of the registry
+        """
+        with self._lock:
+            return any(session is shared for shared in self._sessions.values())
+
+    def get_session(self, retries: Retry) -> Session:
+        """
+        Get the shared session for a retry policy, creating it the first time.
+        :param retries: (Retry) the retry policy mounted in the session adapter
+        :return: requests.Session object
+        """
+        key = (
+            retries.total,
+            retries.connect,
+            retries.read,
+            retries.status,
+            retries.backoff_factor,
+            tuple(retries.status_forcelist or ()),
+        )
+        self.evict_idle()
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=retries,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[key] = session
+            return session
+
+    def mark_used(self, url: str) -> None:
+        """
+        Register a request to url host, used for idle pools eviction.
+        """
+        self._eviction.last_used[url_host(url)] = time.monotonic()
+
+    def _pools(self):
+        """
+        Yields (host, pool key, pools container) for every open connection pool.
+        """
+        for session in list(self._sessions.values()):
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    yield pool_key.key_host, pool_key, pools
+
+    def evict_idle(self, force: bool = False) -> int:
+        """
+        Close the connection pools of hosts not used in the last idle_timeout seconds.
+        It runs at most once each idle_timeout / 2 seconds unless force is given.
+        :param force: (bool) run the eviction right now
+        :return: (int) the number of evicted pools
+        """
+        eviction = self._eviction
+        now = time.monotonic()
+        if not force and now - eviction.last_run < self.idle_timeout / 2:
+            return 0
+
+        evicted = 0
+        with self._lock:
+            eviction.last_run = now
+            for host, pool_key, pools in list(self._pools()):
+                if now - eviction.last_used.get(host, 0) < self.idle_timeout:
+                    continue
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host_stats = eviction.evicted_stats.setdefault(
+                    host, {"requests": 0, "new_connections": 0}
+                )
+                host_stats["requests"] += pool.num_requests
+                host_stats["new_connections"] += pool.num_connections
+                del pools[pool_key]  # the container closes the pool
+                eviction.last_used.pop(host, None)
+                evicted += 1
+        return evicted
+
+    def connection_stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Report how often connections were reused versus newly opened, by host.
+        :return: (dict) e.g. {'global.api.flixbus.com': {'requests': 100, 'new_connections': 4,
+                 'reused_connections': 96, 'reuse_ratio': 0.96}}
+        """
+        totals: dict[str, dict[str, int]] = {
+            host: dict(host_stats) for host, host_stats in self._eviction.evicted_stats.items()
+        }
+        with self._lock:
+            for host, pool_key, pools in list(self._pools()):
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host_stats = totals.setdefault(host, {"requests": 0, "new_connections": 0})
+                host_stats["requests"] += pool.num_requests
+                host_stats["new_connections"] += pool.num_connections
+
+        for host_stats in totals.values():
+            requests_count = host_stats["requests"]
+            reused = max(requests_count - host_stats["new_connections"], 0)
+            host_stats["reused_connections"] = reused
+            host_stats["reuse_ratio"] = reused / requests_count if requests_count else 0.0
+        return totals
+
+    def close(self) -> None:
+        """
+        Close all the sessions and their connection pools.
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._eviction.last_used.clear()
+
+
+session_registry = SessionRegistry()
+
+
+def get_connection_stats() -> dict[str, dict[str, Any]]:
+    """
+    :return: (dict) the connection reuse stats of the shared session registry, by host
+    """
+    return session_registry.connection_stats()
@@ -0,0 +1,33 @@
+"""Contains setting parameters for Scrapers."""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCRAPER_MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "64"))
+SCRAPER_POOL_MAXSIZE = int(os.getenv("SCRAPER_POOL_MAXSIZE", str(SCRAPER_MAX_CONCURRENCY)))
+SCRAPER_POOL_CONNECTIONS = int(os.getenv("SCRAPER_POOL_CONNECTIONS", "10"))
+SCRAPER_POOL_IDLE_TIMEOUT = float(os.getenv("SCRAPER_POOL_IDLE_TIMEOUT", "90"))
+SCRAPER_RATE_LIMIT = float(os.getenv("SCRAPER_RATE_LIMIT", "10"))  # initial requests/s per host
+SCRAPER_MIN_RATE_LIMIT = float(os.getenv("SCRAPER_MIN_RATE_LIMIT", "0.5"))
+SCRAPER_MAX_RATE_LIMIT = float(os.getenv("SCRAPER_MAX_RATE_LIMIT", "100"))
+SCRAPER_BREAKER_FAILURE_THRESHOLD = int(os.getenv("SCRAPER_BREAKER_FAILURE_THRESHOLD", "5"))
+SCRAPER_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("SCRAPER_BREAKER_RECOVERY_TIMEOUT", "30"))
+SCRAPER_CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR")  # response cache disabled if not set
+SCRAPER_CACHE_MAX_SIZE = int(os.getenv("SCRAPER_CACHE_MAX_SIZE", str(256 * 1024 * 1024)))
+SCRAPER_TRIPS_CACHE_TTL = float(os.getenv("SCRAPER_TRIPS_CACHE_TTL", "300"))
+# trips requests budget by hour and region, spent on the routes with the best yield first
+# (0 is no limit)
+SCRAPER_TRIPS_REQUESTS_PER_HOUR = int(os.getenv("SCRAPER_TRIPS_REQUESTS_PER_HOUR", "0"))
+SCRAPER_TRIPS_YIELD_FILE = os.getenv("SCRAPER_TRIPS_YIELD_FILE")  # routes yield not kept if not set
+# last scrape time of each trips search, kept in memory only if not set
+SCRAPER_TRIPS_FRESHNESS_FILE = os.getenv("SCRAPER_TRIPS_FRESHNESS_FILE")
+# trips searches without rides, kept in memory only if not set
+SCRAPER_TRIPS_EMPTY_SEARCHES_FILE = os.getenv("SCRAPER_TRIPS_EMPTY_SEARCHES_FILE")
+# max requests in flight of each region when running several of them,
+# the process-wide limit split evenly between them if 0
+SCRAPER_REGION_MAX_CONCURRENCY = int(os.getenv("SCRAPER_REGION_MAX_CONCURRENCY", "0"))
+# grid of tiles the bus stations search is split into, fetched in parallel (1x1 is a single search)
+SCRAPER_STATIONS_TILE_ROWS = int(os.getenv("SCRAPER_STATIONS_TILE_ROWS", "1"))
+SCRAPER_STATIONS_TILE_COLS = int(os.getenv("SCRAPER_STATIONS_TILE_COLS", "1"))
@@ -0,0 +1,116 @@
+"""
+Coalescing of identical in-flight scrapers requests (singleflight).
+
+While a request for a key (method, url and query) is in flight,
+concurrent callers for the same key wait for it and share its result
+instead of sending their own upstream request.
+Threads and coroutines are coalesced separately: blocking callers share
+a call among threads, and async callers share a task within their event loop.
+
+Note: the shared result is the same object for every caller, it must not be mutated.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable
+
+
+class _Call:
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exception: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Keeps the in-flight calls by key and counts the requests saved by coalescing them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self._tasks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.requests = 0
+        self.saved_requests = 0
+
+    def run(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run func, unless a call for the same key is in flight in another thread,
+        in that case wait for it and return its result.
+
+        :param key: (str) the request key, see scrapers.cache.cache_key
+        :param func: (callable) the blocking request
+        :return: (any) the func result, shared by concurrent callers
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.saved_requests += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as ex:
+            call.exception = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def run_async(self, key: str, coro_func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async version of run, the request runs in a task shared by the callers
+        of the same key in the running loop, so a cancelled caller does not cancel
+        the request of the rest of them.
+
+        :param key: (str) the request key, see scrapers.cache.cache_key
+        :param coro_func: (callable) returns the request coroutine
+        :return: (any) the coroutine result, shared by concurrent callers
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.get(loop)
+            if tasks is None:
+                tasks = self._tasks[loop] = {}
+            self.requests += 1
+            task = tasks.get(key)
+            if task is not None:
+                self.saved_requests += 1
+            else:
+                task = tasks[key] = loop.create_task(coro_func())
+                task.add_done_callback(lambda _: tasks.pop(key, None))
+        return await asyncio.shield(task)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        :return: (dict) requests asked for, and requests saved by sharing an in-flight one
+        """
+        return {"requests": self.requests, "saved_requests": self.saved_requests}
+
+
+single_flight = SingleFlight()
+
+
+def get_single_flight_stats() -> dict[str, int]:
+    """
+    :return: (dict) requests asked for by scrapers, and requests saved by coalescing them
+    """
+    return single_flight.stats
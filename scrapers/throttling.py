@@ -0,0 +1,223 @@
+"""
+Per-host rate limiting for scrapers.
+
+Each host (e.g. the trips search API or the cloudfront cities endpoint)
+gets a token bucket whose rate adapts following an AIMD policy:
+the rate grows additively while responses are healthy
+and it is cut multiplicatively on 429/5xx responses, failures or rising latency.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any
+
+from pydantic.dataclasses import dataclass
+
+from scrapers.sessions import url_host
+from scrapers.settings import SCRAPER_MAX_RATE_LIMIT, SCRAPER_MIN_RATE_LIMIT, SCRAPER_RATE_LIMIT
+
+THROTTLING_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass
+class RateLimitPolicy:
+    """
+    The AIMD parameters of an AdaptiveRateLimiter.
+
+    :param min_rate: (float) the rate is never cut below this value
+    :param max_rate: (float) the rate is never raised over this value
+    :param burst: (float) bucket capacity, max requests sent at once after an idle period
+    :param additive_increase: (float) requests per second added for each second of healthy traffic
+    :param multiplicative_decrease: (float) factor applied to the rate when throttled
+    :param latency_factor: (float) latency is considered rising when the recent average
+                           exceeds the long term one by this factor
+    :param decrease_cooldown: (float) seconds between two consecutive rate cuts,
+                              so a burst of failures counts as a single congestion signal
+    """
+
+    min_rate: float = SCRAPER_MIN_RATE_LIMIT
+    max_rate: float = SCRAPER_MAX_RATE_LIMIT
+    burst: float = 10.0
+    additive_increase: float = 1.0
+    multiplicative_decrease: float = 0.5
+    latency_factor: float = 2.0
+    decrease_cooldown: float = 1.0
+
+    def __post_init__(self):
+        if not 0 < self.min_rate <= self.max_rate:
+            raise ValueError("rates must follow 0 < min_rate <= max_rate")
+        if not 0 < self.multiplicative_decrease < 1:
+            raise ValueError("multiplicative_decrease must be between 0 and 1")
+
+
+@dataclass
+class TokenBucket:
+    """
+    The tokens of a rate limiter, refilled over time up to its capacity.
+    """
+
+    capacity: float
+    tokens: float
+    updated_at: float
+
+    def refill(self, now: float, rate: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * rate)
+        self.updated_at = now
+
+
+@dataclass
+class LatencyTrend:
+    """
+    Recent (fast) and long term (slow) moving averages of the response times.
+    """
+
+    fast: float | None = None
+    slow: float | None = None
+
+    def rising(self, latency: float, factor: float) -> bool:
+        """
+        Add a response time to the averages.
+        :return: (bool) True if the recent average exceeds the long term one by factor
+        """
+        if self.fast is None:
+            self.fast = self.slow = latency
+            return False
+        self.fast += 0.3 * (latency - self.fast)
+        self.slow += 0.02 * (latency - self.slow)
+        return self.fast > factor * self.slow
+
+
+@dataclass
+class AdaptiveRateLimiter:
+    """
+    A thread-safe token bucket with an adaptive (AIMD) refill rate.
+
+    :param rate: (float) initial rate, in requests per second
+    :param policy: (RateLimitPolicy) the AIMD parameters, the default ones if not given
+    """
+
+    rate: float = SCRAPER_RATE_LIMIT
+    policy: RateLimitPolicy = None
+
+    def __post_init__(self):
+        if self.policy is None:
+            self.policy = RateLimitPolicy()
+        if not self.policy.min_rate <= self.rate <= self.policy.max_rate:
+            raise ValueError("rates must follow 0 < min_rate <= rate <= max_rate")
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(self.policy.burst, self.policy.burst, time.monotonic())
+        self._latency = LatencyTrend()
+        self._last_decrease = 0.0
+        self.throttled_count = 0
+
+    def reserve(self) -> float:
+        """
+        Take a token from the bucket, the bucket can go into debt.
+        :return: (float) seconds to wait before sending the request
+        """
+        bucket = self._bucket
+        with self._lock:
+            bucket.refill(time.monotonic(), self.rate)
+            bucket.tokens -= 1
+            if bucket.tokens >= 0:
+                return 0.0
+            return -bucket.tokens / self.rate
+
+    def acquire(self) -> None:
+        """
+        Block the current thread until a request can be sent.
+        """
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """
+        Wait, without blocking the event loop, until a request can be sent.
+        """
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def record(self, status_code: int | None, latency: float | None = None) -> None:
+        """
+        Adapt the rate according to a response.
+        :param status_code: (int) the response status code, None if the request failed
+        :param latency: (float) the response time in seconds, if known
+        """
+        policy = self.policy
+        with self._lock:
+            now = time.monotonic()
+            rising_latency = latency is not None and self._latency.rising(
+                latency, policy.latency_factor
+            )
+            if status_code is None or status_code in THROTTLING_STATUS_CODES or rising_latency:
+                if now - self._last_decrease >= policy.decrease_cooldown:
+                    self._bucket.refill(now, self.rate)
+                    self.rate = max(policy.min_rate, self.rate * policy.multiplicative_decrease)
+                    self._last_decrease = now
+                    self.throttled_count += 1
+                return
+            # +additive_increase each second: one increment of additive_increase / rate per response
+            self.rate = min(policy.max_rate, self.rate + policy.additive_increase / self.rate)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rate": round(self.rate, 3),
+            "throttled_count": self.throttled_count,
+            "latency": self._latency.fast,
+        }
+
+
+@dataclass
+class RateLimiterRegistry:
+    """
+    Keeps an AdaptiveRateLimiter for each host,
+    host_settings allows a custom initial rate and RateLimitPolicy parameters per host,
+    e.g. {"d1ioiftasz4l3w.cloudfront.net": {"rate": 1.0, "max_rate": 5.0}}
+    """
+
+    host_settings: dict[str, dict[str, Any]] = None
+
+    def __post_init__(self):
+        if self.host_settings is None:
+            self.host_settings = {}
+        self._lock = threading.Lock()
+        self._limiters: dict[str, AdaptiveRateLimiter] = {}
+
+    def configure(self, host: str, **limiter_settings) -> None:
+        """
+        Set custom limiter parameters for a host, replacing its current limiter.
+        """
+        with self._lock:
+            self.host_settings[host] = limiter_settings
+            self._limiters.pop(host, None)
+
+    def get_rate_limiter(self, url: str) -> AdaptiveRateLimiter:
+        """
+        :param url: (str) any url of the host
+        :return: the rate limiter of the url host
+        """
+        host = url_host(url)
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                policy_settings = dict(self.host_settings.get(host, {}))
+                rate = policy_settings.pop("rate", SCRAPER_RATE_LIMIT)
+                limiter = AdaptiveRateLimiter(rate, RateLimitPolicy(**policy_settings))
+                self._limiters[host] = limiter
+            return limiter
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        :return: (dict) current rate and throttling counts by host
+        """
+        with self._lock:
+            return {host: limiter.stats for host, limiter in self._limiters.items()}
+
+
+rate_limiters = RateLimiterRegistry()
@@ -4,12 +4,33 @@ Implements async tests for Neo4j-based data models.
 
 import asyncio
 from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from neo4j.exceptions import ClientError, ServiceUnavailable, SessionExpired, TransientError
 
+from neo4j_graph import Neo4jDriverFactory, neo4j_drivers
 from tests.neo4j import Neo4JConnFactory
 
 
+class StreamedResult:
+    """
+    A fake neo4j result, streaming a record for each row, then raising error if given.
+    """
+
+    def __init__(self, rows, error=None):
+        self.rows = rows
+        self.error = error
+
+    async def __aiter__(self):
+        for row in self.rows:
+            record = MagicMock()
+            record.data.return_value = row
+            yield record
+        if self.error is not None:
+            raise self.error
+
+
 class Neo4jConnTests(IsolatedAsyncioTestCase):
     @pytest.fixture(autouse=True)
     def __inject_fixtures(self, mocker):
@@ -23,7 +44,10 @@ class Neo4jConnTests(IsolatedAsyncioTestCase):
             neo4j_conn.uri,
             auth=(neo4j_conn.user_name, neo4j_conn.password),
             database=neo4j_conn.db_name,
-            max_connection_lifetime=200,
+            max_connection_pool_size=neo4j_drivers.max_connection_pool_size,
+            max_connection_lifetime=neo4j_drivers.max_connection_lifetime,
+            connection_acquisition_timeout=neo4j_drivers.connection_acquisition_timeout,
+            max_transaction_retry_time=0,
         )
 
     @pytest.mark.asyncio
@@ -35,7 +59,10 @@ class Neo4jConnTests(IsolatedAsyncioTestCase):
             neo4j_conn.uri,
             auth=(neo4j_conn.user_name, neo4j_conn.password),
             database=neo4j_conn.db_name,
-            max_connection_lifetime=200,
+            max_connection_pool_size=neo4j_drivers.max_connection_pool_size,
+            max_connection_lifetime=neo4j_drivers.max_connection_lifetime,
+            connection_acquisition_timeout=neo4j_drivers.connection_acquisition_timeout,
+            max_transaction_retry_time=0,
         )
         self.assertEqual(driver_mock.call_count, 2)
 
@@ -50,7 +77,10 @@ class Neo4jConnTests(IsolatedAsyncioTestCase):
             neo4j_conn.uri,
             auth=(neo4j_conn.user_name, neo4j_conn.password),
             database=neo4j_conn.db_name,
-            max_connection_lifetime=200,
+            max_connection_pool_size=neo4j_drivers.max_connection_pool_size,
+            max_connection_lifetime=neo4j_drivers.max_connection_lifetime,
+            connection_acquisition_timeout=neo4j_drivers.connection_acquisition_timeout,
+            max_transaction_retry_time=0,
         )
 
         driver_mock = driver_cls_mock.return_value  # driver()
@@ -69,6 +99,186 @@ class Neo4jConnTests(IsolatedAsyncioTestCase):
         # session_run_mock.assert_awaited_once_with(fake_query)
         # assert res is session_executor_mock.return_value
 
+    @pytest.mark.asyncio
+    async def test_bootstrap_schema(self):
+        driver_cls_mock = self.mocker.patch("neo4j.AsyncGraphDatabase.driver", autospec=True)
+        neo4j_conn = Neo4JConnFactory()
+        session_mock = driver_cls_mock.return_value.session.return_value.__aenter__.return_value
+        queries = ["CREATE INDEX a IF NOT EXISTS FOR (n:A) ON (n.Id)", "CREATE INDEX b"]
+
+        await neo4j_conn.bootstrap_schema(queries)
+        await neo4j_conn.bootstrap_schema(queries)
+
+        self.assertEqual([call.args[0] for call in session_mock.run.await_args_list], queries)
+
+    def mock_session(self):
+        driver_cls_mock = self.mocker.patch("neo4j.AsyncGraphDatabase.driver", autospec=True)
+        return driver_cls_mock.return_value.session.return_value.__aenter__.return_value
+
+    @pytest.mark.asyncio
+    async def test_execute_query_retries(self):
+        session_mock = self.mock_session()
+        result_mock = AsyncMock()
+        result_mock.data.return_value = [{"n.Id": 1}]
+        session_mock.run = AsyncMock(side_effect=[TransientError("deadlock"), result_mock])
+        neo4j_conn = Neo4JConnFactory(retry_delay=0)
+
+        data = await neo4j_conn.execute_query("fake_query", {"id": 1})
+
+        self.assertEqual(data, [{"n.Id": 1}])  # not lost on retry
+        self.assertEqual(session_mock.run.await_count, 2)
+        session_mock.run.assert_awaited_with("fake_query", {"id": 1})
+
+    @pytest.mark.asyncio
+    async def test_execute_query_bounded_retries(self):
+        session_mock = self.mock_session()
+        session_mock.run = AsyncMock(side_effect=ServiceUnavailable("down"))
+        neo4j_conn = Neo4JConnFactory(retry_delay=0, max_retries=2)
+
+        with self.assertRaises(ServiceUnavailable):
+            await neo4j_conn.execute_query("fake_query")
+        self.assertEqual(session_mock.run.await_count, 3)
+
+        session_mock.run = AsyncMock(side_effect=ClientError("syntax error"))
+        with self.assertRaises(ClientError):
+            await neo4j_conn.execute_query("fake_query")
+        self.assertEqual(session_mock.run.await_count, 1)  # not transient, not retried
+
+    @pytest.mark.asyncio
+    async def test_execute_many(self):
+        session_mock = self.mock_session()
+        tx_mock = AsyncMock()
+        tx_mock.run.return_value.data.return_value = [{"ok": True}]
+
+        async def execute(tx_func, *args):
+            return await tx_func(tx_mock, *args)
+
+        session_mock.execute_write = AsyncMock(side_effect=execute)
+        session_mock.execute_read = AsyncMock(side_effect=execute)
+        neo4j_conn = Neo4JConnFactory()
+        statements = [("query_a", {"rows": [1]}), ("query_b", None)]
+
+        results = await neo4j_conn.execute_many(statements)
+
+        self.assertEqual(results, [[{"ok": True}], [{"ok": True}]])
+        session_mock.execute_write.assert_awaited_once()
+        self.assertEqual([call.args for call in tx_mock.run.await_args_list], statements)
+
+        self.assertEqual(await neo4j_conn.execute_read("query_c"), [{"ok": True}])
+        session_mock.execute_read.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_max_concurrency(self):
+        session_mock = self.mock_session()
+        in_flight, max_in_flight = 0, 0
+
+        async def run(*_):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return AsyncMock()
+
+        session_mock.run = AsyncMock(side_effect=run)
+        neo4j_conn = Neo4JConnFactory(max_concurrency=2)
+
+        await asyncio.gather(*[neo4j_conn.execute_query("fake_query") for _ in range(6)])
+
+        self.assertEqual(max_in_flight, 2)
+
+    @pytest.mark.asyncio
+    async def test_iter_query(self):
+        session_mock = self.mock_session()
+        rows = [{"from_city_uuid": f"city-{i}"} for i in range(3)]
+        session_mock.run = AsyncMock(return_value=StreamedResult(rows))
+        neo4j_conn = Neo4JConnFactory()
+
+        streamed_rows = [row async for row in neo4j_conn.iter_query("fake_query", fetch_size=2)]
+
+        self.assertEqual(streamed_rows, rows)
+        session_mock.run.assert_awaited_once_with("fake_query", None)
+        _, session_kwargs = neo4j_conn.async_driver.session.call_args
+        self.assertEqual(session_kwargs["fetch_size"], 2)
+        self.assertEqual(session_kwargs["default_access_mode"], "READ")
+
+    @pytest.mark.asyncio
+    async def test_iter_query_retries(self):
+        session_mock = self.mock_session()
+        session_mock.run = AsyncMock(
+            side_effect=[
+                StreamedResult([], error=SessionExpired("expired")),
+                StreamedResult([{"n.Id": 1}]),
+            ]
+        )
+        neo4j_conn = Neo4JConnFactory(retry_delay=0)
+
+        self.assertEqual([row async for row in neo4j_conn.iter_query("fake_query")], [{"n.Id": 1}])
+        self.assertEqual(session_mock.run.await_count, 2)
+
+        # not retried once some record was yielded, it would be yielded twice
+        session_mock.run = AsyncMock(
+            return_value=StreamedResult([{"n.Id": 1}], error=SessionExpired("expired"))
+        )
+        streamed_rows = []
+        with self.assertRaises(SessionExpired):
+            async for row in neo4j_conn.iter_query("fake_query"):
+                streamed_rows.append(row)
+        self.assertEqual(streamed_rows, [{"n.Id": 1}])
+        self.assertEqual(session_mock.run.await_count, 1)
+
+    @pytest.mark.asyncio
+    async def test_shared_driver(self):
+        driver_mock = self.mocker.patch("neo4j.AsyncGraphDatabase.driver", autospec=True)
+        drivers = Neo4jDriverFactory(max_connection_pool_size=5)
+        self.mocker.patch("neo4j_graph.models.neo4j_drivers", new=drivers)
+
+        a_conn = Neo4JConnFactory(user_name="user", db_name="db", shared_driver=True)
+        another_conn = Neo4JConnFactory(user_name="user", db_name="db", shared_driver=True)
+        not_shared_conn = Neo4JConnFactory()
+
+        self.assertIs(a_conn.async_driver, another_conn.async_driver)
+        self.assertEqual(driver_mock.call_count, 2)
+        self.assertEqual(driver_mock.call_args.kwargs["max_connection_pool_size"], 5)
+        self.assertIsNotNone(not_shared_conn.async_driver)
+
+        driver_mock.return_value.close = AsyncMock()
+        await drivers.close_all()
+        driver_mock.return_value.close.assert_awaited()
+
+    @pytest.mark.asyncio
+    async def test_startup(self):
+        session_mock = self.mock_session()
+        neo4j_conn = Neo4JConnFactory()
+        driver_mock = neo4j_conn.async_driver
+        driver_mock.verify_connectivity = AsyncMock()
+
+        self.assertTrue(await neo4j_conn.startup(warm_up_connections=3))
+        driver_mock.verify_connectivity.assert_awaited_once()
+        self.assertEqual(session_mock.run.await_count, 3)
+
+        driver_mock.verify_connectivity.side_effect = ServiceUnavailable("down")
+        self.assertFalse(await neo4j_conn.startup(warm_up_connections=3))
+        self.assertEqual(session_mock.run.await_count, 3)
+
+    @pytest.mark.asyncio
+    async def test_concurrency_stats(self):
+        async def slow_run(*_):
+            await asyncio.sleep(0.01)
+            return AsyncMock()
+
+        session_mock = self.mock_session()
+        session_mock.run = AsyncMock(side_effect=slow_run)
+        neo4j_conn = Neo4JConnFactory(max_concurrency=2)
+
+        await asyncio.gather(*[neo4j_conn.execute_query("fake_query") for _ in range(5)])
+
+        stats = neo4j_conn.concurrency_stats
+        self.assertEqual(stats["queries"], 5)
+        self.assertEqual((stats["in_flight"], stats["max_in_flight"]), (0, 2))
+        self.assertGreaterEqual(stats["semaphore_wait_time"], stats["max_semaphore_wait_time"])
+        self.assertGreater(stats["max_semaphore_wait_time"], 0)
+
 
 # TODO [missing tests]
 # TODO [bug] solve 'PytestUnknownMarkWarning: Unknown pytest.mark.asyncio - is this a typo?'
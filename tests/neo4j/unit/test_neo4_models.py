@@ -11,6 +11,7 @@ import datetime
 import unittest
 
 import pytest
+from neo4j.spatial import WGS84Point
 from pydantic import ValidationError
 
 from neo4j_graph import (
@@ -205,6 +206,14 @@ class TestBusStationNode(unittest.TestCase):
         actual_create_query = self.dummy_bus_station_node.cypher_create_query
         assert pytest.approx(actual_create_query) == pytest.approx(expected_create_query)
 
+    def test_cypher_parameters(self):
+        parameters = BusStationNodeFactory(
+            city_name='Sant "Pere" d\'Or', location=self.dummy_bus_station_node.location
+        ).cypher_parameters
+        self.assertEqual(parameters["CityName"], 'Sant "Pere" d\'Or')
+        self.assertEqual(parameters["Location"], WGS84Point((0.0, 0.0)))
+        self.assertEqual(set(parameters), self.dummy_bus_station_node.node_properties)
+
 
 class TestNodeRelationShip(unittest.TestCase):
     @pytest.fixture(autouse=True)
@@ -233,6 +242,70 @@ class TestNodeRelationShip(unittest.TestCase):
         )
         assert pytest.approx(str(relationship)) == pytest.approx(expected_relationship_cypher_str)
 
+    def test_create_relationship_parameterized_query(self):
+        relationship = NodeRelationshipFactory(
+            src_node_ids=[1],
+            dst_node_ids=[2, 3],
+            relation_type="can-transfer-to",
+        )
+        query, parameters = relationship.create_relationship_parameterized_query
+        self.assertIn("MERGE (a)-[r:CAN_TRANSFER_TO]->(b) SET r += $properties", query)
+        self.assertEqual(parameters["src_node_ids"], [1])
+        self.assertEqual(parameters["dst_node_ids"], [2, 3])
+        self.assertEqual(parameters["properties"]["TravelMode"], "bus")
+        self.assertNotIn("AverageDuration", parameters["properties"])  # None values not set
+
+        another_relationship = NodeRelationshipFactory(
+            src_node_ids=[4, 5], relation_type="can-transfer-to"
+        )
+        another_query, parameters = another_relationship.create_relationship_parameterized_query
+        self.assertEqual(another_query, query)
+        self.assertIsNone(parameters["dst_node_ids"])
+        self.assertEqual(
+            parameters["properties"]["AveragePrice"],
+            another_relationship.average_price.cypher_parameter,
+        )
+
+        with self.assertRaises(ValueError):
+            _ = NodeRelationshipFactory(src_node_ids=[]).create_relationship_parameterized_query
+
+    def test_sync_relationships_parameterized_query(self):
+        relationship = NodeRelationshipFactory(relation_type="can-transfer-to")
+        query, parameters = relationship.sync_relationships_parameterized_query(
+            [(1, [2, 3]), (2, None)], "EU"
+        )
+        self.assertIn("MATCH (a:BusStation { Id: row.src_id, Region: $region })", query)
+        self.assertIn(
+            "MATCH (b:BusStation { Region: $region }) WHERE b.Id IN row.dst_ids AND a <> b", query
+        )
+        self.assertIn("MERGE (a)-[r:CAN_TRANSFER_TO]->(b) SET r += $properties", query)
+        # just the relationships to nodes of the same region are deleted
+        self.assertIn("MATCH (a)-[r:CAN_TRANSFER_TO]->(b:BusStation { Region: $region })", query)
+        self.assertIn("DELETE r", query)
+        self.assertEqual(
+            parameters["rows"], [{"src_id": 1, "dst_ids": [2, 3]}, {"src_id": 2, "dst_ids": []}]
+        )
+        self.assertEqual(parameters["region"], "EU")
+        self.assertEqual(parameters["properties"]["TravelMode"], "bus")
+
+        query, _ = relationship.sync_relationships_parameterized_query(
+            [], "EU", remove_missing=False
+        )
+        self.assertNotIn("DELETE", query)
+
+    def test_relationship_queries_labels(self):
+        relationship = NodeRelationshipFactory(src_node_ids=[1], dst_node_ids=[2])
+        self.assertIn(
+            "MATCH (a:BusStation { Id: 1 }), (new_connections:BusStation)",
+            relationship.create_single_node_relationships(),
+        )
+        relationship = NodeRelationshipFactory(src_node_ids=[1, 2], node_type_label="city")
+        self.assertIn(
+            "MATCH (a:City {Id: node_id}),\n        (new_connections:City)",
+            relationship.create_multiple_node_relationships(),
+        )
+        self.assertNotIn("NodeTypeLabel", str(relationship))
+
     def test_invalid_name_type(self):
         with self.assertRaises(ValidationError):
             BusStationNodeFactory(city_name=3.14)
@@ -274,6 +347,29 @@ class TestUnstructuredGraph(unittest.TestCase):
 
         assert pytest.approx(graph.create_nodes_query) == pytest.approx(expected_query)
 
+    def test_create_nodes_parameterized_query(self):
+        query, parameters = self.dummy_graph.create_nodes_parameterized_query
+        self.assertEqual(
+            query,
+            "UNWIND $rows AS row MERGE (n:DummyNodeType { Id: row.Id }) "
+            "ON CREATE SET n.NodeType = row.NodeType, n.ReachableIds = row.ReachableIds "
+            "ON MATCH SET n.NodeType = row.NodeType, n.ReachableIds = row.ReachableIds",
+        )
+        self.assertEqual(
+            parameters["rows"][0], {"Id": 1, "NodeType": "dummy_node_type", "ReachableIds": [2, 3]}
+        )
+        self.assertEqual(len(parameters["rows"]), 3)
+
+    def test_bus_stations_upsert_key(self):
+        graph = UnstructuredGraphFactory(
+            nodes=[BusStationNodeFactory(id=1, station_uuid=None), BusStationNodeFactory(id=2)]
+        )
+        query, parameters = graph.create_nodes_parameterized_query
+        self.assertIn("MERGE (n:BusStation { Id: row.Id, Region: row.Region })", query)
+        self.assertIn("n.ReachableIds = row.ReachableIds", query)
+        self.assertNotIn("n.Id =", query)
+        self.assertIsNone(parameters["rows"][0]["StationUuid"])
+
     def test_different_nodes_class(self):
         with self.assertRaises(ValidationError):
             UnstructuredGraphFactory(nodes={}, relationship=self.dummy_node_relationship)
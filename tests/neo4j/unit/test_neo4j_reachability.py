@@ -0,0 +1,29 @@
+"""
+Implements tests for the bus stations reachability diff.
+"""
+import unittest
+
+from neo4j_graph import diff_reachability
+
+
+class TestDiffReachability(unittest.TestCase):
+    def test_diff_reachability(self):
+        stored = {1: [2, 3], 2: [1], 5: [1, 2]}
+        current = {1: [3, 4], 2: [1], 3: [1]}
+
+        changes = diff_reachability(stored, current)
+
+        self.assertEqual(changes.added, {1: [4], 3: [1]})
+        self.assertEqual(changes.removed, {1: [2]})
+        # 5 is not in the current scrape, so its edges are kept
+        self.assertEqual(changes.changed_station_ids, {1, 3})
+        self.assertEqual((changes.added_count, changes.removed_count), (2, 1))
+
+    def test_no_changes(self):
+        changes = diff_reachability({1: [2, 3]}, {1: [3, 2]})
+        self.assertFalse(changes)
+        self.assertEqual(changes.changed_station_ids, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,13 @@ import unittest
 
 import pytest
 
-from neo4j_graph import get_cypher_core_data_type, snake_to_upper_camel
+from neo4j_graph import (
+    get_bus_stations_schema_cypher_queries,
+    get_cypher_core_data_type,
+    get_nodes_cypher_query,
+    get_relationships_cypher_query,
+    snake_to_upper_camel,
+)
 
 test_objects_to_cypher_with_ids = [
     # [None, "Null", "none"],
@@ -71,5 +77,27 @@ def test_format_node_type_label(snake_str, expected_camel_str):
     assert pytest.approx(snake_to_upper_camel(snake_str)) == pytest.approx(expected_camel_str)
 
 
+def test_get_nodes_cypher_query_label():
+    assert (
+        get_nodes_cypher_query(region="US", properties=["id", "reachable_ids"])
+        == "MATCH(n:BusStation) WHERE n.Region='US' RETURN n.Id, n.ReachableIds"
+    )
+
+
+def test_get_relationships_cypher_query():
+    assert get_relationships_cypher_query(region="US") == (
+        "MATCH(n:BusStation) WHERE n.Region='US' "
+        "OPTIONAL MATCH (n)-[:CAN_TRANSFER_TO]->(m:BusStation) WHERE m.Region='US' "
+        "RETURN n.Id AS Id, collect(m.Id) AS DstIds"
+    )
+
+
+def test_bus_stations_schema_queries():
+    queries = get_bus_stations_schema_cypher_queries()
+    assert all("IF NOT EXISTS FOR (n:BusStation)" in query for query in queries)
+    for prop in ["n.Id", "n.CityUuid", "n.Region", "n.IsPopular"]:
+        assert any(query.endswith(f"ON ({prop})") for query in queries)
+
+
 if __name__ == "__main__":
     unittest.main()
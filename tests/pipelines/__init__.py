@@ -14,7 +14,7 @@ from pipelines.flixbus.bus_stations_pipeline import (
     FlixbusBusStationsDataLoader,
     FlixbusBusStationsDataProcessor,
 )
-from pipelines.flixbus.bus_trips_pipeline import FlixbusTripsTracker
+from pipelines.flixbus.bus_trips_pipeline import FlixbusCitiesDataGetter, FlixbusTripsTracker
 from pipelines.trip_alerts import TripsAlertBot
 
 
@@ -28,6 +28,11 @@ class FlixbusBusStationsDataLoaderFactory(Factory):
         model = FlixbusBusStationsDataLoader
 
 
+class FlixbusCitiesDataGetterFactory(Factory):
+    class Meta:
+        model = FlixbusCitiesDataGetter
+
+
 class FlixbusTripsTrackerFactory(Factory):
     class Meta:
         model = FlixbusTripsTracker
@@ -0,0 +1,80 @@
+"""
+Test cities getter
+"""
+import asyncio
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from flixbus_trips_alerts import configure_trips_rate_limit, get_flixbus_trips
+from pipelines import NoStoredDataError
+from scrapers import rate_limiters, url_host
+from scrapers.flixbus.trips_scraper import SEARCH_TRIPS_URI
+from tests.pipelines import FlixbusCitiesDataGetterFactory
+
+
+def mock_conn(cities):
+    async def iter_query(*_):
+        for city in cities:
+            yield city
+
+    conn_mock = MagicMock()
+    conn_mock.execute_read = AsyncMock(return_value=cities)
+    conn_mock.iter_query = iter_query
+    return conn_mock
+
+
+class TestFlixbusCitiesDataGetter(IsolatedAsyncioTestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, mocker):
+        self.mocker = mocker
+
+    @pytest.mark.asyncio
+    async def test_stored_data(self):
+        cities = [
+            {"from_city_uuid": "a", "from_is_popular": True, "to_city_uuids": ["b"]},
+            {"from_city_uuid": "b", "from_is_popular": False, "to_city_uuids": ["a"]},
+        ]
+        cities_getter = FlixbusCitiesDataGetterFactory(conn=mock_conn(cities))
+        self.assertEqual(await cities_getter.get_stored_data(), [{"a": ["b"]}, {"b": ["a"]}])
+        self.assertEqual(cities_getter.popular_city_uuids, {"a"})
+
+        cities_getter = FlixbusCitiesDataGetterFactory(conn=mock_conn(cities))
+        streamed_cities = [city async for city in cities_getter.aiter_stored_data()]
+        self.assertEqual(streamed_cities, [{"a": ["b"]}, {"b": ["a"]}])
+        self.assertEqual(cities_getter.popular_city_uuids, {"a"})
+
+    @pytest.mark.asyncio
+    async def test_no_stored_data(self):
+        cities_getter = FlixbusCitiesDataGetterFactory(conn=mock_conn([]), region="US")
+        with self.assertRaises(NoStoredDataError):
+            await cities_getter.get_stored_data()
+        with self.assertRaises(NoStoredDataError):
+            _ = [city async for city in cities_getter.aiter_stored_data()]
+
+    @pytest.mark.asyncio
+    async def test_no_stored_data_does_not_stop_other_regions(self):
+        trips_mock = self.mocker.patch(
+            "flixbus_trips_alerts.new_flixbus_trips_scheduler", autospec=True
+        )
+        trips_mock.return_value.pop.return_value = None
+
+        results = await asyncio.gather(
+            get_flixbus_trips("US", conn=mock_conn([])),
+            asyncio.sleep(0, result="EU"),
+            return_exceptions=True,
+        )
+
+        self.assertIsInstance(results[0], NoStoredDataError)
+        self.assertEqual(results[1], "EU")
+
+    def test_trips_rate_limit(self):
+        self.mocker.patch("flixbus_trips_alerts.SCRAPER_TRIPS_REQUESTS_PER_HOUR", 3600)
+        host = url_host(SEARCH_TRIPS_URI)
+        self.mocker.patch.dict(rate_limiters.host_settings)
+
+        # configured once with the combined budget of the regions run at once
+        configure_trips_rate_limit(regions=3)
+        self.assertEqual(rate_limiters.host_settings[host]["rate"], 3)
+        self.assertEqual(rate_limiters.host_settings[host]["max_rate"], 3)
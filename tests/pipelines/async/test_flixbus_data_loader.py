@@ -2,13 +2,43 @@
 Test loader
 """
 import asyncio
+import math
 from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock
 
 import pytest
 
+from flixbus_stations_loader import scrape_and_process_tiled_stations
+from scrapers.flixbus.bus_stations_scraper import FlixbusBusStationsScraper
 from tests.pipelines import FlixbusBusStationsDataLoaderFactory
 
 
+class FakeGraphConn:
+    """
+    An in memory graph of a region, running the loader node upserts and relationships syncs.
+    """
+
+    def __init__(self):
+        self.edges: dict[int, set[int]] = {}
+
+    async def bootstrap_schema(self, _queries):
+        ...
+
+    async def execute_read(self, _query, _parameters=None):
+        return [
+            {"Id": node_id, "DstIds": sorted(dst_ids)} for node_id, dst_ids in self.edges.items()
+        ]
+
+    async def execute_write(self, _query, parameters):
+        for row in parameters["rows"]:
+            if "src_id" in row:
+                self.edges[row["src_id"]] = {
+                    dst_id for dst_id in row["dst_ids"] if dst_id in self.edges
+                } - {row["src_id"]}
+            else:
+                self.edges.setdefault(row["Id"], set())
+
+
 class TestFlixbusBusStationsDataLoader(IsolatedAsyncioTestCase):
     @pytest.fixture(autouse=True)
     def __inject_fixtures(self, mocker, flixbus_busstations_processed_data_mock):
@@ -32,6 +62,124 @@ class TestFlixbusBusStationsDataLoader(IsolatedAsyncioTestCase):
         # session_mock.__aenter__.assert_awaited_once()
         # session_mock.__aexit__.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_load_busstations_queries(self):
+        unchanged_item = self.processed_data[0]
+        reachable_nodes = [
+            {"Id": reachable_id, "DstIds": []}
+            for item in self.processed_data
+            for reachable_id in item["reachable_ids"]
+        ]
+        stored_nodes = [
+            {"Id": unchanged_item["id"], "DstIds": unchanged_item["reachable_ids"]},
+            {"Id": 999, "DstIds": [unchanged_item["id"]]},  # missing from this scrape
+        ] + reachable_nodes
+        conn_mock = AsyncMock()
+        conn_mock.execute_read.return_value = stored_nodes
+        flixbus_loader = FlixbusBusStationsDataLoaderFactory(
+            processed_data=self.processed_data,
+            conn=conn_mock,
+            chunk_size=2,
+            relationships_chunk_size=2,
+        )
+
+        await flixbus_loader.load_items()
+
+        conn_mock.bootstrap_schema.assert_awaited_once()
+        conn_mock.execute_read.assert_awaited_once()
+        queries = [call.args for call in conn_mock.execute_write.await_args_list]
+        nodes_chunks = math.ceil(len(self.processed_data) / 2)
+        upserted_ids = [
+            row["Id"] for _, parameters in queries[:nodes_chunks] for row in parameters["rows"]
+        ]
+        self.assertEqual(upserted_ids, [item["id"] for item in self.processed_data])
+
+        synced_rows = [
+            row for _, parameters in queries[nodes_chunks:] for row in parameters["rows"]
+        ]
+        expected_rows = [
+            {"src_id": item["id"], "dst_ids": item["reachable_ids"]}
+            for item in self.processed_data[1:]
+        ]
+        self.assertCountEqual(synced_rows, expected_rows)
+
+    @pytest.mark.asyncio
+    async def test_partial_scrape_keeps_relationships(self):
+        fake_graph = FakeGraphConn()
+
+        def stations(reachable_ids_by_id):
+            return [
+                dict(self.processed_data[0], id=station_id, reachable_ids=reachable_ids)
+                for station_id, reachable_ids in reachable_ids_by_id.items()
+            ]
+
+        full_scrape = stations({1: [2, 3], 2: [1], 3: [1, 2]})
+        partial_scrape = stations({1: [2, 3], 2: [1]})  # e.g. the tile of 3 failed
+        expected_edges = {1: {2, 3}, 2: {1}, 3: {1, 2}}
+
+        for processed_data in (full_scrape, partial_scrape, full_scrape):
+            flixbus_loader = FlixbusBusStationsDataLoaderFactory(
+                processed_data=processed_data, conn=fake_graph
+            )
+            await flixbus_loader.load_items()
+            self.assertEqual(fake_graph.edges, expected_edges)
+
+        # relationships lost (e.g. a failed sync) are restored by the next load
+        fake_graph.edges[3] = set()
+        await FlixbusBusStationsDataLoaderFactory(
+            processed_data=full_scrape, conn=fake_graph
+        ).load_items()
+        self.assertEqual(fake_graph.edges, expected_edges)
+
+    @pytest.mark.asyncio
+    async def test_sync_relationships_by_region(self):
+        # the same station id in two regions
+        adjacency = [(1, [2, 3])]
+        for region in ("EU", "US"):
+            conn_mock = AsyncMock()
+            flixbus_loader = FlixbusBusStationsDataLoaderFactory(
+                processed_data=self.processed_data, conn=conn_mock, region=region
+            )
+
+            await flixbus_loader.sync_relationships(adjacency)
+
+            query, parameters = conn_mock.execute_write.await_args.args
+            self.assertEqual(parameters["region"], region)
+            self.assertEqual(parameters["rows"], [{"src_id": 1, "dst_ids": [2, 3]}])
+            self.assertIn("Id: row.src_id, Region: $region", query)
+
+    @pytest.mark.asyncio
+    async def test_tiled_stations_popularity(self):
+        def hit(station_id, search_volume):
+            return {
+                "_source": {
+                    "id": station_id,
+                    "name": f"city {station_id}",
+                    "uuid": f"uuid-{station_id}",
+                    "location": {"lat": 1.0, "lon": 1.0},
+                    "search_volume": search_volume,
+                    "reachable": [{"id": station_id + 1}],
+                }
+            }
+
+        def iter_all_hits(scraper, method="POST"):
+            self.assertEqual(method, "POST")
+            is_first_tile = (
+                scraper.bounding_box["top_left"] == scraper.region_coordinates["top_left"]
+            )
+            if is_first_tile:  # the most searched stations
+                return iter([hit(i, 1000 - i) for i in range(1, 16)])
+            return iter([hit(i, 100 - i) for i in range(16, 31)])
+
+        self.mocker.patch.object(FlixbusBusStationsScraper, "iter_all_hits", new=iter_all_hits)
+
+        stations = await scrape_and_process_tiled_stations("EU", rows=1, cols=2)
+
+        self.assertEqual(len(stations), 30)
+        # the 21 most searched stations of the region, not of each tile
+        popular_ids = {station["id"] for station in stations if station["is_popular"]}
+        self.assertEqual(popular_ids, set(range(1, 22)))
+
 
 if __name__ == "__main__":
     asyncio.run(pytest.main(["-v"]))
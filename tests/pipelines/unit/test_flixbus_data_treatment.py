@@ -1,13 +1,21 @@
 """
 Implements tests for Scrapers models.
 """
+import copy
+import json
 import unittest
 from datetime import datetime
+from unittest.mock import MagicMock
 
 import pytest
 
 from pipelines.flixbus.bus_trips_pipeline import FlixbusTripsTracker
 from pipelines.trip_alerts import TripsAlertBot
+from scrapers.flixbus.trips_scraper import (
+    FlixbusTripsScraper,
+    project_trip_result,
+    project_trips_response,
+)
 from tests.pipelines import FlixbusTripsTrackerFactory, TripsAlertBotFactory
 
 
@@ -19,6 +27,51 @@ class TestFlixbusTripsTracker(unittest.TestCase):
         self.assertTrue(trips_tracker.discount_threshold < 1)
 
 
+class TestTripsResponseProjection(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, flixbus_trips_test_response):
+        self.response_data = flixbus_trips_test_response
+
+    def test_projected_response(self):
+        response = MagicMock(content=json.dumps(self.response_data).encode())
+        trips_scraper = FlixbusTripsScraper(
+            departure_city_uuid="40d8f682-8646-11e6-9066-549f350fcb0c",
+            arrival_city_uuid="40de8964-8646-11e6-9066-549f350fcb0c",
+        )
+        projected_data = trips_scraper.decode_response(response)
+
+        self.assertNotIn("response_uuid", projected_data)
+        first_result = next(iter(projected_data["trips"][0]["results"].values()))
+        self.assertEqual(set(first_result), {"departure", "price", "available"})
+        self.assertLess(len(json.dumps(projected_data)), len(response.content) / 2)
+
+        trips_tracker = FlixbusTripsTracker(discount_threshold=50)
+        self.assertEqual(
+            trips_tracker.filter_cheap_trips(projected_data),
+            trips_tracker.filter_cheap_trips(self.response_data),
+        )
+        self.assertEqual(
+            trips_tracker.best_price_ratio(projected_data),
+            trips_tracker.best_price_ratio(self.response_data),
+        )
+
+        trips_scraper.project_responses = False
+        self.assertEqual(trips_scraper.decode_response(response), self.response_data)
+
+    def test_malformed_results_are_skipped(self):
+        response_data = copy.deepcopy(self.response_data)
+        trip = response_data["trips"][0]
+        result_ids = list(trip["results"])
+        del trip["results"][result_ids[0]]["price"]  # a partial result
+        response_data["trips"].append({"departure_city_id": "missing", "results": {}})
+
+        projected_data = project_trips_response(response_data)
+
+        self.assertEqual(len(projected_data["trips"]), len(self.response_data["trips"]))
+        self.assertEqual(list(projected_data["trips"][0]["results"]), result_ids[1:])
+        self.assertIsNone(project_trip_result({"departure": {"date": "2023-08-01"}}))
+
+
 class TestTripAlertBot(unittest.TestCase):
     @pytest.fixture(autouse=True)
     def __inject_fixtures(self, test_cheap_trip):
@@ -4,7 +4,13 @@ Implements tests for Scrapers models.
 NOTE: Define a pytest fixture named __inject_fixtures with the autouse=True option is necessary,
  in order to inject the value of fixtures into all test methods in the test class where it is used.
 """
+import json
+import os
+import tempfile
+import time
 import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -12,7 +18,21 @@ from scrapers.flixbus.bus_stations_scraper import (
     FlixbusBusStationsParser,
     FlixbusBusStationsScraper,
 )
-from tests.scrapers import FlixbusBusStationsParserFactory, FlixbusBusStationsScraperFactory
+from scrapers.flixbus.trips_empty_searches import (
+    EmptySearchesCache,
+    EmptySearchesPolicy,
+    SearchFilters,
+)
+from scrapers.flixbus.trips_freshness import FreshnessPolicy, TripsFreshnessIndex
+from scrapers.flixbus.trips_jobs import CityUuidTable, TripJob, TripsJobPlanner
+from scrapers.flixbus.trips_scheduling import TripsPriorityScheduler, route_key
+from scrapers.flixbus.trips_scraper import FlixbusTripsScraper
+from scrapers.flixbus.trips_yield import RouteYieldBandit
+from tests.scrapers import (
+    FlixbusBusStationsParserFactory,
+    FlixbusBusStationsScraperFactory,
+    FlixbusTripsScraperFactory,
+)
 
 
 class TestFlixbusBusStationsScraper(unittest.TestCase):
@@ -21,6 +41,7 @@ class TestFlixbusBusStationsScraper(unittest.TestCase):
         self.assertIsInstance(flixbus_scraper, FlixbusBusStationsScraper)
         self.assertIsInstance(flixbus_scraper.query_size, int)
         self.assertIsInstance(flixbus_scraper.query, dict)
+        self.assertFalse(flixbus_scraper.sharing.cache_ttl)  # streamed responses are not cached
 
         flixbus_scraper = FlixbusBusStationsScraperFactory(region="eu")
         self.assertEqual(flixbus_scraper.region, "EU")
@@ -32,6 +53,114 @@ class TestFlixbusBusStationsScraper(unittest.TestCase):
         # TODO [missing tests] requests
 
 
+class TestFlixbusBusStationsStreaming(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, mocker, flixbus_busstations_response_data_mock):
+        self.mocker = mocker
+        self.response_data = flixbus_busstations_response_data_mock
+
+    def test_iter_hits(self):
+        content = json.dumps(self.response_data).encode()
+        response = MagicMock(status_code=200, headers={})
+        response.iter_content.side_effect = lambda chunk_size: (
+            content[i : i + chunk_size] for i in range(0, len(content), chunk_size)
+        )
+        session_mock = MagicMock()
+        session_mock.post.return_value = response
+        self.mocker.patch.object(
+            FlixbusBusStationsScraper, "requests_retry_session", new=session_mock
+        )
+
+        flixbus_scraper = FlixbusBusStationsScraperFactory()
+        hits = flixbus_scraper.iter_hits(chunk_size=100)
+        self.assertEqual(next(hits), self.response_data["hits"]["hits"][0])
+        self.assertEqual(list(hits), self.response_data["hits"]["hits"][1:])
+        self.assertTrue(session_mock.post.call_args.kwargs["stream"])
+
+        flixbus_parser = FlixbusBusStationsParserFactory(scraped_data=[self.response_data])
+        self.assertEqual(
+            list(flixbus_parser.iter_items(flixbus_scraper.iter_hits(chunk_size=100))),
+            flixbus_parser.parse_data(),
+        )
+
+
+class TestFlixbusBusStationsTiles(unittest.IsolatedAsyncioTestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_tiles(self):
+        flixbus_scraper = FlixbusBusStationsScraperFactory(region="EU")
+        tiles = flixbus_scraper.tiles(2, 3)
+        self.assertEqual(len(tiles), 6)
+
+        region_box = flixbus_scraper.region_coordinates
+        self.assertEqual(tiles[0].search_bounding_box["top_left"], region_box["top_left"])
+        self.assertAlmostEqual(
+            tiles[-1].search_bounding_box["bottom_right"]["lat"],
+            region_box["bottom_right"]["lat"],
+        )
+        self.assertAlmostEqual(
+            tiles[-1].search_bounding_box["bottom_right"]["lon"],
+            region_box["bottom_right"]["lon"],
+        )
+        self.assertEqual(
+            tiles[0].query["query"]["bool"]["filter"][0]["geo_bounding_box"]["location"],
+            tiles[0].bounding_box,
+        )
+        with self.assertRaises(ValueError):
+            flixbus_scraper.tiles(0, 1)
+
+    def test_iter_all_hits_pages(self):
+        pages = {0: [{"_source": {"id": 1}}, {"_source": {"id": 2}}], 2: [{"_source": {"id": 3}}]}
+        offsets = []
+
+        def iter_hits(scraper, method="POST"):
+            self.assertEqual(method, "POST")
+            offsets.append(scraper.offset)
+            return iter(pages[scraper.offset])
+
+        self.mocker.patch.object(FlixbusBusStationsScraper, "iter_hits", new=iter_hits)
+        flixbus_scraper = FlixbusBusStationsScraperFactory(query_size=2)
+        hits = list(flixbus_scraper.iter_all_hits())
+        self.assertEqual([hit["_source"]["id"] for hit in hits], [1, 2, 3])
+        self.assertEqual(offsets, [0, 2])
+
+    async def test_aiter_tiled_hits(self):
+        def iter_all_hits(scraper, method="POST"):
+            self.assertEqual(method, "POST")
+            is_first_tile = (
+                scraper.bounding_box["top_left"] == scraper.region_coordinates["top_left"]
+            )
+            if is_first_tile:
+                return iter([{"_source": {"id": 1, "search_volume": 5}}, {"_source": {"id": 2}}])
+            return iter([{"_source": {"id": 2}}, {"_source": {"id": 3, "search_volume": 9}}, {}])
+
+        self.mocker.patch.object(FlixbusBusStationsScraper, "iter_all_hits", new=iter_all_hits)
+        flixbus_scraper = FlixbusBusStationsScraperFactory()
+        tiles_hits = [tile_hits async for tile_hits in flixbus_scraper.aiter_tiled_hits(1, 2)]
+        self.assertEqual(len(tiles_hits), 2)
+        hit_ids = [hit["_source"]["id"] for tile_hits in tiles_hits for hit in tile_hits]
+        self.assertCountEqual(hit_ids, [1, 2, 3])  # duplicated and malformed hits are skipped
+
+        # hits consumed in each tile thread, e.g. counted
+        tiles_counts = [
+            count async for count in flixbus_scraper.aiter_tiled_hits(1, 2, consume=len_of_iter)
+        ]
+        self.assertEqual(sum(tiles_counts), 3)
+
+    def test_query_sort_tiebreaker(self):
+        flixbus_scraper = FlixbusBusStationsScraperFactory()
+        self.assertEqual(
+            flixbus_scraper.query["sort"],
+            [{"search_volume": {"order": "desc"}}, {"id": {"order": "asc"}}],
+        )
+
+
+def len_of_iter(iterator):
+    return sum(1 for _ in iterator)
+
+
 class TestrFlixbusBusStationsParser(unittest.TestCase):
     @pytest.fixture(autouse=True)
     def __inject_fixtures(self, flixbus_busstations_response_data_mock):
@@ -48,5 +177,444 @@ class TestrFlixbusBusStationsParser(unittest.TestCase):
         # TODO [improvement] test
 
 
+class TestFlixbusTripsScraper(unittest.TestCase):
+    def test_lazy_endpoint_uris(self):
+        start_date = datetime(2023, 8, 1)
+        trips_scraper = FlixbusTripsScraperFactory(
+            departure_city_uuid="dummy_departure_uuid",
+            arrival_city_uuid="dummy_arrival_uuid",
+            start_date=start_date,
+            end_date=start_date + timedelta(days=59),
+        )
+        self.assertIsNone(trips_scraper.endpoint_uris)
+
+        uris = list(trips_scraper.iter_endpoint_uris())
+        self.assertEqual(len(uris), 60)
+        self.assertEqual(len(set(uris)), 60)
+        self.assertTrue(all("from_city_id=dummy_departure_uuid" in uri for uri in uris))
+        self.assertIn("departure_date=01.08.2023", " ".join(uris))
+        self.assertIn("departure_date=29.09.2023", " ".join(uris))
+        # generated again on each call
+        self.assertEqual(set(trips_scraper.iter_endpoint_uris()), set(uris))
+
+    def test_dates_range_generator(self):
+        start_date = datetime(2023, 8, 1)
+        trips_scraper = FlixbusTripsScraperFactory(
+            departure_city_uuid="dummy_departure_uuid",
+            arrival_city_uuid="dummy_arrival_uuid",
+            start_date=start_date,
+            end_date=start_date + timedelta(days=2),
+        )
+        self.assertEqual(
+            list(trips_scraper.dates_range_generator()), ["01.08.2023", "02.08.2023", "03.08.2023"]
+        )
+        self.assertCountEqual(
+            trips_scraper.dates_range_generator(shuffle=True),
+            ["01.08.2023", "02.08.2023", "03.08.2023"],
+        )
+
+
+BERLIN_UUID = "40d8f682-8646-11e6-9066-549f350fcb0c"
+PARIS_UUID = "40de8964-8646-11e6-9066-549f350fcb0c"
+WIEN_UUID = "40de1f31-8646-11e6-9066-549f350fcb0c"
+
+
+class TestTripsJobPlanner(unittest.TestCase):
+    def test_city_uuid_table(self):
+        cities = CityUuidTable()
+        self.assertEqual(cities.intern(BERLIN_UUID), 0)
+        self.assertEqual(cities.intern(PARIS_UUID), 1)
+        self.assertEqual(cities.intern(BERLIN_UUID), 0)
+        self.assertEqual(len(cities), 2)
+        self.assertEqual(cities.uuid(1), PARIS_UUID)
+        with self.assertRaises(IndexError):
+            cities.uuid(2)
+        with self.assertRaises(ValueError):
+            cities.intern("not a uuid")
+
+    def test_planner(self):
+        start_date = datetime(2023, 8, 1)
+        trips_planner = TripsJobPlanner(start_date=start_date, days=2)
+        trips_planner.add_routes(
+            [{BERLIN_UUID: [PARIS_UUID, WIEN_UUID]}, {PARIS_UUID: [BERLIN_UUID]}]
+        )
+
+        self.assertEqual(len(trips_planner), 3)
+        self.assertEqual(len(trips_planner.cities), 3)
+        self.assertEqual(list(trips_planner.iter_routes()), [(0, 1), (0, 2), (1, 0)])
+        self.assertCountEqual(trips_planner.iter_routes(shuffle=True), [(0, 1), (0, 2), (1, 0)])
+
+        jobs = list(trips_planner.iter_jobs())
+        self.assertEqual(len(jobs), 9)
+        self.assertEqual(jobs[0], TripJob(0, 1, 0))
+        self.assertEqual(
+            trips_planner.job_uri(TripJob(1, 0, 2)),
+            f"https://global.api.flixbus.com/search/service/v4/search?from_city_id={PARIS_UUID}"
+            f"&to_city_id={BERLIN_UUID}&departure_date=03.08.2023&&products=%7B%22adult%22%3A1%7D"
+            "&currency=EUR&search_by=cities&include_after_midnight_rides=1",
+        )
+
+        job_scraper = trips_planner.job_scraper(TripJob(1, 0, 2))
+        self.assertIsInstance(job_scraper, FlixbusTripsScraper)
+        self.assertEqual(
+            list(job_scraper.iter_endpoint_uris()), [trips_planner.job_uri(TripJob(1, 0, 2))]
+        )
+
+        route_scraper = trips_planner.route_scraper(0, 2)
+        self.assertEqual(route_scraper.arrival_city_uuid, WIEN_UUID)
+        self.assertEqual(len(list(route_scraper.iter_endpoint_uris())), 3)
+
+
+class TestTripsPriorityScheduler(unittest.TestCase):
+    def setUp(self):
+        self.trips_planner = TripsJobPlanner(start_date=datetime(2023, 8, 1), days=2)
+        self.trips_planner.add_routes([{BERLIN_UUID: [PARIS_UUID]}, {PARIS_UUID: [WIEN_UUID]}])
+
+    def test_every_job_is_popped_once(self):
+        trips_scheduler = TripsPriorityScheduler(self.trips_planner)
+        trips_scheduler.schedule_routes(now=0)
+        self.assertEqual(len(trips_scheduler), 2)
+
+        jobs = []
+        while (job := trips_scheduler.pop(now=0)) is not None:
+            jobs.append(job)
+        self.assertCountEqual(jobs, list(self.trips_planner.iter_jobs()))
+        # sooner dates of the same route first
+        self.assertEqual([job.day_offset for job in jobs if job.route == (0, 1)], [0, 1, 2])
+
+    def test_popular_routes_first(self):
+        trips_scheduler = TripsPriorityScheduler(
+            self.trips_planner, popular_city_uuids=[PARIS_UUID, WIEN_UUID, "unknown"]
+        )
+        trips_scheduler.schedule_routes(now=0)
+        self.assertEqual(trips_scheduler.popular_cities, {1, 2})
+        self.assertEqual(trips_scheduler.pop(now=0).route, (1, 2))
+
+    def test_stale_routes_first(self):
+        trips_scheduler = TripsPriorityScheduler(
+            self.trips_planner, last_scraped={route_key(1, 2): 1000.0}
+        )
+        trips_scheduler.schedule_routes(now=1000)
+        self.assertEqual(trips_scheduler.pop(now=1000).route, (0, 1))
+
+        trips_scheduler.mark_scraped(TripJob(0, 1, 0), scraped_at=1000)
+        self.assertEqual(trips_scheduler.last_scraped[route_key(0, 1)], 1000)
+        self.assertLess(
+            trips_scheduler.priority(TripJob(0, 1, 0), now=1000),
+            trips_scheduler.priority(TripJob(0, 1, 0), now=1000 + 6 * 60 * 60),
+        )
+
+    def test_low_priority_jobs_are_not_starved(self):
+        trips_scheduler = TripsPriorityScheduler(
+            self.trips_planner, popular_city_uuids=[PARIS_UUID, WIEN_UUID], fairness_horizon=60
+        )
+        trips_scheduler.schedule_routes(now=0)
+        # the next date of the popular route is scheduled after the fairness horizon
+        self.assertEqual(trips_scheduler.pop(now=120).route, (1, 2))
+        self.assertEqual(trips_scheduler.pop(now=120).route, (0, 1))
+
+    def test_add_route(self):
+        trips_scheduler = TripsPriorityScheduler(
+            TripsJobPlanner(start_date=datetime(2023, 8, 1), days=2)
+        )
+        trips_scheduler.add_route(BERLIN_UUID, PARIS_UUID, now=0)
+        self.assertEqual(trips_scheduler.pop(now=0).route, (0, 1))
+
+        # routes added while the first ones are being popped
+        trips_scheduler.add_popular_city(WIEN_UUID)
+        trips_scheduler.add_route(PARIS_UUID, WIEN_UUID, now=0)
+        self.assertEqual(trips_scheduler.popular_cities, {2})
+        self.assertEqual(len(trips_scheduler.planner), 2)
+        self.assertEqual(trips_scheduler.pop(now=0).route, (1, 2))
+
+    def test_max_jobs(self):
+        trips_scheduler = TripsPriorityScheduler(self.trips_planner, max_jobs=4)
+        trips_scheduler.schedule_routes(now=0)
+        jobs = []
+        while (job := trips_scheduler.pop(now=0)) is not None:
+            jobs.append(job)
+        self.assertEqual(len(jobs), 4)
+
+    def test_high_yield_routes_first(self):
+        bandit = RouteYieldBandit(exploration=0)
+        for _ in range(5):
+            bandit.record(route_key(0, 1), hit=False, price_ratio=1.0)
+            bandit.record(route_key(1, 2), hit=True, price_ratio=0.4)
+
+        trips_scheduler = TripsPriorityScheduler(self.trips_planner, bandit=bandit)
+        trips_scheduler.schedule_routes(now=0)
+        self.assertEqual(trips_scheduler.pop(now=0).route, (1, 2))
+
+    def test_fresh_jobs_are_skipped(self):
+        freshness_index = TripsFreshnessIndex()
+        trips_scheduler = TripsPriorityScheduler(
+            self.trips_planner, freshness_index=freshness_index
+        )
+        trips_scheduler.mark_scraped(TripJob(0, 1, 0), scraped_at=time.time())
+        self.assertFalse(freshness_index.is_stale(BERLIN_UUID, PARIS_UUID, date(2023, 8, 1)))
+
+        trips_scheduler.schedule_routes(now=0)
+        jobs = []
+        while (job := trips_scheduler.pop()) is not None:
+            jobs.append(job)
+        self.assertEqual(len(jobs), 5)
+        self.assertNotIn(TripJob(0, 1, 0), jobs)
+
+    def test_invalid_weights(self):
+        with self.assertRaises(ValueError):
+            TripsPriorityScheduler(self.trips_planner, soonness_weight=-1)
+        with self.assertRaises(ValueError):
+            TripsPriorityScheduler(
+                self.trips_planner, soonness_weight=0, popularity_weight=0, staleness_weight=0
+            )
+
+
+class TestRouteYieldBandit(unittest.TestCase):
+    def test_score(self):
+        bandit = RouteYieldBandit(volatility_weight=0)
+        self.assertEqual(bandit.score(route_key(0, 1)), 1.0)
+
+        for hit in (True, False, True, False):
+            bandit.record(route_key(0, 1), hit=hit)
+        for _ in range(4):
+            bandit.record(route_key(1, 2), hit=False)
+
+        self.assertAlmostEqual(bandit.routes[route_key(0, 1)].hit_rate, 0.49, places=2)
+        self.assertGreater(bandit.score(route_key(0, 1)), bandit.score(route_key(1, 2)))
+        # rarely scraped routes are explored again
+        for _ in range(100):
+            bandit.record(route_key(0, 1), hit=False)
+        self.assertGreater(bandit.score(route_key(1, 2)), bandit.score(route_key(0, 1)))
+
+    def test_price_volatility(self):
+        bandit = RouteYieldBandit(exploration=0)
+        for price_ratio in (1.0, 0.6, 1.0, 0.6):
+            bandit.record(route_key(0, 1), hit=False, price_ratio=price_ratio)
+            bandit.record(route_key(1, 2), hit=False, price_ratio=0.9)
+
+        self.assertGreater(bandit.routes[route_key(0, 1)].volatility, 0)
+        self.assertEqual(bandit.routes[route_key(1, 2)].volatility, 0)
+        self.assertGreater(bandit.score(route_key(0, 1)), bandit.score(route_key(1, 2)))
+
+    def test_persistence(self):
+        cities = CityUuidTable()
+        key = route_key(cities.intern(BERLIN_UUID), cities.intern(PARIS_UUID))
+        bandit = RouteYieldBandit()
+        bandit.record(key, hit=True, price_ratio=0.5)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "routes_yield.json")
+            bandit.save(file_path, cities)
+
+            other_cities = CityUuidTable()
+            other_cities.intern(WIEN_UUID)
+            loaded_bandit = RouteYieldBandit()
+            loaded_bandit.load(file_path, other_cities)
+
+        other_key = route_key(other_cities.get(BERLIN_UUID), other_cities.get(PARIS_UUID))
+        self.assertEqual(loaded_bandit.score(other_key), bandit.score(key))
+        self.assertEqual(loaded_bandit.total_pulls, 1)
+
+
+class TestTripsFreshness(unittest.TestCase):
+    def test_policy(self):
+        freshness_policy = FreshnessPolicy(
+            ttls=((7, 3600), (1, 60)), route_ttls={(BERLIN_UUID, PARIS_UUID): [(365, 10)]}
+        )
+        from_date = date(2023, 8, 1)
+        self.assertEqual(freshness_policy.ttl(PARIS_UUID, WIEN_UUID, from_date, from_date), 60)
+        self.assertEqual(
+            freshness_policy.ttl(PARIS_UUID, WIEN_UUID, date(2023, 8, 5), from_date), 3600
+        )
+        # the last tier for further dates
+        self.assertEqual(
+            freshness_policy.ttl(PARIS_UUID, WIEN_UUID, date(2023, 10, 1), from_date), 3600
+        )
+        self.assertEqual(freshness_policy.ttl(BERLIN_UUID, PARIS_UUID, from_date, from_date), 10)
+        with self.assertRaises(ValueError):
+            FreshnessPolicy(ttls=())
+
+    def test_index(self):
+        departure_date = date.today() + timedelta(days=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "trips_freshness.json")
+            freshness_index = TripsFreshnessIndex(
+                FreshnessPolicy(ttls=[(365, 60)]), file_path=file_path
+            )
+            self.assertTrue(freshness_index.is_stale(BERLIN_UUID, PARIS_UUID, departure_date))
+
+            freshness_index.mark_scraped(BERLIN_UUID, PARIS_UUID, departure_date, scraped_at=1000)
+            freshness_index.mark_scraped(BERLIN_UUID, PARIS_UUID, date(2020, 1, 1), scraped_at=0)
+            self.assertFalse(
+                freshness_index.is_stale(BERLIN_UUID, PARIS_UUID, departure_date, now=1059)
+            )
+            self.assertTrue(
+                freshness_index.is_stale(BERLIN_UUID, PARIS_UUID, departure_date, now=1060)
+            )
+
+            freshness_index.save()
+            loaded_index = TripsFreshnessIndex(file_path=file_path)
+
+        # past dates are not saved
+        self.assertEqual(len(loaded_index), 1)
+        self.assertEqual(loaded_index.last_scraped(BERLIN_UUID, PARIS_UUID, departure_date), 1000)
+
+    def test_scraper_emits_stale_urls(self):
+        start_date = datetime(2023, 8, 1)
+        freshness_index = TripsFreshnessIndex()
+        freshness_index.mark_scraped(BERLIN_UUID, PARIS_UUID, date(2023, 8, 2))
+        flixbus_trips_scraper = FlixbusTripsScraper(
+            departure_city_uuid=BERLIN_UUID,
+            arrival_city_uuid=PARIS_UUID,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=2),
+            search_filters=SearchFilters(freshness_index),
+        )
+        endpoint_uris = list(flixbus_trips_scraper.iter_endpoint_uris())
+        self.assertEqual(len(endpoint_uris), 2)
+        self.assertFalse(any("departure_date=02.08.2023" in uri for uri in endpoint_uris))
+
+    def test_scraper_all_dates_fresh(self):
+        start_date = datetime.now()
+        freshness_index = TripsFreshnessIndex()
+        for day in range(3):
+            freshness_index.mark_scraped(
+                BERLIN_UUID, PARIS_UUID, (start_date + timedelta(day)).date()
+            )
+        flixbus_trips_scraper = FlixbusTripsScraper(
+            departure_city_uuid=BERLIN_UUID,
+            arrival_city_uuid=PARIS_UUID,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=2),
+            search_filters=SearchFilters(freshness_index),
+        )
+        # no requests, no error
+        with patch.object(FlixbusTripsScraper, "_fetch") as fetch_mock:
+            self.assertEqual(flixbus_trips_scraper.get_data(), [])
+            self.assertEqual(list(flixbus_trips_scraper.iter_stream()), [])
+        fetch_mock.assert_not_called()
+
+        # given endpoint_uris are still mandatory
+        with self.assertRaises(ValueError):
+            FlixbusTripsScraper(
+                departure_city_uuid=BERLIN_UUID, arrival_city_uuid=PARIS_UUID, endpoint_uris=[]
+            ).get_data()
+
+
+class TestEmptySearchesCache(unittest.TestCase):
+    def test_empty_dates(self):
+        empty_searches = EmptySearchesCache(EmptySearchesPolicy(half_life=100))
+        departure_date = date(2023, 8, 1)
+        self.assertFalse(empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, departure_date, 0))
+
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, departure_date, empty=True, now=0)
+        self.assertTrue(empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, departure_date, 10))
+        # the confidence decays, so it is searched again
+        self.assertAlmostEqual(
+            empty_searches.empty_confidence(BERLIN_UUID, PARIS_UUID, departure_date, 100), 0.5
+        )
+        self.assertFalse(empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, departure_date, 100))
+
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, departure_date, empty=False, now=10)
+        self.assertFalse(empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, departure_date, 10))
+        self.assertEqual(empty_searches.skipped_searches, 1)
+
+    def test_empty_weekdays(self):
+        empty_searches = EmptySearchesCache(EmptySearchesPolicy(min_weekday_searches=2.5))
+        mondays = [date(2023, 7, 3) + timedelta(weeks=week) for week in range(4)]
+        for monday in mondays[:3]:
+            empty_searches.record(BERLIN_UUID, PARIS_UUID, monday, empty=True, now=0)
+            empty_searches.record(BERLIN_UUID, PARIS_UUID, monday + timedelta(1), False, now=0)
+
+        self.assertTrue(empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, mondays[3], now=0))
+        self.assertFalse(
+            empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, mondays[3] + timedelta(1), now=0)
+        )
+
+    def test_service_horizon(self):
+        empty_searches = EmptySearchesCache(EmptySearchesPolicy(min_empty_beyond=2, horizon_ttl=60))
+        last_ride_date = date(2023, 8, 10)
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, last_ride_date, empty=False, now=0)
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 11), empty=True, now=0)
+        self.assertIsNone(empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=0))
+
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 12), empty=True, now=0)
+        self.assertEqual(
+            empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=0), last_ride_date
+        )
+        self.assertTrue(empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, date(2023, 8, 20), 0))
+        # the horizon is checked again after horizon_ttl
+        self.assertIsNone(empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=61))
+
+        # rides found beyond the horizon
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 11), empty=False, now=0)
+        self.assertIsNone(empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=0))
+
+    def test_prune_service_horizon(self):
+        empty_searches = EmptySearchesCache(EmptySearchesPolicy(min_empty_beyond=2, horizon_ttl=60))
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 10), empty=False, now=0)
+        for day in (11, 12):
+            empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, day), empty=True, now=0)
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 13), empty=True, now=50)
+
+        # past and expired empty searches are removed
+        empty_searches.prune(from_date=date(2023, 8, 12), now=61)
+        self.assertIsNone(empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=61))
+        # the fresh empty search is kept, one more is enough to trust the horizon again
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 12), empty=True, now=61)
+        self.assertEqual(
+            empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=61), date(2023, 8, 10)
+        )
+        # the old empty searches are not counted again once they expire
+        empty_searches.prune(from_date=date(2023, 8, 12), now=200)
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, date(2023, 8, 14), empty=True, now=200)
+        self.assertIsNone(empty_searches.service_horizon(BERLIN_UUID, PARIS_UUID, now=200))
+
+    def test_empty_dates_beyond_service_horizon(self):
+        empty_searches = EmptySearchesCache()
+        start_date = date(2023, 8, 1)
+        # rides for 30 days, searched up to 90 days
+        for day in range(90):
+            empty_searches.record(
+                BERLIN_UUID, PARIS_UUID, start_date + timedelta(day), empty=day >= 30, now=0
+            )
+
+        # the empty dates beyond the horizon do not make near weekdays look empty
+        for day in range(30):
+            self.assertFalse(
+                empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, start_date + timedelta(day), 0)
+            )
+        self.assertTrue(
+            empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, start_date + timedelta(60), 0)
+        )
+
+    def test_scraper_stops_at_service_horizon(self):
+        start_date = datetime.now()
+        empty_searches = EmptySearchesCache(EmptySearchesPolicy(min_empty_beyond=1))
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, start_date.date() + timedelta(1), False)
+        empty_searches.record(BERLIN_UUID, PARIS_UUID, start_date.date() + timedelta(2), True)
+
+        flixbus_trips_scraper = FlixbusTripsScraper(
+            departure_city_uuid=BERLIN_UUID,
+            arrival_city_uuid=PARIS_UUID,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=30),
+            search_filters=SearchFilters(empty_searches=empty_searches),
+        )
+        self.assertEqual(len(list(flixbus_trips_scraper.dates_range_generator())), 2)
+        self.assertEqual(len(list(flixbus_trips_scraper.iter_endpoint_uris())), 2)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "trips_empty_searches.json")
+            empty_searches = EmptySearchesCache(file_path=file_path)
+            departure_date = date.today() + timedelta(days=1)
+            empty_searches.record(BERLIN_UUID, PARIS_UUID, departure_date, empty=True)
+            empty_searches.save()
+
+            loaded_empty_searches = EmptySearchesCache(file_path=file_path)
+        self.assertTrue(loaded_empty_searches.should_skip(BERLIN_UUID, PARIS_UUID, departure_date))
+
+
 if __name__ == "__main__":
     unittest.main()
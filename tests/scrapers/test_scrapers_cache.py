@@ -0,0 +1,92 @@
+"""
+Implements tests for the scrapers response cache.
+"""
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+
+from scrapers import BaseScraper, ResponseCache, ResponseSharing, cache_key
+from tests.scrapers import BaseScraperFactory
+
+
+class TestResponseCache(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_cache_key(self):
+        url = "http://dummy.url"
+        self.assertEqual(
+            cache_key("POST", url, {"a": 1, "b": 2}), cache_key("POST", url, {"b": 2, "a": 1})
+        )
+        self.assertNotEqual(cache_key("GET", url), cache_key("POST", url))
+        self.assertNotEqual(
+            cache_key("POST", url, {"size": 1}), cache_key("POST", url, {"size": 2})
+        )
+
+    def test_get_and_set(self):
+        response_cache = ResponseCache(cache_dir=self.cache_dir.name)
+        self.assertIsNone(response_cache.get("key", ttl=60))
+
+        response_cache.set("key", {"hits": [1, 2, 3]})
+        self.assertEqual(response_cache.get("key", ttl=60), {"hits": [1, 2, 3]})
+        self.assertEqual(response_cache.stats["hits"], 1)
+        self.assertEqual(response_cache.stats["misses"], 1)
+
+        # entries are reloaded from disk
+        self.assertEqual(
+            ResponseCache(cache_dir=self.cache_dir.name).get("key", ttl=60), {"hits": [1, 2, 3]}
+        )
+
+    def test_ttl(self):
+        response_cache = ResponseCache(cache_dir=self.cache_dir.name)
+        response_cache.set("key", {"foo": "bar"})
+        self.assertIsNone(response_cache.get("key", ttl=-1))
+        self.assertEqual(response_cache.stats["entries"], 0)
+
+    def test_lru_eviction(self):
+        entry_size = len('{"created_at": 1700000000.000000, "data": "xxxxxxxxxx"}')
+        response_cache = ResponseCache(cache_dir=self.cache_dir.name, max_size=entry_size * 2 + 5)
+        response_cache.set("a", "x" * 10)
+        response_cache.set("b", "x" * 10)
+        response_cache.get("a", ttl=60)
+        response_cache.set("c", "x" * 10)
+
+        self.assertIsNone(response_cache.get("b", ttl=60))
+        self.assertIsNotNone(response_cache.get("a", ttl=60))
+        self.assertIsNotNone(response_cache.get("c", ttl=60))
+
+    def test_scraper_served_from_cache(self):
+        response = MagicMock(status_code=200, headers={})
+        response.json.return_value = {"cities": []}
+        session_mock = MagicMock()
+        session_mock.get.return_value = response
+        self.mocker.patch.object(BaseScraper, "requests_retry_session", new=session_mock)
+
+        response_cache = ResponseCache(cache_dir=self.cache_dir.name)
+        base_scraper = BaseScraperFactory(
+            endpoint_uris=["http://cache.dummy.url"],
+            sharing=ResponseSharing(cache_ttl=60, response_cache=response_cache),
+        )
+        self.assertEqual(base_scraper.get_data(), [{"cities": []}])
+        self.assertEqual(base_scraper.get_data(), [{"cities": []}])
+        self.assertEqual(session_mock.get.call_count, 1)
+
+        no_cache_scraper = BaseScraperFactory(
+            endpoint_uris=["http://cache.dummy.url"],
+            sharing=ResponseSharing(response_cache=response_cache),
+        )
+        no_cache_scraper.get_data()
+        self.assertEqual(session_mock.get.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Implements tests for the scrapers json decoding.
+"""
+import json
+import unittest
+
+from scrapers import iter_json_array, json_loads
+
+
+class TestJsonDecoding(unittest.TestCase):
+    def test_json_loads(self):
+        self.assertEqual(json_loads(b'{"trips": [1, 2.5, "\\u00e9"]}'), {"trips": [1, 2.5, "é"]})
+
+    def test_iter_json_array(self):
+        document = {
+            "took": 7,
+            "_shards": {"total": 1, "hits": ["not", "these"]},
+            "hits": {
+                "total": 4,
+                "hits": [
+                    {"_source": {"name": 'Zürich "HB"', "reachable": [{"id": 1}]}},
+                    {"_source": {"name": "Paris"}},
+                    12345,
+                    "São Paulo",
+                ],
+            },
+            "after": {"hits": []},
+        }
+        content = json.dumps(document, ensure_ascii=False).encode()
+
+        # whatever the chunks split the document (even a multibyte char or a number)
+        for chunk_size in range(1, 50):
+            chunks = (content[i : i + chunk_size] for i in range(0, len(content), chunk_size))
+            self.assertEqual(
+                list(iter_json_array(chunks, ("hits", "hits"))), document["hits"]["hits"]
+            )
+
+    def test_iter_json_array_is_lazy(self):
+        def chunks():
+            yield b'{"hits": [{"id": 1}, '
+            raise AssertionError("next chunks are not read before they are needed")
+
+        self.assertEqual(next(iter_json_array(chunks(), ("hits",))), {"id": 1})
+
+    def test_iter_json_array_edge_cases(self):
+        self.assertEqual(list(iter_json_array([b"[]"])), [])
+        self.assertEqual(list(iter_json_array([b"[1,", b"2]"])), [1, 2])
+        self.assertEqual(list(iter_json_array([b'{"foo": []}'], ("hits",))), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"hits": [1, 2'], ("hits",)))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"hits": {}}'], ("hits",)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,11 +4,26 @@ Implements tests for Scrapers models.
 NOTE: Define a pytest fixture named __inject_fixtures with the autouse=True option is necessary,
  in order to inject the value of fixtures into all test methods in the test class where it is used.
 """
+import asyncio
+import threading
+import time
 import unittest
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock
 
+import pytest
 from requests import Session
 
-from scrapers import BaseScraper
+from scrapers import (
+    BaseScraper,
+    ResponseSharing,
+    concurrency_budget,
+    get_concurrency_budget,
+    get_max_concurrency,
+    get_single_flight_stats,
+    rate_limiters,
+    set_max_concurrency,
+)
 from tests.scrapers import BaseScraperFactory
 
 
@@ -28,6 +43,17 @@ class TestBaseScraper(unittest.TestCase):
         with self.assertRaises(TypeError):
             BaseScraper(endpoint_uris=-3.1416)
 
+    def test_lazy_endpoint_uri_validation(self):
+        base_scraper = BaseScraper(endpoint_uris=(uri for uri in ["http://dummy.url", "dummy"]))
+        uris = base_scraper.iter_endpoint_uris()
+        self.assertEqual(next(uris), "http://dummy.url")
+        with self.assertRaises(TypeError):
+            next(uris)
+
+    def test_no_endpoint_uris(self):
+        with self.assertRaises(ValueError):
+            BaseScraper(endpoint_uris=iter([])).get_data()
+
     def test_build_headers(self):
         base_scraper = BaseScraperFactory()
         headers = base_scraper.build_headers()
@@ -56,5 +82,119 @@ class TestBaseScraper(unittest.TestCase):
     """
 
 
+class TestBaseScraperAsync(IsolatedAsyncioTestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.max_concurrency = get_max_concurrency()
+        rate_limiters.configure("dummy.url", rate=1000.0, max_rate=1000.0, burst=1000.0)
+
+    def tearDown(self):
+        set_max_concurrency(self.max_concurrency)
+
+    def mock_session(self, delay: float = 0.0):
+        self.in_flight, self.max_in_flight = 0, 0
+        lock = threading.Lock()
+
+        def fake_get(url, **_):
+            with lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(delay)
+            with lock:
+                self.in_flight -= 1
+            response = MagicMock(status_code=200)
+            response.json.return_value = {"url": url}
+            return response
+
+        session_mock = MagicMock()
+        session_mock.get.side_effect = fake_get
+        self.mocker.patch.object(BaseScraper, "requests_retry_session", new=session_mock)
+        return session_mock
+
+    async def test_get_data_async(self):
+        urls = [f"http://dummy.url/{i}" for i in range(5)]
+        self.mock_session()
+        base_scraper = BaseScraperFactory(endpoint_uris=urls)
+
+        data = await base_scraper.get_data_async()
+
+        self.assertEqual(data, [{"url": url} for url in urls])
+
+    async def test_get_data_async_concurrency_limit(self):
+        set_max_concurrency(2)
+        self.mock_session(delay=0.05)
+        base_scraper = BaseScraperFactory(endpoint_uris=[f"http://dummy.url/{i}" for i in range(8)])
+
+        data = await base_scraper.get_data_async()
+
+        self.assertEqual(len(data), 8)
+        self.assertEqual(self.max_in_flight, 2)
+
+    async def test_aiter_data(self):
+        urls = [f"http://dummy.url/{i}" for i in range(6)]
+        self.mock_session(delay=0.02)
+        base_scraper = BaseScraperFactory(endpoint_uris=urls)
+
+        data = [response async for response in base_scraper.aiter_data(prefetch=2)]
+
+        self.assertCountEqual(data, [{"url": url} for url in urls])
+        self.assertEqual(self.max_in_flight, 2)
+
+    async def test_identical_requests_are_coalesced(self):
+        session_mock = self.mock_session(delay=0.05)
+        urls = ["http://dummy.url/same", "http://dummy.url/other"]
+        saved_requests = get_single_flight_stats()["saved_requests"]
+
+        responses = await asyncio.gather(
+            BaseScraperFactory(endpoint_uris=urls).get_data_async(),
+            BaseScraperFactory(endpoint_uris=urls[:1]).get_data_async(),
+        )
+
+        self.assertEqual(responses, [[{"url": url} for url in urls], [{"url": urls[0]}]])
+        self.assertEqual(session_mock.get.call_count, 2)
+        self.assertEqual(get_single_flight_stats()["saved_requests"], saved_requests + 1)
+
+        await BaseScraperFactory(
+            endpoint_uris=urls[:1], sharing=ResponseSharing(coalesce=False)
+        ).get_data_async()
+        self.assertEqual(session_mock.get.call_count, 3)
+
+    def test_iter_data(self):
+        urls = [f"http://dummy.url/{i}" for i in range(3)]
+        session_mock = self.mock_session()
+        base_scraper = BaseScraperFactory(endpoint_uris=urls)
+
+        scraped_data = base_scraper.iter_data()
+        self.assertEqual(next(scraped_data), {"url": urls[0]})
+        self.assertEqual(session_mock.get.call_count, 1)  # next ones not requested yet
+        self.assertEqual(list(scraped_data), [{"url": url} for url in urls[1:]])
+
+    async def test_concurrency_budget(self):
+        set_max_concurrency(8)
+        self.mock_session(delay=0.05)
+
+        async def scrape_region(max_concurrency):
+            with concurrency_budget(max_concurrency):
+                self.assertEqual(get_concurrency_budget(), max_concurrency)
+                urls = [f"http://dummy.url/{max_concurrency}/{i}" for i in range(6)]
+                return await BaseScraperFactory(endpoint_uris=urls).get_data_async()
+
+        data = await asyncio.gather(scrape_region(1), scrape_region(2))
+
+        self.assertEqual([len(region_data) for region_data in data], [6, 6])
+        self.assertEqual(self.max_in_flight, 3)
+        self.assertEqual(get_concurrency_budget(), 8)
+        with self.assertRaises(ValueError):
+            with concurrency_budget(0):
+                pass
+
+    def test_invalid_max_concurrency(self):
+        with self.assertRaises(ValueError):
+            set_max_concurrency(0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,184 @@
+"""
+Implements tests for scrapers retries and circuit breaking.
+"""
+import unittest
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock, PropertyMock
+
+import pytest
+from requests import exceptions as requests_exceptions
+from requests.exceptions import JSONDecodeError, SSLError
+
+from scrapers import (
+    BaseScraper,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitState,
+    backoff_delay,
+    circuit_breakers,
+)
+from tests.scrapers import BaseScraperFactory
+
+
+class TestBackoffDelay(unittest.TestCase):
+    def test_backoff_delay(self):
+        for attempt in range(10):
+            delay = backoff_delay(attempt, backoff=0.3, max_backoff=5.0)
+            self.assertTrue(0 <= delay <= min(5.0, 0.3 * 2**attempt))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.stats, {"state": "open", "failure_count": 3, "trip_count": 1})
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # just one probe at once
+
+        breaker.record_failure()
+        self.assertEqual(breaker.counters.trips, 2)
+
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+
+    def test_registry_by_endpoint(self):
+        registry = CircuitBreakerRegistry()
+        search_breaker = registry.get_circuit_breaker("https://api.dummy.url/search?from=1")
+        self.assertIs(search_breaker, registry.get_circuit_breaker("https://api.dummy.url/search"))
+        self.assertIsNot(search_breaker, registry.get_circuit_breaker("https://api.dummy.url/x"))
+        self.assertEqual(set(registry.stats()), {"api.dummy.url/search", "api.dummy.url/x"})
+
+
+class TestBaseScraperRetries(IsolatedAsyncioTestCase):
+    @pytest.fixture(autouse=True)
+    def __inject_fixtures(self, mocker):
+        self.mocker = mocker
+
+    def mock_session(self, status_codes):
+        responses = []
+        for status_code in status_codes:
+            response = MagicMock(status_code=status_code, headers={})
+            response.json.return_value = {"status": status_code}
+            responses.append(response)
+
+        session_mock = MagicMock()
+        session_mock.get.side_effect = responses
+        self.mocker.patch.object(BaseScraper, "requests_retry_session", new=session_mock)
+        return session_mock
+
+    async def test_retry_until_success(self):
+        session_mock = self.mock_session([503, 502, 200])
+        sleep_mock = self.mocker.patch("asyncio.sleep")
+        base_scraper = BaseScraperFactory(endpoint_uris=["http://retry.dummy.url/ok"], backoff=0.01)
+
+        data = await base_scraper.get_data_async()
+
+        self.assertEqual(data, [{"status": 200}])
+        self.assertEqual(session_mock.get.call_count, 3)
+        self.assertEqual(sleep_mock.await_count, 2)
+
+    def test_retries_exhausted(self):
+        session_mock = self.mock_session([500] * 3)
+        sleep_mock = self.mocker.patch("time.sleep")
+        base_scraper = BaseScraperFactory(
+            endpoint_uris=["http://retry.dummy.url/ko"], retries=2, backoff=0.01
+        )
+
+        self.assertEqual(base_scraper.get_data(), [])
+        self.assertEqual(session_mock.get.call_count, 3)
+        self.assertEqual(sleep_mock.call_count, 2)
+
+    def test_no_retry_on_client_error(self):
+        session_mock = self.mock_session([404])
+        base_scraper = BaseScraperFactory(endpoint_uris=["http://retry.dummy.url/missing"])
+
+        self.assertEqual(base_scraper.get_data(), [])
+        self.assertEqual(session_mock.get.call_count, 1)
+
+    def test_fail_fast_when_circuit_open(self):
+        url = "http://breaker.dummy.url/degraded"
+        breaker = circuit_breakers.get_circuit_breaker(url)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        session_mock = self.mock_session([200])
+        base_scraper = BaseScraperFactory(endpoint_uris=[url])
+
+        self.assertEqual(base_scraper.get_data(), [])
+        session_mock.get.assert_not_called()
+        self.assertEqual(circuit_breakers.stats()["breaker.dummy.url/degraded"]["state"], "open")
+
+    async def test_malformed_response_is_skipped(self):
+        urls = [f"http://malformed.dummy.url/{i}" for i in range(3)]
+
+        def fake_get(url, **_):
+            response = MagicMock(status_code=200, headers={})
+            if url == urls[1]:  # e.g. an html captcha page
+                response.json.side_effect = JSONDecodeError("Expecting value", "<html>", 0)
+            else:
+                response.json.return_value = {"url": url}
+            return response
+
+        session_mock = MagicMock()
+        session_mock.get.side_effect = fake_get
+        self.mocker.patch.object(BaseScraper, "requests_retry_session", new=session_mock)
+        base_scraper = BaseScraperFactory(endpoint_uris=urls, retries=0)
+
+        data = [response async for response in base_scraper.aiter_data()]
+
+        self.assertCountEqual(data, [{"url": urls[0]}, {"url": urls[2]}])
+        self.assertEqual(circuit_breakers.get_circuit_breaker(urls[1]).counters.failures, 1)
+
+    def test_ssl_fallback_keeps_method_and_outcome(self):
+        url = "http://ssl.dummy.url/search"
+        response = MagicMock(status_code=200, headers={})
+        response.json.return_value = {"ok": True}
+        session_mock = MagicMock()
+        session_mock.post.side_effect = [SSLError("bad certificate"), response]
+        self.mocker.patch.object(BaseScraper, "requests_retry_session", new=session_mock)
+        self.mocker.patch.object(
+            BaseScraper, "query", new_callable=PropertyMock, return_value={"q": 1}
+        )
+
+        self.assertEqual(BaseScraperFactory(endpoint_uris=[url]).get_data("POST"), [{"ok": True}])
+        session_mock.get.assert_not_called()
+        fallback_kwargs = session_mock.post.call_args.kwargs
+        self.assertEqual((fallback_kwargs["json"], fallback_kwargs["verify"]), ({"q": 1}, False))
+
+    def test_failed_ssl_fallback_ends_the_probe(self):
+        url = "http://ssl.dummy.url/probe"
+        breaker = circuit_breakers.get_circuit_breaker(url)
+        breaker.recovery_timeout = 0
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        session_mock = MagicMock()
+        session_mock.get.side_effect = [
+            SSLError("bad certificate"),
+            requests_exceptions.ConnectionError("down"),
+        ]
+        self.mocker.patch.object(BaseScraper, "requests_retry_session", new=session_mock)
+
+        self.assertEqual(BaseScraperFactory(endpoint_uris=[url], retries=0).get_data(), [])
+        # the failed probe opened the circuit again, instead of waiting for it forever
+        self.assertTrue(breaker.allow_request())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Implements tests for the shared scrapers HTTP sessions registry.
+"""
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from requests import Session
+from urllib3.util import Retry
+
+from scrapers import SessionRegistry, session_registry
+from tests.scrapers import BaseScraperFactory
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        ...
+
+
+class TestSessionRegistry(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_scrapers_share_session(self):
+        a_scraper = BaseScraperFactory(endpoint_uris=[f"{self.base_url}/a"])
+        another_scraper = BaseScraperFactory(endpoint_uris=[f"{self.base_url}/b"])
+        self.assertIs(a_scraper.requests_retry_session, another_scraper.requests_retry_session)
+        self.assertIn(a_scraper.requests_retry_session, session_registry)
+        self.assertNotIn(Session(), session_registry)
+
+    def test_connections_reused(self):
+        registry = SessionRegistry(pool_maxsize=2)
+        session = registry.get_session(Retry(total=0))
+
+        for i in range(5):
+            url = f"{self.base_url}/{i}"
+            registry.mark_used(url)
+            self.assertEqual(session.get(url).json(), {"path": f"/{i}"})
+
+        stats = registry.connection_stats()["127.0.0.1"]
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 4)
+        self.assertAlmostEqual(stats["reuse_ratio"], 0.8)
+        registry.close()
+
+    def test_evict_idle(self):
+        registry = SessionRegistry(idle_timeout=0)
+        session = registry.get_session(Retry(total=0))
+        session.get(f"{self.base_url}/idle")
+
+        self.assertEqual(registry.evict_idle(force=True), 1)
+        self.assertEqual(registry.evict_idle(force=True), 0)
+        # evicted pools keep counting in the stats
+        self.assertEqual(registry.connection_stats()["127.0.0.1"]["requests"], 1)
+        registry.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
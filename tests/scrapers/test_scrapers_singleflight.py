@@ -0,0 +1,88 @@
+"""
+Implements tests for the scrapers requests coalescing.
+"""
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.async_case import IsolatedAsyncioTestCase
+
+from scrapers import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        single_flight = SingleFlight()
+        calls = []
+        lock = threading.Lock()
+
+        def request():
+            with lock:
+                calls.append(1)
+            time.sleep(0.05)
+            return {"trips": []}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: single_flight.run("key", request), range(4)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(single_flight.stats, {"requests": 4, "saved_requests": 3})
+
+        # calls not in flight anymore are not coalesced
+        single_flight.run("key", request)
+        self.assertEqual(len(calls), 2)
+
+    def test_exceptions_are_shared(self):
+        single_flight = SingleFlight()
+
+        def request():
+            time.sleep(0.05)
+            raise ValueError("dummy error")
+
+        def call():
+            with self.assertRaises(ValueError):
+                single_flight.run("key", request)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [executor.submit(call) for _ in range(2)]:
+                future.result()
+        self.assertEqual(single_flight.stats["saved_requests"], 1)
+
+
+class TestSingleFlightAsync(IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_are_coalesced(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def request(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key
+
+        results = await asyncio.gather(
+            *[single_flight.run_async(key, lambda key=key: request(key)) for key in "aab"]
+        )
+
+        self.assertEqual(results, ["a", "a", "b"])
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(single_flight.stats["saved_requests"], 1)
+
+    async def test_cancelled_caller(self):
+        single_flight = SingleFlight()
+
+        async def request():
+            await asyncio.sleep(0.05)
+            return "data"
+
+        first_call = asyncio.ensure_future(single_flight.run_async("key", request))
+        second_call = asyncio.ensure_future(single_flight.run_async("key", request))
+        await asyncio.sleep(0.01)
+        first_call.cancel()
+
+        self.assertEqual(await second_call, "data")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Implements tests for scrapers per-host rate limiting.
+"""
+import unittest
+
+from scrapers import AdaptiveRateLimiter, RateLimiterRegistry, RateLimitPolicy
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_invalid_rates(self):
+        with self.assertRaises(ValueError):
+            AdaptiveRateLimiter(rate=1.0, policy=RateLimitPolicy(min_rate=2.0))
+        with self.assertRaises(ValueError):
+            RateLimitPolicy(multiplicative_decrease=1.5)
+
+    def test_reserve_burst_then_wait(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, policy=RateLimitPolicy(burst=2.0))
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertAlmostEqual(limiter.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(limiter.reserve(), 0.2, places=2)
+
+    def test_additive_increase(self):
+        limiter = AdaptiveRateLimiter(
+            rate=10.0, policy=RateLimitPolicy(max_rate=11.0, additive_increase=1.0)
+        )
+        for _ in range(10):
+            limiter.record(200, 0.1)
+        self.assertTrue(10.0 < limiter.rate <= 11.0)
+
+        for _ in range(100):
+            limiter.record(200, 0.1)
+        self.assertEqual(limiter.rate, 11.0)
+
+    def test_multiplicative_decrease(self):
+        limiter = AdaptiveRateLimiter(
+            rate=10.0, policy=RateLimitPolicy(min_rate=1.0, decrease_cooldown=0.0)
+        )
+        limiter.record(429)
+        self.assertEqual(limiter.rate, 5.0)
+        limiter.record(503)
+        self.assertEqual(limiter.rate, 2.5)
+        limiter.record(None)
+        limiter.record(None)
+        self.assertEqual(limiter.rate, 1.0)
+        self.assertEqual(limiter.stats["throttled_count"], 4)
+
+    def test_decrease_cooldown(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, policy=RateLimitPolicy(decrease_cooldown=60.0))
+        for _ in range(5):
+            limiter.record(500)
+        self.assertEqual(limiter.rate, 5.0)
+
+    def test_rising_latency(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, policy=RateLimitPolicy(decrease_cooldown=0.0))
+        for _ in range(20):
+            limiter.record(200, 0.1)
+        rate = limiter.rate
+        for _ in range(5):
+            limiter.record(200, 2.0)
+        self.assertLess(limiter.rate, rate)
+
+
+class TestRateLimiterRegistry(unittest.TestCase):
+    def test_limiter_by_host(self):
+        registry = RateLimiterRegistry()
+        search_limiter = registry.get_rate_limiter("https://global.api.flixbus.com/search?a=1")
+        self.assertIs(
+            search_limiter, registry.get_rate_limiter("https://global.api.flixbus.com/search?a=2")
+        )
+        self.assertIsNot(
+            search_limiter,
+            registry.get_rate_limiter("https://d1ioiftasz4l3w.cloudfront.net/cities_v2/_search"),
+        )
+        self.assertEqual(
+            set(registry.stats()), {"global.api.flixbus.com", "d1ioiftasz4l3w.cloudfront.net"}
+        )
+
+    def test_host_settings(self):
+        registry = RateLimiterRegistry()
+        registry.configure("d1ioiftasz4l3w.cloudfront.net", rate=1.0, max_rate=2.0)
+        limiter = registry.get_rate_limiter("https://d1ioiftasz4l3w.cloudfront.net/cities_v2")
+        self.assertEqual(limiter.rate, 1.0)
+        self.assertEqual(limiter.policy.max_rate, 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()